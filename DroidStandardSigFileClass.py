@@ -6,89 +6,107 @@
 
 from __future__ import print_function, unicode_literals
 
+import collections
 import logging
-import xml.etree.ElementTree as etree
+
+from xmlstream import iterparse_elements
+
+NS = "{http://www.nationalarchives.gov.uk/pronom/SignatureFile}"
+
+# Value returned for a PUID that does not exist in the signature file.
+NOTFOUND = "notfound"
+
+FileFormatRecord = collections.namedtuple(
+    "FileFormatRecord", "puid name extensions mimetypes internalsignatureids"
+)
 
 
 class DroidStandardSigFileClass:
     """Class encapsulating DROID signature file reading operations."""
 
-    def __init__(self, sigfile):
-        """Constructor for the DROID signature file handler class."""
-        self.sigfile = open(sigfile, "rb")
+    def __init__(self, sigfile, formats=None):
+        """Constructor for the DROID signature file handler class.
 
-    def __del__(self):
-        """Deconstructor for the class object."""
-        if not self.sigfile.closed:
-            self.sigfile.close()
+        The signature file is parsed once and indexed by PUID, unless the
+        index from an earlier instance, e.g. a cached one, is given as
+        formats.
+        """
+        self.sigfile = sigfile
+        if formats is not None:
+            self.formats = formats
+            return
+        self.formats = {}
+        self._build_index()
 
     def _parse_xml(self):
-        """Parse an XML object and return its iterator."""
-        self.sigfile.seek(0)  # Parsing has to begin from seek-point zero
+        """Stream the FileFormat elements out of the signature file."""
         try:
-            tree = etree.parse(self.sigfile)
-            root = tree.getroot()
-            return iter(root)
+            for fileformat in iterparse_elements(
+                self.sigfile, "{}FileFormat".format(NS)
+            ):
+                yield fileformat
         except IOError as err:
+            # A missing or unreadable file must not look like an empty one.
             logging.error(err)
-            return None
-        return None
+            raise
+
+    def _build_index(self):
+        """Create a PUID to file format record index."""
+        for fileformat in self._parse_xml():
+            record = self._create_record(fileformat)
+            self.formats[record.puid] = record
+
+    @staticmethod
+    def _create_record(fileformat):
+        """Create a file format record from a FileFormat element."""
+        extensions = []
+        internalsignatureids = []
+        for child in fileformat:
+            if child.tag == "{}Extension".format(NS):
+                extensions.append(child.text)
+            elif child.tag == "{}InternalSignatureID".format(NS):
+                internalsignatureids.append(child.text)
+        mimetypes = fileformat.get("MIMEType")
+        if mimetypes is None:
+            mimetypes = []
+        else:
+            mimetypes = [mime.strip() for mime in mimetypes.split(",")]
+        return FileFormatRecord(
+            puid=fileformat.get("PUID"),
+            name=fileformat.get("Name"),
+            extensions=tuple(extensions),
+            mimetypes=tuple(mimetypes),
+            internalsignatureids=tuple(internalsignatureids),
+        )
+
+    def retrieve_format(self, puid):
+        """Given a PUID return its file format record or None."""
+        return self.formats.get(puid)
+
+    def retrieve_formats(self, puid_list):
+        """Given a list of PUIDs return a dictionary of file format
+        records, PUIDs not in the signature file map to None.
+        """
+        return dict((puid, self.formats.get(puid)) for puid in puid_list)
 
     def retrieve_single_ext_text(self, puid_txt):
         """Given a PUID return an extension from droid signature file.
         """
-        xml_iter = self._parse_xml()
-        mapping_text = None
-        for topelements in xml_iter:
-            if (
-                topelements.tag
-                == "{http://www.nationalarchives.gov.uk/pronom/SignatureFile}FileFormatCollection"
-            ):
-                for fileformats in topelements:
-                    puid = fileformats.get("PUID")
-                    if puid != puid_txt:
-                        continue
-                    for mapping in fileformats:
-                        if (
-                            mapping.tag
-                            == "{http://www.nationalarchives.gov.uk/pronom/SignatureFile}Extension"
-                        ):
-                            # Return the first file format ext.
-                            mapping_text = mapping.text
-                            break
-        return mapping_text
+        record = self.formats.get(puid_txt)
+        if record is None or not record.extensions:
+            return None
+        # Return the first file format ext.
+        return record.extensions[0]
 
     def retrieve_ext_list(self, puid_list):
         """Given a list of PUIDS, return all extensions from droid
         signature file.
         """
-        xml_iter = self._parse_xml()
         puiddict = {}
-        for topelements in xml_iter:
-            if (
-                topelements.tag
-                == "{http://www.nationalarchives.gov.uk/pronom/SignatureFile}FileFormatCollection"
-            ):
-                for fileformats in topelements:
-                    puid = fileformats.get("PUID")
-                    for puids in puid_list:
-                        if puids != puid:
-                            continue
-                        ext = fileformats.find(
-                            "{http://www.nationalarchives.gov.uk/pronom/SignatureFile}Extension"
-                        )
-                        if ext is not None:
-                            # Return the first file format extension.
-                            puiddict[puids] = ext.text
-                            break
-                        puiddict[puids] = None
-                        break
-            notfound = []
-            for puid in puid_list:
-                if puid not in puiddict:
-                    if puid not in notfound:
-                        notfound.append(puid)
-            if len(notfound) > 0:
-                for puid in notfound:
-                    puiddict[puid] = "notfound"
+        for puid, record in self.retrieve_formats(puid_list).items():
+            if record is None:
+                puiddict[puid] = NOTFOUND
+                continue
+            # Return the first file format extension.
+            puiddict[puid] = self.retrieve_single_ext_text(puid)
         return puiddict
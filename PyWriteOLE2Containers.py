@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+
+"""Module for collecting functions associated with writing OLE2 based
+skeletons without Jython and Apache POI.
+
+Files are written as version 3 Compound File Binary (CFB) objects, see
+[MS-CFB]: Compound File Binary File Format. Inner paths containing '/'
+are written as nested storages.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import logging
+import os
+import struct
+
+CFB_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+SECTOR_SIZE = 512
+MINI_SECTOR_SIZE = 64
+MINI_STREAM_CUTOFF = 4096
+DIRECTORY_ENTRY_SIZE = 128
+
+# Number of FAT sector locations held in the header and in each DIFAT
+# sector, the last entry of which points to the next DIFAT sector.
+HEADER_DIFAT_ENTRIES = 109
+DIFAT_SECTOR_ENTRIES = SECTOR_SIZE // 4 - 1
+
+DIFSECT = 0xFFFFFFFC
+FATSECT = 0xFFFFFFFD
+ENDOFCHAIN = 0xFFFFFFFE
+FREESECT = 0xFFFFFFFF
+NOSTREAM = 0xFFFFFFFF
+
+STGTY_STORAGE = 1
+STGTY_STREAM = 2
+STGTY_ROOT = 5
+
+BLACK = 1
+
+# Directory entry names are at most 31 UTF-16 characters plus a null.
+MAX_NAME_LENGTH = 31
+
+DIRECTORY_ENTRY = "<64sHBBIII16sIQQIII"
+UNUSED_ENTRY = struct.pack(
+    DIRECTORY_ENTRY,
+    b"",
+    0,
+    0,
+    0,
+    NOSTREAM,
+    NOSTREAM,
+    NOSTREAM,
+    b"",
+    0,
+    0,
+    0,
+    0,
+    0,
+    0,
+)
+
+
+class _DirectoryEntry:
+    """A storage or stream in the compound file directory."""
+
+    def __init__(self, name, entry_type, data=None):
+        self.name = name
+        self.entry_type = entry_type
+        self.data = data
+        self.children = {}
+        self.sid = None
+        self.left = NOSTREAM
+        self.right = NOSTREAM
+        self.child = NOSTREAM
+        self.start = ENDOFCHAIN
+        self.size = 0
+
+    def sort_key(self):
+        """Directory entries are ordered by name length then by the upper
+        case name.
+        """
+        return (len(self.name.encode("utf-16-le")), self.name.upper())
+
+    def pack(self):
+        """Return the 128 byte directory entry."""
+        name = self.name.encode("utf-16-le") + b"\x00\x00"
+        return struct.pack(
+            DIRECTORY_ENTRY,
+            name,
+            len(name),
+            self.entry_type,
+            BLACK,
+            self.left,
+            self.right,
+            self.child,
+            b"\x00" * 16,
+            0,
+            0,
+            0,
+            self.start,
+            self.size,
+            0,
+        )
+
+
+def _pad(data, size, fill=b"\x00"):
+    """Pad data to a multiple of size."""
+    remainder = len(data) % size
+    if remainder == 0:
+        return data
+    return data + fill * (size - remainder)
+
+
+def _sectors(length, size=SECTOR_SIZE):
+    """Number of sectors needed to hold length bytes."""
+    return (length + size - 1) // size
+
+
+def _chain(table, start, count):
+    """Link count entries from start in a FAT or mini FAT."""
+    for idx in range(start, start + count - 1):
+        table[idx] = idx + 1
+    if count > 0:
+        table[start + count - 1] = ENDOFCHAIN
+
+
+def _getvalue(data):
+    """Return inner file data, bytes or a lazy buffer, as bytes."""
+    if hasattr(data, "getvalue"):
+        return data.getvalue()
+    return bytes(data)
+
+
+def _writedata(fileobj, data):
+    """Write inner file data, streaming lazy buffers in chunks."""
+    if hasattr(data, "writeto"):
+        data.writeto(fileobj)
+        return
+    fileobj.write(data)
+
+
+def _create_tree(innerfiles):
+    """Create the directory tree for a mapping of inner path to bytes."""
+    root = _DirectoryEntry("Root Entry", STGTY_ROOT)
+    for path, data in innerfiles.items():
+        parts = [part for part in path.split("/") if part]
+        if not parts or any(len(part) > MAX_NAME_LENGTH for part in parts):
+            logging.error("Cannot write OLE2 entry with name: %s", path)
+            continue
+        storage = root
+        for part in parts[:-1]:
+            entry = storage.children.get(part)
+            if entry is None:
+                entry = _DirectoryEntry(part, STGTY_STORAGE)
+                storage.children[part] = entry
+            storage = entry
+        if storage.entry_type == STGTY_STREAM or parts[-1] in storage.children:
+            logging.error("Cannot write OLE2 entry twice: %s", path)
+            continue
+        storage.children[parts[-1]] = _DirectoryEntry(parts[-1], STGTY_STREAM, data)
+    return root
+
+
+def _flatten(root):
+    """Number the directory entries and link each storage's children
+    into a balanced binary tree.
+    """
+    entries = [root]
+    storages = [root]
+    while storages:
+        storage = storages.pop(0)
+        children = sorted(storage.children.values(), key=_DirectoryEntry.sort_key)
+        for child in children:
+            child.sid = len(entries)
+            entries.append(child)
+            if child.entry_type == STGTY_STORAGE:
+                storages.append(child)
+        storage.child = _balance(children)
+    root.sid = 0
+    return entries
+
+
+def _balance(children):
+    """Link sorted siblings into a balanced tree and return its root."""
+    if not children:
+        return NOSTREAM
+    middle = len(children) // 2
+    entry = children[middle]
+    entry.left = _balance(children[:middle])
+    entry.right = _balance(children[middle + 1 :])
+    return entry.sid
+
+
+def write_compound_file(fileobj, innerfiles):
+    """Write a mapping of inner path to bytes as a compound file."""
+    entries = _flatten(_create_tree(innerfiles))
+    streams = [entry for entry in entries if entry.entry_type == STGTY_STREAM]
+
+    # Streams under the cut-off are held in the mini stream.
+    ministream = []
+    minifat = []
+    bigstreams = []
+    for entry in streams:
+        entry.size = len(entry.data)
+        if entry.size == 0:
+            continue
+        if entry.size < MINI_STREAM_CUTOFF:
+            count = _sectors(entry.size, MINI_SECTOR_SIZE)
+            entry.start = len(minifat)
+            minifat.extend([FREESECT] * count)
+            _chain(minifat, entry.start, count)
+            ministream.append(_pad(_getvalue(entry.data), MINI_SECTOR_SIZE))
+            continue
+        bigstreams.append(entry)
+    ministream = b"".join(ministream)
+
+    # Allocate sectors: streams, the mini stream, the mini FAT and the
+    # directory, followed by the FAT and DIFAT which describe them.
+    fat = []
+    chains = []
+    for entry in bigstreams:
+        entry.start = len(fat)
+        count = _sectors(entry.size)
+        fat.extend([FREESECT] * count)
+        chains.append((entry.start, count))
+
+    root = entries[0]
+    root.size = len(ministream)
+    if ministream:
+        root.start = len(fat)
+        count = _sectors(len(ministream))
+        fat.extend([FREESECT] * count)
+        chains.append((root.start, count))
+        ministream = _pad(ministream, SECTOR_SIZE)
+
+    minifat_start = ENDOFCHAIN
+    minifat_count = _sectors(len(minifat) * 4)
+    if minifat_count:
+        minifat_start = len(fat)
+        fat.extend([FREESECT] * minifat_count)
+        chains.append((minifat_start, minifat_count))
+    minifat.extend([FREESECT] * (minifat_count * SECTOR_SIZE // 4 - len(minifat)))
+
+    # Unused entries fill the remainder of the last directory sector.
+    unused = (-len(entries)) % (SECTOR_SIZE // DIRECTORY_ENTRY_SIZE)
+    directory = b"".join(entry.pack() for entry in entries) + UNUSED_ENTRY * unused
+    directory_start = len(fat)
+    directory_count = _sectors(len(directory))
+    fat.extend([FREESECT] * directory_count)
+    chains.append((directory_start, directory_count))
+
+    fat_count = 0
+    difat_count = 0
+    while True:
+        needed = _sectors((len(fat) + fat_count + difat_count) * 4)
+        difat_needed = _sectors(
+            max(0, needed - HEADER_DIFAT_ENTRIES) * 4, DIFAT_SECTOR_ENTRIES * 4
+        )
+        if needed == fat_count and difat_needed == difat_count:
+            break
+        fat_count, difat_count = needed, difat_needed
+
+    fat_start = len(fat)
+    fat.extend([FATSECT] * fat_count)
+    difat_start = len(fat)
+    fat.extend([DIFSECT] * difat_count)
+    fat.extend([FREESECT] * (fat_count * SECTOR_SIZE // 4 - len(fat)))
+    for start, count in chains:
+        _chain(fat, start, count)
+
+    fat_sectors = list(range(fat_start, fat_start + fat_count))
+    difat = fat_sectors[:HEADER_DIFAT_ENTRIES]
+    difat.extend([FREESECT] * (HEADER_DIFAT_ENTRIES - len(difat)))
+    difat_sectors = []
+    remaining = fat_sectors[HEADER_DIFAT_ENTRIES:]
+    for idx in range(difat_count):
+        sector = remaining[:DIFAT_SECTOR_ENTRIES]
+        remaining = remaining[DIFAT_SECTOR_ENTRIES:]
+        sector.extend([FREESECT] * (DIFAT_SECTOR_ENTRIES - len(sector)))
+        sector.append(difat_start + idx + 1 if idx + 1 < difat_count else ENDOFCHAIN)
+        difat_sectors.append(struct.pack("<{}I".format(len(sector)), *sector))
+
+    header = struct.pack(
+        "<8s16sHHHHH6sIIIIIIIII109I",
+        CFB_SIGNATURE,
+        b"\x00" * 16,
+        0x003E,
+        0x0003,
+        0xFFFE,
+        9,
+        6,
+        b"\x00" * 6,
+        0,
+        fat_count,
+        directory_start,
+        0,
+        MINI_STREAM_CUTOFF,
+        minifat_start,
+        minifat_count,
+        difat_start if difat_count else ENDOFCHAIN,
+        difat_count,
+        *difat
+    )
+    fileobj.write(header)
+    for entry in bigstreams:
+        _writedata(fileobj, entry.data)
+        fileobj.write(b"\x00" * (-entry.size % SECTOR_SIZE))
+    fileobj.write(ministream)
+    fileobj.write(struct.pack("<{}I".format(len(minifat)), *minifat))
+    fileobj.write(directory)
+    fileobj.write(struct.pack("<{}I".format(len(fat)), *fat))
+    for sector in difat_sectors:
+        fileobj.write(sector)
+
+
+class WriteOLE2Containers:
+    """OLE2 Container writing class to encapsulate write functions for
+    OLE2 based objects.
+    """
+
+    @staticmethod
+    def writeContainer(containerfoldername, outputfolder, outputfilename):
+        """Write OLE2 container file from a folder, sub-folders are
+        written as storages.
+        """
+        if not os.path.isdir(containerfoldername):
+            return False
+        innerfiles = {}
+        for folder, _, files in os.walk(containerfoldername):
+            for file_ in files:
+                path = os.path.join(folder, file_)
+                relative = os.path.relpath(path, containerfoldername)
+                with open(path, "rb") as fin:
+                    innerfiles[relative.replace(os.path.sep, "/")] = fin.read()
+        return WriteOLE2Containers.writeContainerFiles(
+            innerfiles, outputfolder, outputfilename
+        )
+
+    @staticmethod
+    def writeContainerFiles(innerfiles, outputfolder, outputfilename):
+        """Write OLE2 container file from a mapping of inner path to
+        bytes.
+        """
+        if not innerfiles:
+            return False
+        fname = os.path.join(outputfolder, outputfilename)
+        with open(fname, "wb") as fos:
+            write_compound_file(fos, innerfiles)
+        return True
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""Module for journalling the containers completed during a run so that
+an interrupted run can be resumed.
+
+The journal is a JSON lines file. The first line records the settings of
+the run, the hashes of the signature files and the options that change the
+output. Each line after records a completed container, its ID, output path,
+sha256 and size, and is flushed as soon as the container is finished. A
+resumed run skips the containers recorded whose outputs are intact, as
+long as the settings have not changed.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import logging
+import os
+
+from signaturecache import filehash
+
+# Increment when the form of a journal line changes.
+JOURNAL_VERSION = 1
+
+# Name of the journal in the skeleton-container-suite folder.
+JOURNAL_NAME = "checkpoint-journal.jsonl"
+
+
+class CheckpointJournal:
+    """Journal of container ID to the output written for it."""
+
+    def __init__(self, path, settings, resume=False):
+        """Start a journal for a run with settings, a JSON serialisable
+        mapping. When resuming, the entries of the previous run are kept
+        if its settings match.
+        """
+        self.path = path
+        self.settings = dict(
+            json.loads(json.dumps(settings)), journal_version=JOURNAL_VERSION
+        )
+        self.completed = {}
+        if resume:
+            self.completed = self._load()
+        # The journal is rewritten so a line truncated by the interruption
+        # is not appended to.
+        self.file = open(path, "w")
+        self._write({"settings": self.settings})
+        for entry in self.completed.values():
+            self._write(entry)
+
+    def _load(self):
+        """Return the entries of the previous run by container ID, none
+        when there is no journal or its settings differ.
+        """
+        if not os.path.exists(self.path):
+            logging.warning("No checkpoint journal to resume from: %s", self.path)
+            return {}
+        completed = {}
+        with open(self.path, "r") as journal:
+            for idx, line in enumerate(journal):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning(
+                        "Ignoring incomplete checkpoint journal line %s", idx + 1
+                    )
+                    break
+                if idx == 0:
+                    if entry.get("settings") != self.settings:
+                        logging.warning(
+                            "Settings changed since the checkpoint, not resuming"
+                        )
+                        return {}
+                    continue
+                completed[entry["id"]] = entry
+        return completed
+
+    def _write(self, entry):
+        self.file.write(json.dumps(entry, sort_keys=True))
+        self.file.write("\n")
+        self.file.flush()
+
+    def record(self, containerid, output, sha256, size):
+        """Record a completed container."""
+        entry = {"id": containerid, "output": output, "sha256": sha256, "size": size}
+        self.completed[containerid] = entry
+        self._write(entry)
+
+    def finished(self, containerid, output):
+        """Return True if a container was completed by the previous run and
+        its output is intact.
+        """
+        entry = self.completed.get(containerid)
+        if entry is None or entry["output"] != output:
+            return False
+        if not os.path.exists(output):
+            logging.warning("Output missing, regenerating: %s", output)
+            return False
+        # A partially written output differs in size or content.
+        intact = (
+            os.path.getsize(output) == entry["size"]
+            and filehash(output) == entry["sha256"]
+        )
+        if not intact:
+            logging.warning("Output differs from checkpoint, regenerating: %s", output)
+        return intact
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""Signature files shared by the tests."""
+
+from __future__ import print_function
+
+import io
+
+import pytest
+
+CONTAINER_SIGNATURES = """<?xml version="1.0" encoding="UTF-8"?>
+<ContainerSignatureMapping schemaVersion="1.0" signatureVersion="35">
+  <ContainerSignatures>
+    <ContainerSignature Id="1000" ContainerType="OLE2">
+      <Description>Microsoft Word 6.0/95 OLE2</Description>
+      <Files>
+        <File>
+          <Path>CompObj</Path>
+          <BinarySignatures><InternalSignatureCollection>
+            <InternalSignature ID="1000">
+              <ByteSequence Reference="BOFoffset">
+                <SubSequence Position="1" SubSeqMinOffset="40">
+                  <Sequence>10 00 00 00 'Word.Document.' ['6'-'7'] 00</Sequence>
+                </SubSequence>
+              </ByteSequence>
+            </InternalSignature>
+          </InternalSignatureCollection></BinarySignatures>
+        </File>
+        <File><Path>WordDocument</Path></File>
+      </Files>
+    </ContainerSignature>
+    <ContainerSignature Id="1020" ContainerType="ZIP">
+      <Description>OOXML Word</Description>
+      <Files>
+        <File>
+          <Path>[Content_Types].xml</Path>
+          <BinarySignatures><InternalSignatureCollection>
+            <InternalSignature ID="1020">
+              <ByteSequence Reference="BOFoffset">
+                <SubSequence Position="1" SubSeqMinOffset="0">
+                  <Sequence>'&lt;?xml'</Sequence>
+                </SubSequence>
+                <SubSequence Position="2" SubSeqMinOffset="10">
+                  <Sequence>'ContentType=' [22 27] 'word'</Sequence>
+                </SubSequence>
+              </ByteSequence>
+            </InternalSignature>
+          </InternalSignatureCollection></BinarySignatures>
+        </File>
+        <File><Path>word/document.xml</Path></File>
+      </Files>
+    </ContainerSignature>
+    <ContainerSignature Id="1030" ContainerType="ZIP">
+      <Description>ODF text</Description>
+      <Files>
+        <File>
+          <Path>mimetype</Path>
+          <BinarySignatures><InternalSignatureCollection>
+            <InternalSignature ID="1030">
+              <ByteSequence Reference="BOFoffset">
+                <SubSequence Position="1" SubSeqMinOffset="0">
+                  <Sequence>'application/vnd.oasis.opendocument.text'</Sequence>
+                </SubSequence>
+              </ByteSequence>
+            </InternalSignature>
+          </InternalSignatureCollection></BinarySignatures>
+        </File>
+        <File>
+          <Path>content.xml</Path>
+          <BinarySignatures><InternalSignatureCollection>
+            <InternalSignature ID="1031">
+              <ByteSequence>
+                <SubSequence Position="1" SubSeqMinOffset="0">
+                  <Sequence>'office:version=' 22 '1.0' 22 {8-16} AA ??</Sequence>
+                </SubSequence>
+              </ByteSequence>
+            </InternalSignature>
+          </InternalSignatureCollection></BinarySignatures>
+        </File>
+      </Files>
+    </ContainerSignature>
+    <ContainerSignature Id="1050" ContainerType="ZIP">
+      <Description>Shared PUID</Description>
+      <Files><File><Path>a.txt</Path></File></Files>
+    </ContainerSignature>
+    <ContainerSignature Id="1060" ContainerType="ZIP">
+      <Description>Unknown PUID</Description>
+      <Files><File><Path>b.txt</Path></File></Files>
+    </ContainerSignature>
+  </ContainerSignatures>
+  <FileFormatMappings>
+    <FileFormatMapping signatureId="1000" Puid="fmt/40"/>
+    <FileFormatMapping signatureId="1020" Puid="fmt/412"/>
+    <FileFormatMapping signatureId="1030" Puid="x-fmt/3"/>
+    <FileFormatMapping signatureId="1050" Puid="fmt/412"/>
+    <FileFormatMapping signatureId="1060" Puid="fmt/0000"/>
+  </FileFormatMappings>
+  <TriggerPuids>
+    <TriggerPuid ContainerType="OLE2" Puid="fmt/111"/>
+    <TriggerPuid ContainerType="ZIP" Puid="x-fmt/263"/>
+  </TriggerPuids>
+</ContainerSignatureMapping>
+"""
+
+STANDARD_SIGNATURES = """<?xml version="1.0" encoding="UTF-8"?>
+<FFSignatureFile xmlns="http://www.nationalarchives.gov.uk/pronom/SignatureFile"
+    DateCreated="2021-01-01T00:00:00" Version="100">
+  <InternalSignatureCollection>
+    <InternalSignature ID="1" Specificity="Specific"/>
+  </InternalSignatureCollection>
+  <FileFormatCollection>
+    <FileFormat ID="1" Name="Word 6" PUID="fmt/40" MIMEType="application/msword">
+      <InternalSignatureID>1</InternalSignatureID>
+      <Extension>doc</Extension>
+    </FileFormat>
+    <FileFormat ID="2" Name="OOXML" PUID="fmt/412"
+        MIMEType="application/vnd.openxmlformats, application/zip">
+      <Extension>docx</Extension>
+      <Extension>docm</Extension>
+    </FileFormat>
+    <FileFormat ID="3" Name="ODT" PUID="x-fmt/3">
+      <Extension>odt</Extension>
+    </FileFormat>
+  </FileFormatCollection>
+</FFSignatureFile>
+"""
+
+
+def _write(path, text):
+    with io.open(str(path), "w", encoding="utf-8") as xml:
+        xml.write(text)
+    return str(path)
+
+
+@pytest.fixture
+def containersig(tmp_path):
+    """Path of a container signature file."""
+    return _write(tmp_path / "container-signature.xml", CONTAINER_SIGNATURES)
+
+
+@pytest.fixture
+def standardsig(tmp_path):
+    """Path of a DROID standard signature file."""
+    return _write(tmp_path / "DROID_SignatureFile.xml", STANDARD_SIGNATURES)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""Module for recording the inputs used to generate each skeleton
+container so that later runs only regenerate containers whose inputs have
+changed.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+
+# Increment when a change to the generator changes its output so that
+# every container is regenerated.
+MANIFEST_VERSION = 1
+
+# Name of the manifest in the skeleton-container-suite folder.
+MANIFEST_NAME = "incremental-manifest.json"
+
+
+def canonicalxml(element):
+    """Return a canonical serialisation of an element, independent of
+    attribute order and whitespace between elements.
+    """
+    parts = []
+    stack = [(element, False)]
+    while stack:
+        elem, closing = stack.pop()
+        if closing:
+            parts.append("</{}>".format(elem.tag))
+            continue
+        attributes = "".join(
+            ' {}="{}"'.format(key, value)
+            for key, value in sorted(elem.attrib.items())
+        )
+        parts.append("<{}{}>".format(elem.tag, attributes))
+        if elem.text and elem.text.strip():
+            parts.append(elem.text.strip())
+        stack.append((elem, True))
+        stack.extend((child, False) for child in reversed(list(elem)))
+    return "".join(parts)
+
+
+def inputhash(container, puid, extension, *options):
+    """Return a hash of the inputs used to generate a container, options
+    are any generator settings that change its output, e.g. the fill.
+    """
+    digest = hashlib.sha256()
+    values = (MANIFEST_VERSION, canonicalxml(container), puid, extension) + options
+    for value in values:
+        digest.update("{}\n".format(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class IncrementalManifest:
+    """Manifest of container ID to input hash and output path."""
+
+    def __init__(self, path):
+        """Load the manifest written by a previous run, if any."""
+        self.path = path
+        self.previous = {}
+        self.current = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as manifest:
+                    self.previous = json.load(manifest)
+            except ValueError as err:
+                logging.error("Ignoring unreadable manifest %s: %s", self.path, err)
+
+    def record(self, containerid, hash_, output):
+        """Record a container's inputs for this run."""
+        self.current[containerid] = {"hash": hash_, "output": output}
+
+    def unchanged(self, containerid, hash_, output):
+        """Record a container's inputs and return True if they match the
+        previous run and its output still exists.
+        """
+        self.record(containerid, hash_, output)
+        previous = self.previous.get(containerid)
+        if previous is None or output is None:
+            return False
+        return (
+            previous["hash"] == hash_
+            and previous["output"] == output
+            and os.path.exists(output)
+        )
+
+    def carryforward(self):
+        """Keep the entries of containers not generated in this run, e.g.
+        when generating a selection, so that their outputs are not pruned.
+        """
+        for containerid, entry in self.previous.items():
+            self.current.setdefault(containerid, entry)
+
+    def prune(self):
+        """Remove outputs from the previous run which are no longer
+        generated, e.g. for IDs removed from the signature file.
+        """
+        outputs = set(entry["output"] for entry in self.current.values())
+        pruned = []
+        for containerid, entry in sorted(self.previous.items()):
+            output = entry["output"]
+            if output is None or output in outputs:
+                continue
+            if os.path.exists(output):
+                logging.info(
+                    "Pruning output for container ID %s: %s", containerid, output
+                )
+                os.remove(output)
+                pruned.append(output)
+        return pruned
+
+    def save(self):
+        """Write the manifest for this run."""
+        with open(self.path, "w") as manifest:
+            json.dump(self.current, manifest, indent=1, sort_keys=True)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Module for writing a manifest of the generated skeletons as JSON lines.
+
+The first line records the provenance of the run, the signature files and
+their hashes and the generator settings. Each line after records one
+container as it finishes: its ID, PUIDs, type, output path, size and
+sha256, inner files and their sizes, timings and any errors. Lines are
+flushed as they are written so the manifest can be tailed during a run and
+read without re-opening or re-hashing the outputs.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import platform
+import sys
+import time
+
+from signaturecache import signaturehash, signaturepath
+
+# Increment when the form of a manifest line changes.
+JSONL_VERSION = 1
+
+
+def provenance(containersig, standardsig, **settings):
+    """Return the provenance record of a run, settings are the generator
+    options that change its output. Signature files given parsed are
+    recorded without a path.
+    """
+    record = {
+        "manifest_version": JSONL_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": "{} {}".format(
+            platform.python_implementation(), platform.python_version()
+        ),
+        "platform": sys.platform,
+        "container_signature_file": signaturepath(containersig),
+        "container_signature_sha256": signaturehash(containersig),
+        "standard_signature_file": signaturepath(standardsig),
+        "standard_signature_sha256": signaturehash(standardsig),
+    }
+    record.update(settings)
+    return {"provenance": record}
+
+
+class JsonlManifest:
+    """Manifest written a line at a time."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w")
+
+    def write(self, record):
+        """Write a record as a line and flush it."""
+        self.file.write(json.dumps(record, sort_keys=True))
+        self.file.write("\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+"""Module for reading the streams of OLE2 based skeletons, the Compound
+File Binary (CFB) objects written by PyWriteOLE2Containers or by Apache
+POI, see [MS-CFB]: Compound File Binary File Format.
+
+Only what is needed to check the content of a skeleton is read: the
+directory and the stream data. Streams in nested storages are returned
+with '/' separated paths.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import struct
+
+from PyWriteOLE2Containers import (
+    CFB_SIGNATURE,
+    DIRECTORY_ENTRY,
+    DIRECTORY_ENTRY_SIZE,
+    HEADER_DIFAT_ENTRIES,
+    NOSTREAM,
+    STGTY_STORAGE,
+    STGTY_STREAM,
+)
+
+# Sector numbers at or above this value mark the end of a chain or are
+# otherwise not sectors.
+MAXREGSECT = 0xFFFFFFFA
+
+HEADER = "<8s16sHHHHH6sIIIIIIIII109I"
+
+
+class CompoundFileError(ValueError):
+    """Raised when a file is not a compound file we can read."""
+
+
+class CompoundFileReader:
+    """Streams of a compound file held in memory."""
+
+    def __init__(self, data):
+        if data[:8] != CFB_SIGNATURE:
+            raise CompoundFileError("not a compound file")
+        header = struct.unpack_from(HEADER, data, 0)
+        self.data = data
+        self.sectorsize = 1 << header[5]
+        self.minisectorsize = 1 << header[6]
+        self.cutoff = header[12]
+        self.fat = self._fat(header[9], header[15], header[16], header[17:])
+        directory = self._chain(header[10], self.fat, self._sector)
+        self.entries = [
+            struct.unpack_from(DIRECTORY_ENTRY, directory, offset)
+            for offset in range(0, len(directory), DIRECTORY_ENTRY_SIZE)
+        ]
+        root = self.entries[0]
+        self.ministream = self._chain(root[11], self.fat, self._sector)[: root[12]]
+        minifat = self._chain(header[13], self.fat, self._sector)
+        self.minifat = struct.unpack("<{}I".format(len(minifat) // 4), minifat)
+
+    def _sector(self, sector):
+        offset = (sector + 1) * self.sectorsize
+        return self.data[offset : offset + self.sectorsize]
+
+    def _minisector(self, sector):
+        offset = sector * self.minisectorsize
+        return self.ministream[offset : offset + self.minisectorsize]
+
+    def _fat(self, count, difatstart, difatcount, difat):
+        """Return the FAT from the sectors listed in the header and DIFAT."""
+        entries = self.sectorsize // 4
+        difat = list(difat[:HEADER_DIFAT_ENTRIES])
+        sector = difatstart
+        for _ in range(difatcount):
+            if sector >= MAXREGSECT:
+                break
+            values = struct.unpack("<{}I".format(entries), self._sector(sector))
+            difat.extend(values[:-1])
+            sector = values[-1]
+        fat = []
+        for sector in difat[:count]:
+            fat.extend(struct.unpack("<{}I".format(entries), self._sector(sector)))
+        return fat
+
+    @staticmethod
+    def _chain(start, table, read):
+        """Return the data of the chain of sectors from start."""
+        parts = []
+        sector = start
+        # A chain cannot be longer than its table, which guards against
+        # loops in a corrupt file.
+        for _ in range(len(table)):
+            if sector >= MAXREGSECT or sector >= len(table):
+                break
+            parts.append(read(sector))
+            sector = table[sector]
+        return b"".join(parts)
+
+    def _stream(self, entry):
+        size = entry[12]
+        if size < self.cutoff:
+            data = self._chain(entry[11], self.minifat, self._minisector)
+        else:
+            data = self._chain(entry[11], self.fat, self._sector)
+        return data[:size]
+
+    def streams(self):
+        """Return a mapping of stream path to bytes."""
+        streams = {}
+        seen = set()
+        stack = [(self.entries[0][6], "")]
+        while stack:
+            sid, prefix = stack.pop()
+            if sid == NOSTREAM or sid >= len(self.entries) or sid in seen:
+                continue
+            seen.add(sid)
+            entry = self.entries[sid]
+            name = entry[0][: max(0, entry[1] - 2)].decode("utf-16-le")
+            stack.append((entry[4], prefix))
+            stack.append((entry[5], prefix))
+            if entry[2] == STGTY_STORAGE:
+                stack.append((entry[6], "{}{}/".format(prefix, name)))
+            elif entry[2] == STGTY_STREAM:
+                streams["{}{}".format(prefix, name)] = self._stream(entry)
+        return streams
+
+
+def read_compound_file(path):
+    """Return a mapping of stream path to bytes for a compound file."""
+    with open(path, "rb") as infile:
+        return CompoundFileReader(infile.read()).streams()
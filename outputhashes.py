@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""Module for recording the content hash of each output so that outputs
+whose content has not changed are not rewritten.
+
+Outputs are built in memory, or for large outputs in a temporary file,
+and are only written in place of the existing output when their hashes
+differ, leaving unchanged files, and their modification times, untouched
+for rsync and artifact stores.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import json
+import logging
+import os
+from io import BytesIO
+
+from signaturecache import filehash
+
+# Name of the hash record in the skeleton-container-suite folder.
+HASHES_NAME = "content-hashes.json"
+
+TEMP_SUFFIX = ".tmp"
+
+# Outputs are held in memory up to this size, larger outputs are written
+# to their temporary path as they grow.
+SPOOL_SIZE = 16 * 1024 * 1024
+
+
+def temppath(path):
+    """Return the temporary path an output is written to first."""
+    return "{}{}".format(path, TEMP_SUFFIX)
+
+
+def _replace(temp, path):
+    """Move a temporary output into place."""
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(temp, path)
+
+
+def writtenoutput(path):
+    """Return a SpooledOutput for an output already written to its
+    temporary path, e.g. by another program.
+    """
+    output = SpooledOutput(path)
+    output.file = open(temppath(path), "r+b")
+    output.file.seek(0, os.SEEK_END)
+    output.spilled = True
+    return output
+
+
+class SpooledOutput:
+    """Seekable file an output is written to, held in memory until it is
+    larger than maxsize and then written to its temporary path.
+    """
+
+    def __init__(self, path, maxsize=SPOOL_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.file = BytesIO()
+        self.spilled = False
+
+    def __getattr__(self, name):
+        # seek(), tell() and flush() are those of the file written to.
+        return getattr(self.file, name)
+
+    def write(self, data):
+        if not self.spilled and self.file.tell() + len(data) > self.maxsize:
+            self._spill()
+        return self.file.write(data)
+
+    def _spill(self):
+        spilled = open(temppath(self.path), "w+b")
+        spilled.write(self.file.getvalue())
+        spilled.seek(self.file.tell())
+        self.file = spilled
+        self.spilled = True
+
+    def sha256(self):
+        """Return the hash of the content written."""
+        if self.spilled:
+            self.file.flush()
+            return filehash(temppath(self.path))
+        return hashlib.sha256(self.file.getvalue()).hexdigest()
+
+    def save(self):
+        """Write the output to its temporary path and close it."""
+        if not self.spilled:
+            with open(temppath(self.path), "wb") as output:
+                output.write(self.file.getvalue())
+        self.file.close()
+
+    def discard(self):
+        """Close the output without writing it."""
+        self.file.close()
+        if self.spilled:
+            os.remove(temppath(self.path))
+
+    def commit(self):
+        """Move the output into place."""
+        self.save()
+        _replace(temppath(self.path), self.path)
+
+
+class OutputHashes:
+    """Record of output path to sha256 hash, size and modification time."""
+
+    def __init__(self, path):
+        """Load the record written by a previous run, if any."""
+        self.path = path
+        self.records = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as hashes:
+                    self.records = json.load(hashes)
+            except ValueError as err:
+                logging.error("Ignoring unreadable hashes %s: %s", self.path, err)
+
+    def _existinghash(self, path):
+        """Return the hash of an existing output, from the record when its
+        size and modification time still match.
+        """
+        stat = os.stat(path)
+        record = self.records.get(path)
+        if (
+            record is not None
+            and record["size"] == stat.st_size
+            and record["mtime"] == stat.st_mtime
+        ):
+            return record["sha256"]
+        return filehash(path)
+
+    def _unchanged(self, path, hash_):
+        return os.path.exists(path) and self._existinghash(path) == hash_
+
+    @staticmethod
+    def _record(path, hash_):
+        stat = os.stat(path)
+        return {"sha256": hash_, "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def commitoutput(self, output):
+        """Move a SpooledOutput into place unless the existing output has
+        the same content, in which case an output held in memory is never
+        written. Return whether the output was replaced and its record.
+        """
+        hash_ = output.sha256()
+        written = not self._unchanged(output.path, hash_)
+        if written:
+            output.commit()
+        else:
+            output.discard()
+        return written, self._record(output.path, hash_)
+
+    def save(self, records):
+        """Write the record with the (path, record) pairs from this run,
+        dropping outputs which no longer exist.
+        """
+        merged = dict(self.records)
+        merged.update(dict(records))
+        merged = dict(
+            (path, record) for path, record in merged.items() if os.path.exists(path)
+        )
+        with open(self.path, "w") as hashes:
+            json.dump(merged, hashes, indent=1, sort_keys=True)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""Module for laying out the subsequences of DROID byte sequences in a
+SegmentBuffer.
+
+Each SubSequence is placed directly by its Position, the Reference of its
+ByteSequence and its offsets, with LeftFragment and RightFragment elements
+written either side of its Sequence at their MinOffset. Each sequence is
+compiled and rendered once so a layout is linear in the number of parts.
+
+Sequences anchored to the beginning of the file are written first,
+followed by variable sequences and then sequences anchored to the end of
+the file. Position 1 is the subsequence nearest its anchor, so the
+subsequences of an EOFoffset sequence are written in reverse.
+"""
+
+from __future__ import print_function
+
+import collections
+import logging
+import os
+
+from signature2bytegenerator import SegmentBuffer, compile_signature, render
+
+BOF = "BOFoffset"
+EOF = "EOFoffset"
+
+# A ByteSequence rendered with the gaps between its subsequences. data is
+# written from minimum to maximum bytes from its anchor, maximum is None
+# when the offset is fixed.
+Placement = collections.namedtuple("Placement", "reference minimum maximum data")
+
+
+def offsetof(element, name):
+    """Return an integer offset attribute, zero when absent."""
+    value = element.get(name)
+    if value is None or not value.strip():
+        return 0
+    return int(value)
+
+
+def positionof(element):
+    """Return the Position of a subsequence or fragment."""
+    return int(element.get("Position", 1))
+
+
+def _fragments(subsequence, tag):
+    """Return the fragments of a subsequence ordered by position, nearest
+    the sequence first. Fragments sharing a position are alternatives and
+    only the first is written.
+    """
+    fragments = collections.OrderedDict()
+    for fragment in sorted(subsequence.findall(tag), key=positionof):
+        fragments.setdefault(positionof(fragment), fragment)
+    return list(fragments.values())
+
+
+def _render_text(text, fillbyte, out):
+    """Render sequence text to out at its current position."""
+    render(compile_signature(text or ""), fillbyte, out)
+
+
+def render_subsequence(subsequence, fillbyte, out):
+    """Render a SubSequence, with its fragments, to out at its current
+    position.
+    """
+    for fragment in reversed(_fragments(subsequence, "LeftFragment")):
+        _render_text(fragment.text, fillbyte, out)
+        out.fill(offsetof(fragment, "MinOffset"), fillbyte)
+    sequence = subsequence.find("Sequence")
+    if sequence is not None:
+        _render_text(sequence.text, fillbyte, out)
+    for fragment in _fragments(subsequence, "RightFragment"):
+        out.fill(offsetof(fragment, "MinOffset"), fillbyte)
+        _render_text(fragment.text, fillbyte, out)
+
+
+def place_bytesequence(bytesequence, fillbyte, rng=None):
+    """Return the Placement of a ByteSequence, or None when it has no
+    subsequences.
+    """
+    reference = bytesequence.get("Reference")
+    subsequences = sorted(bytesequence.findall("SubSequence"), key=positionof)
+    if not subsequences:
+        return None
+    if reference == EOF:
+        subsequences.reverse()
+    data = SegmentBuffer(rng)
+    last = len(subsequences) - 1
+    for idx, subsequence in enumerate(subsequences):
+        offset = offsetof(subsequence, "SubSeqMinOffset")
+        if reference != EOF and idx > 0:
+            data.fill(offset, fillbyte)
+        render_subsequence(subsequence, fillbyte, data)
+        if reference == EOF and idx < last:
+            data.fill(offset, fillbyte)
+    anchor = subsequences[last] if reference == EOF else subsequences[0]
+    maximum = anchor.get("SubSeqMaxOffset")
+    return Placement(
+        reference,
+        offsetof(anchor, "SubSeqMinOffset"),
+        None if maximum is None else offsetof(anchor, "SubSeqMaxOffset"),
+        data,
+    )
+
+
+def _anchor(placement, cursor, name):
+    """Return the offset from its anchor at which to write a placement,
+    at or after cursor where its offsets allow.
+    """
+    maximum = placement.maximum
+    if maximum is None:
+        maximum = placement.minimum
+    offset = min(max(cursor, placement.minimum), maximum)
+    if offset < cursor:
+        logging.warning("Overlapping %s sequences in: %s", placement.reference, name)
+    return offset
+
+
+def layout(bytesequences, fillbyte, name=None, out=None):
+    """Lay out ByteSequence elements in a SegmentBuffer and return it.
+
+    name identifies the file in log messages.
+    """
+    if out is None:
+        out = SegmentBuffer()
+    bofs = []
+    variables = []
+    eofs = []
+    for bytesequence in bytesequences:
+        placement = place_bytesequence(bytesequence, fillbyte, out.rng)
+        if placement is None:
+            continue
+        if placement.reference == BOF:
+            bofs.append(placement)
+        elif placement.reference == EOF:
+            eofs.append(placement)
+        else:
+            variables.append(placement)
+    for placement in bofs:
+        offset = _anchor(placement, len(out), name)
+        out.seek(0, os.SEEK_END)
+        out.fill(max(0, offset - len(out)), fillbyte)
+        out.seek(offset)
+        out.write(placement.data)
+    for placement in variables:
+        out.seek(0, os.SEEK_END)
+        out.fill(placement.minimum, fillbyte)
+        out.write(placement.data)
+    if not eofs:
+        return out
+    # Offsets from the end of the file to the end of each placement.
+    ends = []
+    distance = 0
+    for placement in eofs:
+        offset = _anchor(placement, distance, name)
+        ends.append(offset)
+        distance = max(distance, offset + len(placement.data))
+    base = len(out)
+    out.seek(base)
+    out.fill(distance, fillbyte)
+    for offset, placement in zip(ends, eofs):
+        out.seek(base + distance - offset - len(placement.data))
+        out.write(placement.data)
+    return out
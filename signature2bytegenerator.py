@@ -2,213 +2,592 @@
 
 """Singature2ByteGenerator will convert signature sequences to byte
 sequences that can be written to a file.
+
+Sequences are compiled once into an immutable intermediate representation
+(IR), a tuple of the tokens below, which is cached by sequence text and
+rendered to bytes as many times as needed.
 """
 
 from __future__ import print_function
 
+import binascii
+import collections
 import logging
+import os
 import random
 
 FILL_RANDOM = "RAND"
 
+# Maximum number of compiled sequences held in memory.
+CACHE_SIZE = 4096
+
+HEX_DIGITS = "0123456789abcdefABCDEF"
+
+# Opening bracket of each closing bracket.
+BRACKETS = {")": "(", "]": "[", "}": "{"}
+
+# Length written for an unbounded gap, i.e. '*', and the amount added to
+# the minimum of an open ended gap, i.e. '{n-*}'.
+WILDCARD_LENGTH = 20
+OPEN_GAP_PADDING = 10
+
+# A run of literal bytes.
+Literal = collections.namedtuple("Literal", "data")
+# A gap, '{n}', '{n-m}', '{n-*}', '??' or '*', maximum is None when the gap
+# is unbounded and length is the number of bytes rendered for it.
+Gap = collections.namedtuple("Gap", "minimum maximum length")
+# A single byte from a set of inclusive (low, high) ranges, e.g.
+# '[01:03]', '[22 27]' or '[!00]'.
+ByteSet = collections.namedtuple("ByteSet", "ranges inverted")
+# A single byte bitmask, '[&0F]' all bits, '[~0F]' any bits, or either
+# inverted with '!'.
+Mask = collections.namedtuple("Mask", "value anybits inverted")
+# Alternative sub-sequences, '(AA|BB)', the first option is rendered.
+Alternation = collections.namedtuple("Alternation", "options")
+
+# A run of length fill bytes held by a SegmentBuffer. Random fills are
+# reproduced from seed, start is the offset into that random stream.
+Fill = collections.namedtuple("Fill", "length fillbyte seed start")
+
+# Size of the chunks fills are expanded in when written out.
+CHUNK_SIZE = 65536
+# Size of the independently seeded blocks random fills are made from,
+# each generated up to the bytes needed in a single call.
+RANDOM_BLOCK_SIZE = 65536
+
+_compiled = collections.OrderedDict()
+
+
+class SignatureSyntaxError(ValueError):
+    """Raised when a sequence cannot be tokenized."""
+
+
+def clear_cache():
+    """Discard all compiled sequences."""
+    _compiled.clear()
+
+
+def cached_signatures():
+    """Return the compiled sequences as (sequence, IR) pairs, least
+    recently used first.
+    """
+    return list(_compiled.items())
+
+
+def load_cache(items):
+    """Add (sequence, IR) pairs, e.g. from cached_signatures, to the
+    cache.
+    """
+    for signature, ir in items:
+        _compiled.pop(signature, None)
+        if len(_compiled) >= CACHE_SIZE:
+            _compiled.popitem(last=False)
+        _compiled[signature] = ir
+
+
+def compile_signature(signature):
+    """Return the IR for a sequence, compiling it on first use.
+
+    Compiled sequences are held in a bounded least recently used cache
+    keyed by the sequence text.
+    """
+    try:
+        ir = _compiled.pop(signature)
+    except KeyError:
+        ir = _compile(signature)
+        if len(_compiled) >= CACHE_SIZE:
+            _compiled.popitem(last=False)
+    _compiled[signature] = ir
+    return ir
+
+
+def _compile(signature):
+    """Compile a sequence, logging and skipping syntax we cannot map."""
+    try:
+        return tuple(tokenize(signature))
+    except SignatureSyntaxError as err:
+        logging.error("Sequence not mapped: %s with err: %s", signature, err)
+        return ()
+
+
+def _find_close(signature, idx, close):
+    """Return the index of close matching the opening bracket at idx,
+    ignoring quoted text and brackets nested within, e.g. '(AA|(BB|CC))'.
+    """
+    if close == "'":
+        end = signature.find(close, idx)
+        if end == -1:
+            raise SignatureSyntaxError("missing \"'\"")
+        return end
+    opening = BRACKETS[close]
+    depth = 0
+    quoted = False
+    while idx < len(signature):
+        char = signature[idx]
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            pass
+        elif char == opening:
+            depth += 1
+        elif char == close:
+            depth -= 1
+            if depth <= 0:
+                return idx
+        idx += 1
+    raise SignatureSyntaxError("missing '{}'".format(close))
+
+
+def _split_options(syn):
+    """Split the contents of an alternation on its top-level '|'."""
+    options = []
+    depth = 0
+    quoted = False
+    start = 0
+    for idx, char in enumerate(syn):
+        if char == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            options.append(syn[start:idx])
+            start = idx + 1
+    options.append(syn[start:])
+    return options
+
+
+def tokenize(signature):
+    """Yield the IR tokens for a sequence, adjacent literals are merged.
+
+    Scanning is iterative so there is no limit on the length of a
+    sequence.
+    """
+    literal = bytearray()
+    idx = 0
+    while idx < len(signature):
+        char = signature[idx]
+        token = None
+        if char.isspace():
+            idx += 1
+            continue
+        if char in HEX_DIGITS:
+            pair = signature[idx : idx + 2]
+            if len(pair) != 2 or pair[1] not in HEX_DIGITS:
+                raise SignatureSyntaxError("odd hex digit at {}".format(idx))
+            literal.extend(binascii.unhexlify(pair))
+            idx += 2
+            continue
+        if char == "'":
+            end = _find_close(signature, idx + 1, "'")
+            literal.extend(signature[idx + 1 : end].encode("utf-8"))
+            idx = end + 1
+            continue
+        if char == "{":
+            end = _find_close(signature, idx, "}")
+            token = _parse_gap(signature[idx + 1 : end])
+        elif char == "[":
+            end = _find_close(signature, idx, "]")
+            token = _parse_square(signature[idx + 1 : end])
+        elif char == "(":
+            end = _find_close(signature, idx, ")")
+            options = _split_options(signature[idx + 1 : end])
+            token = Alternation(tuple(compile_signature(opt) for opt in options))
+        elif char == "?":
+            end = idx + 1 if signature[idx + 1 : idx + 2] == "?" else idx
+            token = Gap(1, 1, 1)
+        elif char == "*":
+            end = idx
+            token = Gap(0, None, WILDCARD_LENGTH)
+        else:
+            raise SignatureSyntaxError("unexpected '{}' at {}".format(char, idx))
+        if literal:
+            yield Literal(bytes(literal))
+            literal = bytearray()
+        yield token
+        idx = end + 1
+    if literal:
+        yield Literal(bytes(literal))
+
+
+def _parse_gap(syn):
+    """Parse the contents of '{n}', '{n-m}' or '{n-*}'."""
+    try:
+        if "-" not in syn:
+            return Gap(int(syn), int(syn), int(syn))
+        minimum, maximum = syn.split("-", 1)
+        if maximum.strip() == "*":
+            return Gap(int(minimum), None, int(minimum) + OPEN_GAP_PADDING)
+        return Gap(int(minimum), int(maximum), (int(minimum) + int(maximum)) // 2)
+    except ValueError:
+        raise SignatureSyntaxError("invalid gap '{{{}}}'".format(syn))
+
+
+def _parse_value(syn, idx):
+    """Parse a single byte value at idx, either a hex pair or a quoted
+    character. Return the value and the index following it.
+    """
+    if syn[idx] == "'":
+        end = _find_close(syn, idx + 1, "'")
+        value = bytearray(syn[idx + 1 : end].encode("utf-8"))
+        if not value:
+            raise SignatureSyntaxError("empty string in set")
+        return value[0], end + 1
+    pair = syn[idx : idx + 2]
+    if len(pair) != 2 or pair[0] not in HEX_DIGITS or pair[1] not in HEX_DIGITS:
+        raise SignatureSyntaxError("invalid byte '{}'".format(pair))
+    return int(pair, 16), idx + 2
+
+
+def _parse_square(syn):
+    """Parse the contents of a '[...]' set.
+
+    From matt palmer:
+    DROID 6 should, in fact, be capable of identifying bit-fields,
+    although there has not been a signature which uses this so far.
+    The byteseek library which DROID uses to process signatures has
+    an "all-bitmask" operator &, and an "any-bitmask" operator ~.
+    For example, if you wanted to specify that bit 4 must match
+    (but you don't care about the other bits), you could write
+    [&08].  Of if you wanted to specify that a byte must be odd,
+    then you could write [&01]. Or more complex multi-bit masks as
+    well. I guess you could also test for it not matching using the
+    DROID syntax for an inverted set !: [!&01].
+    """
+    syn = syn.strip()
+    inverted = syn.startswith("!")
+    if inverted:
+        syn = syn[1:].strip()
+    if syn[:1] in ("&", "~"):
+        value, _ = _parse_value(syn.strip(), 1)
+        return Mask(value, syn[:1] == "~", inverted)
+    ranges = []
+    idx = 0
+    while idx < len(syn):
+        if syn[idx].isspace():
+            idx += 1
+            continue
+        low, idx = _parse_value(syn, idx)
+        # Ranges are written as either '01:03' or '01-03'.
+        if syn[idx : idx + 1] in (":", "-"):
+            high, idx = _parse_value(syn, idx + 1)
+            ranges.append((low, high))
+            continue
+        ranges.append((low, low))
+    if not ranges:
+        raise SignatureSyntaxError("empty set '[{}]'".format(syn))
+    return ByteSet(tuple(ranges), inverted)
+
+
+def _render_byteset(token):
+    """Return a byte which satisfies a set."""
+    low, high = token.ranges[0]
+    if not token.inverted:
+        return (low + high) // 2
+    candidates = [low - 1, high + 1] + list(range(256))
+    for candidate in candidates:
+        if 0 <= candidate <= 255 and not any(
+            lo <= candidate <= hi for lo, hi in token.ranges
+        ):
+            return candidate
+    return 0
+
+
+def _render_mask(token):
+    """Return a byte which satisfies a bitmask."""
+    if token.inverted:
+        return 0
+    return token.value & 255
+
+
+def render(ir, fillbyte, out=None):
+    """Render the IR to a SegmentBuffer, gaps are held as lazy fills of
+    fillbyte.
+    """
+    if out is None:
+        out = SegmentBuffer()
+    stack = [iter(ir)]
+    while stack:
+        token = next(stack[-1], None)
+        if token is None:
+            stack.pop()
+        elif isinstance(token, Literal):
+            out.write(token.data)
+        elif isinstance(token, Gap):
+            out.fill(token.length, fillbyte)
+        elif isinstance(token, ByteSet):
+            out.write(bytes(bytearray([_render_byteset(token)])))
+        elif isinstance(token, Mask):
+            out.write(bytes(bytearray([_render_mask(token)])))
+        elif isinstance(token, Alternation):
+            stack.append(iter(token.options[0]))
+    return out
+
+
+def _random_bytes(rng, number):
+    """Return the first number bytes of the random stream of rng.
+
+    The stream is the 32 bit words of getrandbits, each little endian, so
+    fewer bytes are always a prefix of more. getrandbits is used rather
+    than randbytes, which is not available before Python 3.9, so a seed
+    gives the same bytes on every version.
+    """
+    if number == 0:
+        return b""
+    words = (number + 3) // 4
+    value = rng.getrandbits(32 * words)
+    if hasattr(value, "to_bytes"):
+        data = value.to_bytes(4 * words, "little")
+    else:
+        data = binascii.unhexlify("{:0{}x}".format(value, 8 * words))[::-1]
+    return data[:number]
+
+
+def _random_fill(seed, start, length):
+    """Return bytes start to start + length of the random stream for seed.
+
+    The stream is generated in blocks, each from its own seeded generator,
+    so any part of it can be reproduced without generating what precedes
+    it. Only the bytes of a block up to those needed are generated, so a
+    small gap costs little more than seeding its generator.
+    """
+    out = bytearray()
+    block, offset = divmod(start, RANDOM_BLOCK_SIZE)
+    while len(out) < length:
+        end = min(RANDOM_BLOCK_SIZE, offset + length - len(out))
+        data = _random_bytes(random.Random(seed * 2 ** 32 + block), end)
+        out.extend(data[offset:])
+        block += 1
+        offset = 0
+    return bytes(out)
+
+
+def _segment_length(segment):
+    if isinstance(segment, Fill):
+        return segment.length
+    return len(segment)
+
+
+def _split_segment(segment, length):
+    """Split a segment into two at length."""
+    if not isinstance(segment, Fill):
+        return [segment[:length], segment[length:]]
+    return [
+        segment._replace(length=length),
+        segment._replace(length=segment.length - length, start=segment.start + length),
+    ]
+
+
+def _expand(segment, chunksize):
+    """Yield the bytes of a segment in chunks of at most chunksize."""
+    if not isinstance(segment, Fill):
+        yield segment
+        return
+    if segment.fillbyte != FILL_RANDOM:
+        chunk = bytes(bytearray([segment.fillbyte])) * min(segment.length, chunksize)
+        for _ in range(segment.length // chunksize):
+            yield chunk
+        if segment.length % chunksize:
+            yield chunk[: segment.length % chunksize]
+        return
+    for offset in range(0, segment.length, chunksize):
+        yield _random_fill(
+            segment.seed,
+            segment.start + offset,
+            min(chunksize, segment.length - offset),
+        )
+
+
+class SegmentBuffer:
+    """A file-like byte buffer which holds runs of fill bytes as (length,
+    fill byte) records. Fills are only expanded, in chunks, when the
+    buffer is written out so memory use depends on the literal bytes held
+    rather than the size of the file.
+
+    Writes behave as they do for io.BytesIO, overwriting from the current
+    position.
+    """
+
+    def __init__(self, rng=None):
+        """Random fills are seeded from rng, or the random module."""
+        self.segments = []
+        self.size = 0
+        self.position = 0
+        self.rng = random if rng is None else rng
+
+    def __len__(self):
+        return self.size
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = offset
+        return self.position
+
+    def write(self, data):
+        """Write bytes, or the contents of another SegmentBuffer."""
+        if isinstance(data, SegmentBuffer):
+            self._splice(list(data.segments), data.size)
+            return data.size
+        data = bytes(data)
+        if data:
+            self._splice([data], len(data))
+        return len(data)
+
+    def fill(self, length, fillbyte):
+        """Write length bytes of fillbyte, or random bytes."""
+        if length <= 0:
+            return
+        seed = None
+        if fillbyte == FILL_RANDOM:
+            seed = self.rng.getrandbits(32)
+        self._splice([Fill(length, fillbyte, seed, 0)], length)
+
+    def _split(self, position):
+        """Return the index of the segment starting at position, splitting
+        the segment which spans it if needed.
+        """
+        offset = 0
+        for idx, segment in enumerate(self.segments):
+            if offset == position:
+                return idx
+            length = _segment_length(segment)
+            if offset + length > position:
+                split = _split_segment(segment, position - offset)
+                self.segments[idx : idx + 1] = split
+                return idx + 1
+            offset += length
+        return len(self.segments)
+
+    def _splice(self, segments, length):
+        if self.position > self.size:
+            # Writing past the end pads with zeros as BytesIO does.
+            self.segments.append(Fill(self.position - self.size, 0, None, 0))
+            self.size = self.position
+        if self.position == self.size:
+            self.segments.extend(segments)
+        else:
+            start = self._split(self.position)
+            end = self._split(min(self.position + length, self.size))
+            self.segments[start:end] = segments
+        self.position += length
+        self.size = max(self.size, self.position)
+
+    def writeto(self, stream, chunksize=CHUNK_SIZE):
+        """Write the buffer to stream, expanding fills in chunks."""
+        for segment in self.segments:
+            for chunk in _expand(segment, chunksize):
+                stream.write(chunk)
+
+    def getvalue(self):
+        """Return the complete contents of the buffer as bytes."""
+        return b"".join(
+            chunk for segment in self.segments for chunk in _expand(segment, CHUNK_SIZE)
+        )
+
+
+def fill_bytes(number, fillbyte):
+    """Create 'n' bytes of fillbyte, or random bytes."""
+    buffer_ = SegmentBuffer()
+    buffer_.fill(number, fillbyte)
+    return bytearray(buffer_.getvalue())
+
+
+def _format_value(value):
+    return "{:02x}".format(value)
+
+
+def format_signature(ir):
+    """Return the canonical sequence text for the IR.
+
+    Compiling the text again gives back an equivalent IR.
+    """
+    out = []
+    for token in ir:
+        if isinstance(token, Literal):
+            out.append(binascii.hexlify(token.data).decode("ascii"))
+        elif isinstance(token, Gap):
+            if token.maximum is None:
+                if token.length == WILDCARD_LENGTH and token.minimum == 0:
+                    out.append("*")
+                else:
+                    out.append("{{{}-*}}".format(token.minimum))
+            elif token.minimum == token.maximum:
+                out.append("{{{}}}".format(token.minimum))
+            else:
+                out.append("{{{}-{}}}".format(token.minimum, token.maximum))
+        elif isinstance(token, ByteSet):
+            ranges = " ".join(
+                _format_value(low)
+                if low == high
+                else "{}:{}".format(_format_value(low), _format_value(high))
+                for low, high in token.ranges
+            )
+            out.append("[{}{}]".format("!" if token.inverted else "", ranges))
+        elif isinstance(token, Mask):
+            out.append(
+                "[{}{}{}]".format(
+                    "!" if token.inverted else "",
+                    "~" if token.anybits else "&",
+                    _format_value(token.value),
+                )
+            )
+        elif isinstance(token, Alternation):
+            out.append(
+                "({})".format("|".join(format_signature(opt) for opt in token.options))
+            )
+    return "".join(out)
+
 
 class Sig2ByteGenerator:
     """Sig2ByteGenerator encapsulates our byte conversion operations.
     """
 
     def __init__(self):
-        self.component_list = []
-        self.open_syntax = ["{", "(", "[", "?", "*"]
         self.fillbyte = None
 
-    def __del__(self):
-        del self.component_list[:]
-
     @staticmethod
     def set_fillbyte(fillvalue):
+        """Return the fill byte for a fill value, FILL_RANDOM outside
+        0-255.
+        """
         if fillvalue < 0 or fillvalue > 255:
             logging.debug("Fill byte set to RANDOM")
             fillbyte = FILL_RANDOM
             return fillbyte
         return fillvalue
 
-    def check_syntax(self, signature):
-        for i in self.open_syntax:
-            if signature.find(i) > -1:
-                return True
-        return False
-
     def create_bytes(self, number):
         """Create 'n' bytes.
 
         :param number: number of bytes to create
-        :return: True when done
+        :return: bytearray of fill bytes
         """
-        for _ in range(number):
-            if self.fillbyte == FILL_RANDOM:
-                self.component_list.append(
-                    hex(random.randint(0, 255))
-                    .replace("0x", "")
-                    .zfill(2)
-                    .replace("L", "")
-                )
-            else:
-                self.component_list.append(
-                    hex(self.fillbyte).replace("0x", "").zfill(2).replace("L", "")
-                )
-        return True
-
-    def process_curly(self, syn):
-        """Process sequence with curly brackets."""
-        syn = syn.replace("{", "")
-        syn = syn.replace("}", "")
-        if syn.find("-") == -1:
-            self.create_bytes(int(syn))
-        else:
-            new_str = syn.split("-")
-            if new_str[1] == "*":
-                val = int(new_str[0])
-                self.create_bytes(val + 10)
-            else:
-                val = (int(new_str[0]) + int(new_str[1])) / 2
-                self.create_bytes(val)
-
-    def process_square(self, syn):
-        """Process sequence with square brackets."""
-        if "-" in syn:
-            logging.debug("Replacing dash '-' in '%s'", syn)
-            syn = syn.replace("-", ":")
-        syn = syn.replace("[", "")
-        syn = syn.replace("]", "")
-        # convert to ints and find mean value in range
-        if syn.find(":") > -1:
-            self.sqr_colon(syn)
-        # convert to ints and -1 so don't equal hex in not clause
-        elif syn.find("!") > -1:
-            self.sqr_not(syn)
-
-    def process_mask(self, syn, inverted=False):
-        """Process sequence with mask."""
-        syn = syn.replace("[", "")
-        syn = syn.replace("]", "")
-        val = 0
-        # negate first, else, mask...
-        if "!&" in syn and inverted is True:
-            syn = syn.replace("!&", "")
-            byte = int(syn, 16)
-            mask = byte & 0
-            val = mask
-        elif "&" in syn and inverted is False:
-            syn = syn.replace("&", "")
-            byte = int(syn, 16)
-            mask = byte & 255
-            val = mask
-        self.component_list.append(hex(val).replace("0x", "").zfill(2).replace("L", ""))
-
-    def sqr_colon(self, syn):
-        # convert to ints and find mean value in range
-        if syn.find(":") > -1:
-            new_str = syn.split(":")
-            val = (int(new_str[0], 16) + int(new_str[1], 16)) / 2
-            self.component_list.append(
-                hex(val).replace("0x", "").zfill(2).replace("L", "")
-            )
-
-    def sqr_not(self, syn):
-        syn = syn.replace("!", "")
-        seq = list(map(ord, syn.decode("hex")))
-        for idx, _ in enumerate(seq):
-            if seq[idx] == 0:
-                seq[idx] = seq[idx] + 1
-            else:
-                seq[idx] = seq[idx] - 1
-            self.component_list.append(
-                hex(seq[idx]).replace("0x", "").zfill(2).replace("L", "")
-            )
+        return fill_bytes(number, self.fillbyte)
 
-    def process_thesis(self, syn):
-        syn = syn.replace("(", "").replace(")", "")
-        index = syn.find("|")
-        syn = syn[0:index]
-        if syn.find("[") != -1:
-            self.process_square(syn)
-        seq = list(map(ord, syn.decode("hex")))
-        for idx in range(seq.__len__()):
-            self.component_list.append(
-                hex(seq[idx]).replace("0x", "").zfill(2).replace("L", "")
-            )
+    def map_signature(self, bofoffset, signature, eofoffset, fillvalue=-1):
+        """Map signature to a bytearray."""
+        segments = self.map_segments(bofoffset, signature, eofoffset, fillvalue)
+        return bytearray(segments.getvalue())
 
-    def detailed_check(self, signature):
-        index = 0
-        if signature.__len__() > 0:
-            check_byte = signature[0]
-            if check_byte == "{":
-                index = signature.find("}")
-                syn = signature[0 : index + 1]
-                self.process_curly(syn)
-            elif check_byte == "[":
-                # We may have a bitmask... deal with it here...
-                #
-                # From matt palmer:
-                # DROID 6 should, in fact, be capable of identifying bit-fields,
-                # although there has not been a signature which uses this so far.
-                # The byteseek library which DROID uses to process signatures has
-                # an "all-bitmask" operator &, and an "any-bitmask" operator ~.
-                # For example, if you wanted to specify that bit 4 must match
-                # (but you don't care about the other bits), you could write
-                # [&08].  Of if you wanted to specify that a byte must be odd,
-                # then you could write [&01]. Or more complex multi-bit masks as
-                # well. I guess you could also test for it not matching using the
-                # DROID syntax for an inverted set !: [!&01].
-                check_inverted = signature[1:3]
-                if check_inverted == "!&":
-                    index = signature.find("]")
-                    syn = signature[1 : index + 1]
-                    self.process_mask(syn, True)
-                else:
-                    check_mask = signature[1:2]
-                    if check_mask == "&":
-                        index = signature.find("]")
-                        syn = signature[0 : index + 1]
-                        self.process_mask(syn)
-                index = signature.find("]")
-                syn = signature[0 : index + 1]
-                self.process_square(syn)
-            elif check_byte == "?":
-                syn = signature[0:index]
-                index = 1
-                self.create_bytes(1)
-            elif check_byte == "(":
-                index = signature.find(")")
-                syn = signature[0 : index + 1]
-                self.process_thesis(syn)
-            elif check_byte == "*":
-                self.create_bytes(20)
-
-        return signature[index + 1 :]
-
-    def process_signature(self, signature):
-        """Process a given signature into byte sequences for writing
-        to file.
+    def map_segments(self, bofoffset, signature, eofoffset, fillvalue=-1):
+        """Map signature to a SegmentBuffer with gaps and offsets held as
+        lazy fills.
         """
-        if self.check_syntax(signature) is not True:
-            self.component_list.append(signature)
-            return
-        for idx, val in enumerate(signature):
-            if not val.isalnum():  # are all alphanumeric
-                element = signature[0:idx]
-                if element != "":  # may not be anything to append e.g. '??ab'
-                    self.component_list.append(element)
-                signature = self.detailed_check(signature[idx:])
-                break
-        self.process_signature(signature)
-
-    def map_signature(self, bofoffset, signature, eofoffset, fillvalue=-1):
-        """Map signature to byte sequences."""
         self.fillbyte = self.set_fillbyte(fillvalue)
+        segments = SegmentBuffer()
         if bofoffset != "null":
-            self.create_bytes(int(bofoffset))  # dangerous? need to check type?
-        self.process_signature(signature)
+            # dangerous? need to check type?
+            segments.fill(int(bofoffset), self.fillbyte)
+        render(compile_signature(signature), self.fillbyte, segments)
         if eofoffset != "null":
-            self.create_bytes(int(eofoffset))
-        return self.component_list
+            segments.fill(int(eofoffset), self.fillbyte)
+        return segments
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""Module for caching parsed signature files and compiled sequences on
+disk between runs.
+
+Entries are pickled to a cache folder and keyed by the content hash of the
+signature file they derive from, or of its serialisation when it is given
+parsed, so an edited file is never served stale data. Entries are read
+through mmap where available. The folder is bounded in size with the least
+recently used entries evicted first.
+
+Loading a pickle can run arbitrary code, so the cache folder must be
+trusted like the program itself. Where ownership is available, entries
+are only loaded from a folder, and files, owned by the user and not
+writable by anyone else.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import hashlib
+import logging
+import os
+import stat
+import sys
+import tempfile
+import xml.etree.ElementTree as etree
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import mmap
+except ImportError:
+    # Jython does not provide mmap.
+    mmap = None
+
+# Increment when the form of a cached entry changes.
+CACHE_VERSION = 2
+
+# Default bound on the size of the cache folder in bytes.
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SUFFIX = ".pickle"
+
+
+def filehash(path):
+    """Return the sha256 hash of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def signaturepath(signature):
+    """Return the path of a signature file given as a path, a parsed root
+    element or a handler holding its path in sigfile, None when parsed.
+    """
+    signature = getattr(signature, "sigfile", signature)
+    if etree.iselement(signature):
+        return None
+    return signature
+
+
+def signaturehash(signature):
+    """Return the sha256 hash of a signature file given as for
+    signaturepath, hashing a parsed root element as serialised.
+    """
+    path = signaturepath(signature)
+    if path is None:
+        return hashlib.sha256(etree.tostring(signature)).hexdigest()
+    return filehash(path)
+
+
+def trusted(path):
+    """Return True if path is owned by the user and not writable by the
+    group or others, always True where ownership is unavailable.
+    """
+    if not hasattr(os, "getuid"):
+        # Windows and Jython.
+        return True
+    status = os.stat(path)
+    return status.st_uid == os.getuid() and not status.st_mode & (
+        stat.S_IWGRP | stat.S_IWOTH
+    )
+
+
+class SignatureCache:
+    """Folder of pickled entries keyed by kind and file content hash."""
+
+    def __init__(self, folder, maxsize=DEFAULT_CACHE_SIZE):
+        self.folder = folder
+        self.maxsize = maxsize
+        self.hashes = {}
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder, 0o700)
+        self.enabled = trusted(self.folder)
+        if not self.enabled:
+            logging.warning(
+                "Not caching in %s, it must be owned by the user and not "
+                "writable by others",
+                self.folder,
+            )
+            return
+        self.evict()
+
+    def key(self, signature):
+        """Return the cache key for a signature file given as for
+        signaturepath, hashing it once.
+        """
+        if signature not in self.hashes:
+            self.hashes[signature] = signaturehash(signature)
+        return self.hashes[signature]
+
+    def _entrypath(self, kind, signature):
+        # Pickles written by Python 2 and 3 differ in their string types.
+        name = "{}-v{}-py{}-{}{}".format(
+            kind, CACHE_VERSION, sys.version_info[0], self.key(signature), SUFFIX
+        )
+        return os.path.join(self.folder, name)
+
+    def get(self, kind, signature):
+        """Return the entry of kind for a signature file or None."""
+        if not self.enabled:
+            return None
+        entrypath = self._entrypath(kind, signature)
+        if not os.path.exists(entrypath):
+            return None
+        if not trusted(entrypath):
+            logging.warning("Ignoring cache entry writable by others: %s", entrypath)
+            return None
+        try:
+            with open(entrypath, "rb") as entry:
+                if mmap is None:
+                    value = pickle.load(entry)
+                else:
+                    mapped = mmap.mmap(entry.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        value = pickle.load(mapped)
+                    finally:
+                        mapped.close()
+        except (EnvironmentError, EOFError, ValueError, pickle.UnpicklingError) as err:
+            logging.error("Ignoring unreadable cache entry %s: %s", entrypath, err)
+            return None
+        # Record the access for least recently used eviction.
+        os.utime(entrypath, None)
+        logging.debug("Cache hit: %s", entrypath)
+        return value
+
+    def put(self, kind, signature, value):
+        """Store the entry of kind for a signature file."""
+        if not self.enabled:
+            return
+        entrypath = self._entrypath(kind, signature)
+        # Write to a temporary file first so readers never see a partial
+        # entry.
+        handle, temppath = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        with os.fdopen(handle, "wb") as entry:
+            pickle.dump(value, entry, pickle.HIGHEST_PROTOCOL)
+        if os.path.exists(entrypath):
+            os.remove(entrypath)
+        os.rename(temppath, entrypath)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries while the folder is
+        larger than maxsize, returning the paths removed.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.folder):
+            if not name.endswith(SUFFIX):
+                continue
+            entrypath = os.path.join(self.folder, name)
+            stat = os.stat(entrypath)
+            entries.append((stat.st_mtime, entrypath, stat.st_size))
+            total += stat.st_size
+        evicted = []
+        for _, entrypath, size in sorted(entries):
+            if total <= self.maxsize:
+                break
+            os.remove(entrypath)
+            evicted.append(entrypath)
+            total -= size
+            logging.info("Evicted cache entry: %s", entrypath)
+        return evicted
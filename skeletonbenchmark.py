@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark harness for the skeleton generator.
+
+Synthetic DROID container and standard signature files are written at a
+configurable scale so that the generator can be timed, and regressions
+caught, without real PRONOM files.
+
+Usage:
+    python skeletonbenchmark.py --containers 500 --output results.json
+    python skeletonbenchmark.py --compare results.json
+"""
+
+from __future__ import print_function, unicode_literals
+
+import argparse
+import collections
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import xml.etree.ElementTree as etree
+
+import signature2bytegenerator
+from DroidStandardSigFileClass import DroidStandardSigFileClass
+from skeletoncontainergenerator import SkeletonContainerGenerator
+from skeletonprofiler import timer
+
+NS = "http://www.nationalarchives.gov.uk/pronom/SignatureFile"
+
+# Version of the results format, results are only compared when equal.
+RESULTS_VERSION = 1
+
+# Ratio of current to baseline time above which a benchmark is reported
+# as a regression.
+DEFAULT_THRESHOLD = 1.25
+
+DEFAULTS = collections.OrderedDict(
+    [
+        ("containers", 200),
+        ("files", 3),
+        ("sequence_length", 16),
+        ("gap", 64),
+        ("shared_puids", 0.25),
+        ("seed", 1),
+    ]
+)
+
+
+def _sequence(rng, length, gap):
+    """Return a random sequence in DROID syntax of roughly length bytes
+    with a gap, byte set and alternation.
+    """
+    half = max(1, length // 2)
+    first = "".join("{:02X}".format(rng.randint(0, 255)) for _ in range(half))
+    second = "".join("{:02X}".format(rng.randint(0, 255)) for _ in range(half))
+    low = rng.randint(0, 200)
+    return "{} {{{}-{}}} [{:02X}:{:02X}] ({}|{}) '{}'".format(
+        first,
+        gap // 2,
+        gap,
+        low,
+        low + 50,
+        first[:2],
+        second[:2],
+        second[:8],
+    )
+
+
+def _containerpuid(rng, idx, shared_puids):
+    """Return the PUID for a container, shared_puids is the ratio of
+    containers which share a PUID with an earlier container.
+    """
+    if idx and rng.random() < shared_puids:
+        return "fmt/{}".format(rng.randint(0, idx - 1))
+    return "fmt/{}".format(idx)
+
+
+def synthesize(folder, containers, files, sequence_length, gap, shared_puids, seed):
+    """Write a container signature file and a standard signature file to
+    folder and return their paths.
+    """
+    rng = random.Random(seed)
+    mapping = etree.Element("ContainerSignatureMapping", schemaVersion="1.0")
+    signatures = etree.SubElement(mapping, "ContainerSignatures")
+    formatmappings = etree.SubElement(mapping, "FileFormatMappings")
+    puids = []
+    for idx in range(containers):
+        containertype = "OLE2" if idx % 4 == 0 else "ZIP"
+        signature = etree.SubElement(
+            signatures,
+            "ContainerSignature",
+            Id=str(idx),
+            ContainerType=containertype,
+        )
+        etree.SubElement(signature, "Description").text = "Synthetic {}".format(idx)
+        filelist = etree.SubElement(signature, "Files")
+        for fileidx in range(files):
+            file_ = etree.SubElement(filelist, "File")
+            if containertype == "ZIP" and fileidx:
+                path = "folder{}/file{}".format(fileidx, fileidx)
+            else:
+                path = "File{}".format(fileidx)
+            etree.SubElement(file_, "Path").text = path
+            if fileidx == files - 1 and fileidx:
+                # Leave one file without a signature to write empty data.
+                continue
+            collection = etree.SubElement(
+                etree.SubElement(file_, "BinarySignatures"),
+                "InternalSignatureCollection",
+            )
+            internal = etree.SubElement(
+                collection, "InternalSignature", ID=str(idx * files + fileidx)
+            )
+            bytesequence = etree.SubElement(
+                internal, "ByteSequence", Reference="BOFoffset"
+            )
+            subsequence = etree.SubElement(
+                bytesequence,
+                "SubSequence",
+                Position="1",
+                SubSeqMinOffset=str(rng.randint(0, gap)),
+            )
+            etree.SubElement(subsequence, "Sequence").text = _sequence(
+                rng, sequence_length, gap
+            )
+        puid = _containerpuid(rng, idx, shared_puids)
+        puids.append(puid)
+        etree.SubElement(
+            formatmappings, "FileFormatMapping", signatureId=str(idx), Puid=puid
+        )
+    etree.SubElement(mapping, "TriggerPuids")
+    containersig = os.path.join(folder, "container-signature.xml")
+    etree.ElementTree(mapping).write(containersig, encoding="UTF-8")
+
+    sigfile = etree.Element("{{{}}}FFSignatureFile".format(NS), Version="1")
+    etree.SubElement(sigfile, "{{{}}}InternalSignatureCollection".format(NS))
+    collection = etree.SubElement(sigfile, "{{{}}}FileFormatCollection".format(NS))
+    for idx, puid in enumerate(sorted(set(puids))):
+        fileformat = etree.SubElement(
+            collection,
+            "{{{}}}FileFormat".format(NS),
+            ID=str(idx),
+            Name="Synthetic {}".format(puid),
+            PUID=puid,
+            MIMEType="application/octet-stream",
+        )
+        extension = etree.SubElement(fileformat, "{{{}}}Extension".format(NS))
+        extension.text = "x{}".format(idx)
+    standardsig = os.path.join(folder, "standard-signature.xml")
+    etree.ElementTree(sigfile).write(standardsig, encoding="UTF-8")
+    return containersig, standardsig
+
+
+def _sequences(containersig):
+    """Return the sequences and offsets in a container signature file."""
+    sequences = []
+    for subsequence in etree.parse(containersig).iter("SubSequence"):
+        sequences.append(
+            (subsequence.get("SubSeqMinOffset"), subsequence.find("Sequence").text)
+        )
+    return sequences
+
+
+def _time(function, repeat, setup=None):
+    """Return the minimum and mean time of repeat calls to function."""
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = timer()
+        function()
+        times.append(timer() - start)
+    result = collections.OrderedDict()
+    result["min"] = min(times)
+    result["mean"] = sum(times) / len(times)
+    result["repeat"] = repeat
+    return result
+
+
+def bench_generate(containersig, standardsig, folder, repeat):
+    """Time SkeletonContainerGenerator.generateskeletonfiles writing into
+    folder.
+    """
+    cwd = os.getcwd()
+    os.chdir(folder)
+
+    def setup():
+        if os.path.exists("skeleton-container-suite"):
+            shutil.rmtree("skeleton-container-suite")
+        signature2bytegenerator.clear_cache()
+
+    def generate():
+        skg = SkeletonContainerGenerator(containersig, standardsig, False)
+        skg.generateskeletonfiles()
+
+    try:
+        return _time(generate, repeat, setup)
+    finally:
+        os.chdir(cwd)
+
+
+def bench_map_signature(containersig, repeat):
+    """Time Sig2ByteGenerator.map_signature over every sequence, compiling
+    each sequence afresh.
+    """
+    sequences = _sequences(containersig)
+    sig2map = signature2bytegenerator.Sig2ByteGenerator()
+
+    def map_signatures():
+        for offset, sequence in sequences:
+            sig2map.map_signature(offset, sequence, "null", 0)
+
+    return _time(map_signatures, repeat, signature2bytegenerator.clear_cache)
+
+
+def bench_retrieve_ext_list(standardsig, repeat):
+    """Time DroidStandardSigFileClass.retrieve_ext_list for every PUID."""
+    handler = DroidStandardSigFileClass(standardsig)
+    puids = list(handler.formats)
+
+    def retrieve():
+        handler.retrieve_ext_list(puids)
+
+    return _time(retrieve, repeat)
+
+
+def run(parameters, repeat):
+    """Synthesize signature files and return the benchmark results."""
+    folder = tempfile.mkdtemp(prefix="skeleton-benchmark-")
+    try:
+        containersig, standardsig = synthesize(folder, **parameters)
+        benchmarks = collections.OrderedDict()
+        benchmarks["generateskeletonfiles"] = bench_generate(
+            containersig, standardsig, folder, repeat
+        )
+        benchmarks["map_signature"] = bench_map_signature(containersig, repeat)
+        benchmarks["retrieve_ext_list"] = bench_retrieve_ext_list(
+            standardsig, repeat
+        )
+    finally:
+        shutil.rmtree(folder)
+    results = collections.OrderedDict()
+    results["version"] = RESULTS_VERSION
+    results["python"] = "{} {}".format(
+        platform.python_implementation(), platform.python_version()
+    )
+    results["parameters"] = parameters
+    results["benchmarks"] = benchmarks
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Print the ratio of each result to a baseline and return the names
+    of benchmarks slower than threshold times the baseline.
+    """
+    if baseline.get("version") != results["version"]:
+        logging.error("Baseline results version differs, not comparing")
+        return []
+    if baseline.get("parameters") != results["parameters"]:
+        logging.warning("Baseline was run with different parameters")
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None or not previous["min"]:
+            continue
+        ratio = result["min"] / previous["min"]
+        status = "ok"
+        if ratio > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        print(
+            "{}: {:.4f}s against {:.4f}s ({:.2f}x) {}".format(
+                name, result["min"], previous["min"], ratio, status
+            )
+        )
+    return regressions
+
+
+def main():
+    """Primary entry point for the benchmark harness."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the generator with synthetic signature files."
+    )
+    for name, default in DEFAULTS.items():
+        parser.add_argument(
+            "--{}".format(name.replace("_", "-")),
+            dest=name,
+            type=type(default),
+            default=default,
+            help="Default: {}".format(default),
+        )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Number of runs of each benchmark."
+    )
+    parser.add_argument("--output", help="Write results as JSON to a file.")
+    parser.add_argument("--compare", help="Compare results with a JSON baseline.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Ratio to the baseline reported as a regression.",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    parameters = collections.OrderedDict(
+        (name, getattr(args, name)) for name in DEFAULTS
+    )
+    results = run(parameters, args.repeat)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=1)
+    if args.compare:
+        with open(args.compare, "r") as baseline:
+            regressions = compare(results, json.load(baseline), args.threshold)
+        if regressions:
+            sys.exit(1)
+        return
+    print(json.dumps(results, indent=1))
+
+
+if __name__ == "__main__":
+    main()
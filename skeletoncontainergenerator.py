@@ -8,17 +8,36 @@ from __future__ import print_function
 
 import argparse
 import collections
+import hashlib
 import logging
 import os
 import platform
+import random
 import sys
 import xml.etree.ElementTree as etree
-import zipfile
-from io import BytesIO
 from shutil import rmtree
 
+import sequencelayout
 import signature2bytegenerator
-from DroidStandardSigFileClass import DroidStandardSigFileClass
+from checkpointjournal import JOURNAL_NAME, CheckpointJournal
+from DroidStandardSigFileClass import NOTFOUND, DroidStandardSigFileClass
+from incrementalmanifest import MANIFEST_NAME, IncrementalManifest, inputhash
+from jsonlmanifest import JsonlManifest, provenance
+from outputhashes import HASHES_NAME, TEMP_SUFFIX, OutputHashes
+from signaturecache import DEFAULT_CACHE_SIZE, SignatureCache, signaturehash
+from skeletonprofiler import NullProfiler, PhaseProfiler, timer
+from skeletonshards import mergeshards, parseshard, shardof, writeshard
+from skeletonverifier import printverification, verifycontainers
+from skeletonwriters import (
+    ZIP_COMPRESSION,
+    BundleWriter,
+    DirectoryWriter,
+    OLE2Writer,
+    WriterError,
+    ZipWriter,
+    parsecompression,
+)
+from xmlstream import iterparse_elements
 
 LOGFORMAT = (
     "%(asctime)-15s %(levelname)s: %(filename)s:%(lineno)s:%(funcName)s(): %(message)s"
@@ -27,33 +46,129 @@ DATEFORMAT = "%Y-%m-%d %H:%M:%S"
 
 logging.basicConfig(format=LOGFORMAT, datefmt=DATEFORMAT, level="INFO")
 
-OLE_WRITE = None
+# Containers sent to a worker process at a time when writing in parallel.
+WORKER_CHUNKSIZE = 4
+
+# Chunks per worker process sent ahead of those merged, bounding the
+# containers held in memory when streaming.
+WORKER_AHEAD = 4
+
+# Value of --fill selecting random fill.
+FILL_RANDOM_OPTION = "random"
+
+# Folder the suite is written to.
+SUITE_FOLDER = "skeleton-container-suite"
+
+# Contents of inner files which have no binary signatures.
+EMPTY_FILE = b"File empty. Data written by Skeleton Generator."
+
+try:
+    import multiprocessing
+except ImportError:
+    # Jython does not provide multiprocessing.
+    multiprocessing = None
+
+try:
+    import cProfile
+except ImportError:
+    cProfile = None
+
 java = bool(platform.system() == "Java")
 if not java:
-    logging.info("Not using Jython. Writing ZIP containers only.")
+    logging.info("Not using Jython. Writing OLE2 containers natively.")
+    from PyWriteOLE2Containers import WriteOLE2Containers
 else:
     from JWriteOLE2Containers import WriteOLE2Containers
 
-    OLE_WRITE = WriteOLE2Containers()
+OLE_WRITE = WriteOLE2Containers()
 
 
-class ContainerPart:
-    """Maintain state amongst container parts."""
+# Result of mapping container signature IDs to output filenames, IDs
+# listed more than once, PUIDs shared by more than one ID and PUIDs not
+# found in the standard signature file.
+ContainerMapping = collections.namedtuple(
+    "ContainerMapping", "filenames duplicateids duplicatepuids invalidpuids"
+)
 
-    pos = None
-    offset = None
-    minoff = None
-    maxoff = None
-    seq = None
+# Options for a generator run, see SkeletonContainerGenerator.
+GeneratorOptions = collections.namedtuple(
+    "GeneratorOptions",
+    [
+        # Reading the signature files.
+        "stream",
+        "cache",
+        "cachesize",
+        # Selecting the containers to generate.
+        "ids",
+        "puids",
+        "types",
+        "shard",
+        # The bytes of each output.
+        "fill",
+        "seed",
+        "zipcompression",
+        "zipthreads",
+        # Where outputs are written.
+        "suitefolder",
+        "writers",
+        "bundle",
+        "jsonl",
+        # How the run proceeds.
+        "jobs",
+        "incremental",
+        "resume",
+        "profile",
+    ],
+)
+
+DEFAULT_OPTIONS = GeneratorOptions(
+    stream=False,
+    cache=None,
+    cachesize=DEFAULT_CACHE_SIZE,
+    ids=None,
+    puids=None,
+    types=None,
+    shard=None,
+    fill=0,
+    seed=None,
+    zipcompression=None,
+    zipthreads=1,
+    suitefolder=SUITE_FOLDER,
+    writers=None,
+    bundle=None,
+    jsonl=None,
+    jobs=1,
+    incremental=False,
+    resume=False,
+    profile=False,
+)
 
-    def __eq__(self, other):
-        """Test for equivalent positioning."""
-        return (
-            self.pos == other.pos
-            and self.offset == other.offset
-            and self.minoff == other.minoff
-            and self.maxoff == other.maxoff
-        )
+
+class ContainerSelection:
+    """Container IDs, PUIDs and container types to generate. IDs and PUIDs
+    select the containers named by either, types and the shard, an (i, N)
+    tuple, restrict those further. Nothing is filtered when no values are
+    given.
+    """
+
+    def __init__(self, ids=None, puids=None, types=None, shard=None):
+        self.ids = set(ids or [])
+        self.puids = set(puids or [])
+        self.types = set(type_.upper() for type_ in types or [])
+        self.shard = shard
+
+    def __bool__(self):
+        return bool(self.ids or self.puids or self.types or self.shard)
+
+    __nonzero__ = __bool__
+
+    def selected(self, sigid, puid, containertype=None):
+        """Return True if a format mapping is selected."""
+        if (self.ids or self.puids) and not (sigid in self.ids or puid in self.puids):
+            return False
+        if self.shard and shardof(sigid, self.shard[1]) != self.shard[0]:
+            return False
+        return not self.types or containertype in self.types
 
 
 class SkeletonContainerGenerator:
@@ -61,142 +176,481 @@ class SkeletonContainerGenerator:
     sequence in PRONOM.
     """
 
-    def __init__(self, containersig, standardsig, debug):
-        """Initialize stats."""
+    def __init__(self, containersig, standardsig, debug, options=None, **overrides):
+        """Initialize stats.
+
+        containersig and standardsig are paths, or the parsed root element
+        of the container signature file and a DroidStandardSigFileClass.
+        options is a GeneratorOptions, DEFAULT_OPTIONS when None, and each
+        of its fields can be overridden by keyword, e.g. fill=0xFF. With
+        suitefolder None nothing is written to disk and the writers, e.g.
+        a MemoryWriter, must be given.
+        """
+        options = (options or DEFAULT_OPTIONS)._replace(**overrides)
+        self.options = options
+        (
+            stream,
+            cache,
+            cachesize,
+            ids,
+            puids,
+            types,
+            shard,
+            fill,
+            seed,
+            zipcompression,
+            zipthreads,
+            suitefolder,
+            writers,
+            bundle,
+            jsonl,
+            jobs,
+            incremental,
+            resume,
+            profile,
+        ) = options
 
         self.ole_write = OLE_WRITE
 
         self.standardsig = standardsig
         self.containersig = containersig
         self.debug = debug
+        self.stream = stream
+        self.jobs = jobs
+        self.suitefolder = suitefolder
+        if suitefolder is None and writers is None:
+            raise ValueError("writers must be given without a suite folder")
+        if suitefolder is None and incremental:
+            raise ValueError("incremental generation needs a suite folder")
+        if writers is not None and jobs > 1:
+            # Writers given by the caller cannot be shared with workers.
+            logging.warning("Writing with the given writers with one job")
+            self.jobs = 1
+
+        # A bundle is a single archive so it is written by one process,
+        # and holds every container so none are skipped.
+        self.bundle = bundle
+        if bundle is not None and jobs > 1:
+            logging.warning("Writing a bundle with one job")
+            self.jobs = 1
+        if bundle is not None and incremental:
+            logging.warning("Regenerating every container for the bundle")
+            incremental = False
+        if bundle is not None and resume:
+            logging.warning("A bundle cannot be resumed, regenerating it")
+            resume = False
+
+        # Containers completed are journalled as the run proceeds so an
+        # interrupted run can be resumed.
+        self.resume = resume
+        self.journal = None
+
+        # Gaps and offsets are filled with a byte value, or random bytes
+        # which are reproducible when a seed is given.
+        self.fill = fill
+        self.fillbyte = signature2bytegenerator.Sig2ByteGenerator.set_fillbyte(fill)
+        self.seed = seed
+
+        # ZIP members are compressed with a (compress_type, level) pair,
+        # large members deflated on zipthreads threads.
+        self.zipcompression = zipcompression
+        self.zipthreads = zipthreads
 
         # TODO: verify arguments provided are actual sig files...
-        self.containertree = self._parse_xml(self.containersig)
+        # Parsed on first use. In streaming mode the container signature
+        # file is read element by element instead.
+        self.containertree = None
+        self.containerindex = None
+
+        # Subset of the container signature file to generate.
+        self.selection = ContainerSelection(ids, puids, types, shard)
+
+        # Parsed signature files and compiled sequences kept between runs.
+        self.cache = None
+        self.cachedcontainers = None
+        self.cachedtemplates = 0
+        if cache is not None:
+            self.cache = SignatureCache(cache, cachesize)
+            templates = self.cache.get("templates", self.containersig)
+            if templates is not None:
+                signature2bytegenerator.load_cache(templates)
+                self.cachedtemplates = len(templates)
 
         # TODO: Counts, e.g. no. container signatuers held in file
         # TODO: If write folders don't exist, create...
 
+        # Per-phase and per-container timings.
+        self.profiler = PhaseProfiler() if profile else NullProfiler()
+
         # stats
         self.nocontainersigs = 0
-        self.zipcount = 0
-        self.ole2count = 0
-        self.zipwritten = 0
-        self.ole2written = 0
-        self.othercount = 0
-
-        self.notwritten = []
+        self.resetstats()
 
         # Invalid PUIDS: Cases seen where invalid PUIDs have appeared in
         # container signature file
         self.invalidpuids = []
 
+        # PUID and extension used to name each container ID, and every
+        # PUID mapped to it.
+        self.containerinputs = {}
+        self.containerpuids = {}
+
+        # Output filename of each container ID from the last run.
+        self.filenames = {}
+
+        # Path of the JSON lines manifest, opened for each run.
+        self.jsonlpath = jsonl
+        self.jsonl = None
+
         self._createfolders()
 
-    def __del__(self):
-        """Skeleton generator deconstructor.
+        # Record of the inputs to each container from the previous run.
+        self.manifest = None
+        if incremental:
+            self.manifest = IncrementalManifest(
+                os.path.join(self.skeletoncontainerdir, MANIFEST_NAME)
+            )
 
-        Write out statistics and clean-up unused directories and files.
+        # Content hashes of the outputs so unchanged outputs are not
+        # rewritten.
+        self.outputhashes = None
+        if suitefolder is not None:
+            self.outputhashes = OutputHashes(
+                os.path.join(self.skeletoncontainerdir, HASHES_NAME)
+            )
+
+        # Backends each container is written with.
+        self.writers = writers
+        if writers is None:
+            self.writers = self._createwriters()
+
+    def resetstats(self):
+        """Reset the per-container statistics."""
+        self.zipcount = 0
+        self.ole2count = 0
+        self.zipwritten = 0
+        self.ole2written = 0
+        self.othercount = 0
+        self.unchanged = 0
+        self.resumed = 0
+        self.identical = 0
+        self.notwritten = []
+        self.outputs = []
+        self.records = []
+        self.errors = []
+        self.profiler.containers = []
+
+    def stats(self):
+        """Return the per-container statistics so that they can be merged
+        from a worker process.
         """
-        print("No. container signatures identified: {}".format(self.nocontainersigs))
-        print("No. zip-based signatures identified: {}".format(self.zipcount))
-        print("No. zip-based signatures written: {}".format(self.zipwritten))
-        print("No. ole2-based signatures identified: {}".format(self.ole2count))
-        print("No. ole2-based signatures written: {}".format(self.ole2written))
-        print("No. other methods identified: {}".format(self.othercount))
-        print(
-            "No. container signatures written: {}".format(
-                self.ole2written + self.zipwritten
+        return {
+            "zipcount": self.zipcount,
+            "ole2count": self.ole2count,
+            "zipwritten": self.zipwritten,
+            "ole2written": self.ole2written,
+            "othercount": self.othercount,
+            "identical": self.identical,
+            "notwritten": list(self.notwritten),
+            "outputs": list(self.outputs),
+            "records": list(self.records),
+            "containers": list(self.profiler.containers),
+        }
+
+    def mergestats(self, stats):
+        """Merge per-container statistics returned by a worker process."""
+        self.zipcount += stats["zipcount"]
+        self.ole2count += stats["ole2count"]
+        self.zipwritten += stats["zipwritten"]
+        self.ole2written += stats["ole2written"]
+        self.othercount += stats["othercount"]
+        self.identical += stats["identical"]
+        self.notwritten.extend(stats["notwritten"])
+        self.outputs.extend(stats["outputs"])
+        self.records.extend(stats["records"])
+        self.profiler.containers.extend(stats["containers"])
+
+    def workeroptions(self):
+        """Return the options used to create the generator in each worker
+        process.
+        """
+        options = DEFAULT_OPTIONS._replace(
+            profile=self.profiler.enabled,
+            fill=self.fill,
+            seed=self.seed,
+            zipcompression=self.zipcompression,
+            zipthreads=self.zipthreads,
+            suitefolder=self.suitefolder,
+        )
+        if self.cache is not None:
+            options = options._replace(
+                cache=self.cache.folder, cachesize=self.cache.maxsize
             )
+        return options
+
+    def report(self):
+        """Write out statistics."""
+        printreport(
+            self.nocontainersigs,
+            self.stats(),
+            self.unchanged if self.manifest is not None else None,
+            self.resumed if self.resume else None,
         )
-        if len(self.notwritten) > 0:
-            print("Not written:")
-            for nooutput in self.notwritten:
-                print("  {}".format(nooutput))
-        if not java:
-            rmtree(self.ole2folder)
-        if not self.debug:
+
+    def cleanup(self):
+        """Clean-up unused directories and files."""
+        if self.skeletondebugfolder is None:
+            return
+        if not self.debug and os.path.exists(self.skeletondebugfolder):
             rmtree(self.skeletondebugfolder)
 
     def _createfolders(self):
-        self.skeletoncontainerdir = os.path.join("skeleton-container-suite")
-        self.skeletondebugfolder = os.path.join(
-            "skeleton-container-suite", "skeleton-folders"
-        )
-        self.zipfolder = os.path.join("skeleton-container-suite", "zip")
-        self.ole2folder = os.path.join("skeleton-container-suite", "ole2")
+        self.skeletoncontainerdir = self.suitefolder
+        self.skeletondebugfolder = None
+        self.zipfolder = None
+        self.ole2folder = None
+        if self.suitefolder is None:
+            return
+        self.skeletondebugfolder = os.path.join(self.suitefolder, "skeleton-folders")
+        self.zipfolder = os.path.join(self.suitefolder, "zip")
+        self.ole2folder = os.path.join(self.suitefolder, "ole2")
         if not os.path.exists(self.skeletoncontainerdir):
             os.mkdir(self.skeletoncontainerdir)
-        if not os.path.exists(self.skeletondebugfolder):
+        # The skeleton-folders staging tree is only written for debugging
+        # and for the POI OLE2 writer which reads its input from disk.
+        if (self.debug or java) and not os.path.exists(self.skeletondebugfolder):
             os.mkdir(self.skeletondebugfolder)
+        if self.bundle is not None:
+            return
         if not os.path.exists(self.zipfolder):
             os.mkdir(self.zipfolder)
         if not os.path.exists(self.ole2folder):
             os.mkdir(self.ole2folder)
 
-    def generateskeletonfiles(self):
-        container_id_to_puid_map = self.mapcontaineridstopuids(self.containertree)
-        filenamedict = self.createcontainerfilenamedict(container_id_to_puid_map)
-        self.containersigfile(self.containertree, filenamedict)
-
-    def handlecreatedirectories(self, path):
-        pathlist = path.split(os.path.sep)
-        filetocreate = pathlist.pop()  # remove filepart from filepath
-        newpath = ""
-        for folder in pathlist:
-            newpath = os.path.join(newpath, folder)
-        skeleton_debug_folder = os.path.join(self.skeletondebugfolder, newpath)
-        if not os.path.exists(skeleton_debug_folder):
-            os.makedirs(skeleton_debug_folder)
-        return filetocreate
-
-    def _replaceoptionsyntax(self, namespace):
-        part1 = namespace.find("[")
-        part2 = namespace.find("]") + 1
-        replacement = (
-            namespace[part1:part2].replace("[", "").replace("]", "").split("-", 1)[0]
+    def _createwriters(self):
+        """Return the writers for the suite, the skeleton-folders tree
+        when debugging, then either a bundle or a file per container.
+        """
+        writers = []
+        stagingfolder = None
+        compression, level = self.zipcompression or (ZIP_COMPRESSION, None)
+        zipoptions = {
+            "compression": compression,
+            "level": level,
+            "threads": self.zipthreads,
+        }
+        if self.debug:
+            writers.append(DirectoryWriter(self.skeletondebugfolder))
+        elif java:
+            writers.append(DirectoryWriter(self.skeletondebugfolder, ("OLE2",)))
+        if java:
+            stagingfolder = self.skeletondebugfolder
+        if self.bundle is not None:
+            writers.append(
+                BundleWriter(self.bundle, self.ole_write, stagingfolder, **zipoptions)
+            )
+            return writers
+        writers.append(ZipWriter(self.zipfolder, self.outputhashes, **zipoptions))
+        writers.append(
+            OLE2Writer(
+                self.ole2folder, self.ole_write, stagingfolder, self.outputhashes
+            )
         )
-        namespace = "{}{}{}".format(namespace[0:part1], replacement, namespace[part2:])
-        if "[" in namespace:
-            self._replaceoptionsyntax(namespace)
-        return namespace
+        return writers
 
-    def convertbytesequence(self, sequence):
-        # source; https://gist.github.com/richardlehane/f71a0e8f15c99c805ec4
-        # testsig = "10 00 00 00 'Word.Document.' ['6'-'7'] 00"
+    def generateskeletonfiles(self):
+        if self.jsonlpath is not None:
+            self.jsonl = JsonlManifest(self.jsonlpath)
+            self.jsonl.write(
+                provenance(
+                    self.containersig,
+                    self.standardsig,
+                    fill=FILL_RANDOM_OPTION if self.fill < 0 else self.fill,
+                    seed=self.seed,
+                    shard=self.selection.shard,
+                    zip_compression=self.zipcompression,
+                )
+            )
+        if self.suitefolder is not None and self.bundle is None:
+            if self.resume:
+                self._removetempfiles()
+            self.journal = CheckpointJournal(
+                os.path.join(self.skeletoncontainerdir, JOURNAL_NAME),
+                self._outputsettings(),
+                self.resume,
+            )
+        try:
+            with self.profiler.phase("mapcontainers"):
+                mapping = self.mapcontainers(self.formatmappings())
+            self.filenames = mapping.filenames
+            with self.profiler.phase("containersigfile"):
+                self.containersigfile(
+                    self.selectedcontainers(mapping.filenames), mapping.filenames
+                )
+        finally:
+            if self.jsonl is not None:
+                self.jsonl.close()
+                self.jsonl = None
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            for writer in self.writers:
+                writer.close()
+        if self.cache is not None:
+            templates = signature2bytegenerator.cached_signatures()
+            if len(templates) > self.cachedtemplates:
+                self.cache.put("templates", self.containersig, templates)
+        if self.manifest is not None:
+            if self.selection:
+                # Outputs for containers outside the selection are kept.
+                self.manifest.carryforward()
+            self.manifest.prune()
+            self.manifest.save()
+        if self.outputhashes is not None:
+            self.outputhashes.save(self.outputs)
+        if self.selection.shard:
+            writeshard(
+                self.skeletoncontainerdir,
+                self.selection.shard,
+                self.nocontainersigs,
+                self.stats(),
+                self.unchanged if self.manifest is not None else None,
+                self._outputsettings(),
+            )
 
-        if "'" in sequence:
-            seqlist = sequence.split("'")
-        else:
-            sig2map = signature2bytegenerator.Sig2ByteGenerator()
-            seqlist = sig2map.map_signature(0, sequence, 0, 0)
-            # TODO: This feels like a bit of a hack, improve...
-            seqlist = "".join(seqlist).replace(" ", "").split("'")
-
-        namespace = ""
-
-        for idx, _ in enumerate(seqlist):
-            # split assumes a space if starts/terminates with delimiter
-            # even number of single-quotes means every-other character needs
-            # converting no delimiter no split...
-            if idx % 2 != 0:
-                namespace += "".join([hex(ord(x))[2:] for x in seqlist[idx]])
-            else:
-                # IF example:
-                # ['', 'office:version=', ' [22 27] ', '1.0', ' [22 27]']
-                if seqlist[idx].find("[") != -1 and seqlist[idx].find("]") != -1:
-                    vallist = seqlist[idx].replace("[", "").replace("]", "").split(" ")
-                    for val in vallist:
-                        if val != "":
-                            namespace += val
-                            break
-                    continue
-                namespace += seqlist[idx]
+    def _outputsettings(self):
+        """Return the settings that change the output, which a checkpoint
+        journal is resumed with and the shards of a suite must share.
+        """
+        return {
+            "container_signature_sha256": signaturehash(self.containersig),
+            "standard_signature_sha256": signaturehash(self.standardsig),
+            "fill": self.fill,
+            "seed": self.seed,
+            "zip_compression": self.zipcompression,
+        }
+
+    def _removetempfiles(self):
+        """Remove the temporary outputs left by an interrupted run."""
+        for folder in (self.zipfolder, self.ole2folder):
+            for name in os.listdir(folder):
+                if name.endswith(TEMP_SUFFIX):
+                    logging.info("Removing partially written output: %s", name)
+                    os.remove(os.path.join(folder, name))
+
+    def verify(self):
+        """Check the output of each container from the last run against
+        its signature and return a Verification for each.
+        """
+        containers = (
+            (
+                container,
+                self.outputpath(
+                    container.get("ContainerType"), self.filenames[container.get("Id")]
+                ),
+            )
+            for container in self.selectedcontainers(self.filenames)
+            if container.get("Id") in self.filenames
+        )
+        with self.profiler.phase("verify"):
+            return verifycontainers(containers, self.jobs)
+
+    def formatmappings(self):
+        """Return an iterable of FileFormatMapping elements."""
+        if self.cache is not None:
+            return self._cachedcontainers()[0]
+        return self._elements("FileFormatMappings/FileFormatMapping")
+
+    def containersignatures(self):
+        """Return an iterable of ContainerSignature elements."""
+        if self.cache is not None:
+            return self._cachedcontainers()[1]
+        return self._elements("ContainerSignatures/ContainerSignature")
+
+    def selectedcontainers(self, filenamedict):
+        """Return an iterable of the ContainerSignature elements to write,
+        looked up in the container index when a selection is made.
+        """
+        if not self.selection or self.stream:
+            return self.containersignatures()
+        return [
+            container
+            for containerid, container in self._containerindex().items()
+            if containerid in filenamedict
+        ]
 
-        # workaround for ['6'-'7'] issue
-        if "[" in namespace:
-            namespace = self._replaceoptionsyntax(namespace)
+    def _containerindex(self):
+        """Return the ContainerSignature elements indexed by ID, in file
+        order.
+        """
+        if self.containerindex is None:
+            self.containerindex = collections.OrderedDict(
+                (container.get("Id"), container)
+                for container in self.containersignatures()
+            )
+        return self.containerindex
+
+    def _containertypes(self):
+        """Return the container type of each container ID."""
+        if not self.stream:
+            return dict(
+                (containerid, container.get("ContainerType"))
+                for containerid, container in self._containerindex().items()
+            )
+        return dict(
+            (container.get("Id"), container.get("ContainerType"))
+            for container in self.containersignatures()
+        )
 
-        return namespace.replace(" ", "")
+    def _elements(self, path):
+        """Return an iterable of the elements at path in the container
+        signature file.
+        """
+        if self.stream:
+            return iterparse_elements(self.containersig, path.split("/")[-1])
+        return self._containertree().findall(path)
+
+    def _cachedcontainers(self):
+        """Return the FileFormatMapping and ContainerSignature elements
+        from the cache, parsing and caching them on a miss.
+        """
+        if self.cachedcontainers is None:
+            entry = self.cache.get("containers", self.containersig)
+            if entry is None:
+                # Parsed whole, streamed elements are cleared once they are
+                # consumed and would be cached empty.
+                root = self._containertree()
+                entry = (
+                    root.findall("FileFormatMappings/FileFormatMapping"),
+                    root.findall("ContainerSignatures/ContainerSignature"),
+                )
+                if entry[0] and entry[1]:
+                    self.cache.put("containers", self.containersig, entry)
+            self.cachedcontainers = entry
+        return self.cachedcontainers
+
+    def _standardsignatures(self):
+        """Return the standard signature file handler, using the cached
+        PUID index when there is one.
+        """
+        if isinstance(self.standardsig, DroidStandardSigFileClass):
+            return self.standardsig
+        if self.cache is None:
+            return DroidStandardSigFileClass(self.standardsig)
+        formats = self.cache.get("formats", self.standardsig)
+        handler = DroidStandardSigFileClass(self.standardsig, formats)
+        if formats is None:
+            self.cache.put("formats", self.standardsig, handler.formats)
+        return handler
+
+    def _containertree(self):
+        """Return the container signature file root, parsing it once."""
+        if self.containertree is None and etree.iselement(self.containersig):
+            self.containertree = self.containersig
+        if self.containertree is None:
+            with self.profiler.phase("parse_container_signature_file"):
+                self.containertree = self._parse_xml(self.containersig)
+        return self.containertree
 
     @staticmethod
     def _parse_xml(xml_file):
@@ -210,388 +664,558 @@ class SkeletonContainerGenerator:
             logging.error("IO error: %s in File: %s", err, xml_file)
             raise err
 
-    def mapcontaineridstopuids(self, containertree):
-        """Create a dictionary of puids based on ID."""
-        container_id_to_puid_map = {}
-        formatmappings = containertree.find("FileFormatMappings")
+    def mapcontainers(self, formatmappings):
+        """Map container signature IDs to PUIDs, extensions and output
+        filenames in a single pass over the format mappings.
 
-        # no. items under format mappings, i.e. no. container formats listed
-        self.nocontainersigs = len(formatmappings)
+        The counts and maps of an earlier call are replaced, so a generator
+        can be mapped again, e.g. with a new selection.
+        """
+        self.nocontainersigs = 0
+        self.invalidpuids = []
+        self.containerinputs = {}
+        self.containerpuids = {}
+        container_id_to_puid_map = collections.OrderedDict()
 
         # cannot create a skeleton file for IDs attached to the same signature
         # list and warn...
-        dupes_tmp = []
-        dupes = []
-
-        for _, mapping in enumerate(formatmappings.iter()):
+        seen = set()
+        duplicateids = []
+        containertypes = {}
+        if self.selection.types:
+            containertypes = self._containertypes()
+        for mapping in formatmappings:
             sigid = mapping.get("signatureId")
             puid = mapping.get("Puid")
-            if sigid not in dupes_tmp:
-                dupes_tmp.append(sigid)
-            else:
-                dupes.append(sigid)
+            if not self.selection.selected(sigid, puid, containertypes.get(sigid)):
+                continue
+            # no. format mappings, i.e. no. container formats listed
+            self.nocontainersigs += 1
+            if sigid in seen:
+                duplicateids.append(sigid)
+            seen.add(sigid)
             if puid is not None:
                 container_id_to_puid_map[sigid] = puid
+                puids = self.containerpuids.setdefault(sigid, [])
+                if puid not in puids:
+                    puids.append(puid)
+        for duplicate in duplicateids:
+            logging.error(
+                "Cannot write a skeleton container file for duplicate IDs: %s",
+                duplicate,
+            )
 
-        if len(dupes) > 0:
-            for duplicate in dupes:
-                logging.error(
-                    "Cannot write a skeleton container file for duplicate IDs: %s",
-                    duplicate,
-                )
-
-        return container_id_to_puid_map
+        with self.profiler.phase("parse_standard_signature_file"):
+            std_signature_file_handler = self._standardsignatures()
+        extensions = std_signature_file_handler.retrieve_ext_list(
+            set(container_id_to_puid_map.values())
+        )
 
-    def removeinvalidpuidsfromextmapping(self, puid_dict):
-        """Non-existent puids might exist in signature file."""
-        puid_dict_tmp = {}
-        for puid in puid_dict:
-            if puid_dict[puid] == "notfound":
-                self.invalidpuids.append(puid)
-                logging.error(
-                    "PUID values not found in standard signature file: %s", puid
-                )
+        # Non-existent puids might exist in signature file.
+        invalidpuids = sorted(
+            puid for puid, extension in extensions.items() if extension == NOTFOUND
+        )
+        for puid in invalidpuids:
+            logging.error("PUID values not found in standard signature file: %s", puid)
+        self.invalidpuids = invalidpuids
+
+        # Duplicate puids can be written with different IDs, duplicate IDs
+        # can't. Generate filename, e.g. fmt-x-sig-id_-xxxx.ext
+        puid_to_ids = collections.OrderedDict()
+        filenames = collections.OrderedDict()
+        for sigid, puid in container_id_to_puid_map.items():
+            puid_to_ids.setdefault(puid, []).append(sigid)
+            extension = extensions[puid]
+            if extension == NOTFOUND:
                 continue
-            puid_dict_tmp[puid] = puid_dict[puid]
-        return puid_dict_tmp
-
-    def removeinvalidpuidsfromidpuidmapping(self, puid_id_map):
-        """Non-existent puids might exist in signature file."""
-        for invalidpuid in self.invalidpuids:
-            for id_ in puid_id_map:
-                if puid_id_map[id_] == invalidpuid:
-                    del puid_id_map[id_]
-                    self.removeinvalidpuidsfromidpuidmapping(puid_id_map)
-                    break
-        return puid_id_map
-
-    def createcontainerfilenamedict(self, container_id_to_puid_map):
-        """Create a dictionary filenames to use beased on ID."""
-        puid_list = container_id_to_puid_map.values()
-        id_filename_dict = {}
-        std_signature_file_handler = DroidStandardSigFileClass(self.standardsig)
-        puidmapping = std_signature_file_handler.retrieve_ext_list(puid_list)
-        puidmapping = self.removeinvalidpuidsfromextmapping(puidmapping)
-        if len(self.invalidpuids) > 0:
-            container_id_to_puid_map = self.removeinvalidpuidsfromidpuidmapping(
-                container_id_to_puid_map
+            filenames[sigid] = "{}-container-signature-id-{}.{}".format(
+                puid.replace("/", "-"), sigid, extension
             )
+            self.containerinputs[sigid] = (puid, extension)
 
-        duplicate_list = [
-            duplicate
-            for duplicate, val in collections.Counter(puid_list).items()
-            if val > 1
-        ]
-
-        # swap keys so we can access dict via puid value
-        puid2idmapping = dict(
-            (value, key) for key, value in container_id_to_puid_map.iteritems()
+        duplicatepuids = collections.OrderedDict(
+            (puid, ids) for puid, ids in puid_to_ids.items() if len(ids) > 1
         )
-
-        # Is this a false optimization?
-        #
-        # If we have duplicate PUIDs handle these first and remove from
-        # lists. Duplicate puids can be written with different IDs,
-        # duplicate IDs can't.
-        for duplicate in duplicate_list:
-            for id_ in container_id_to_puid_map:
-                if container_id_to_puid_map[id_] != duplicate:
-                    continue
-                fmtid = id_
-                fmt = container_id_to_puid_map[id_]
-                id_filename_dict[fmtid] = "{}-container-signature-id-{}.{}".format(
-                    fmt.replace("/", "-"),
-                    fmtid,
-                    puidmapping[container_id_to_puid_map[id_]],
+        return ContainerMapping(filenames, duplicateids, duplicatepuids, invalidpuids)
+
+    def containersigfile(self, containers, filenamedict):
+        # Retrieving each container file type at this point...
+        # create bytestream to write to and write to file...
+        containers = self._filtercontainers(containers, filenamedict)
+        if self.jobs > 1 and multiprocessing is None:
+            logging.warning("multiprocessing unavailable, writing with one job")
+        if self.jobs > 1 and multiprocessing is not None:
+            self._containersigfileparallel(containers)
+        else:
+            for container, containerfilename in containers:
+                self.processcontainer(container, containerfilename)
+                self.writerecords()
+        # Records of unchanged containers after the last one written.
+        self.writerecords()
+
+    def writerecords(self):
+        """Write the records of the containers finished since the last
+        call to the JSON lines manifest and checkpoint journal, if any, and
+        drop them.
+        """
+        records, self.records = self.records, []
+        for record in records:
+            record["puids"] = self.containerpuids.get(record["id"], [])
+            if self.jsonl is not None:
+                self.jsonl.write(record)
+            if self.journal is not None and record["status"] in (
+                "written",
+                "identical",
+                "unchanged",
+            ):
+                self.journal.record(
+                    record["id"], record["output"], record["sha256"], record["size"]
                 )
-                container_id_to_puid_map[id_] = "done"
 
-        # Generate filename, e.g. fmt-x-sig-id_-xxxx.ext
-        for puid in puid2idmapping:
-            if puid not in puidmapping:
+    def _filtercontainers(self, containers, filenamedict):
+        """Yield each container we have a filename for with that name,
+        skipping containers whose inputs are unchanged since the last run
+        or which were completed by the run being resumed.
+        """
+        for container in containers:
+            containerid = container.get("Id")
+            # TODO: Bug filtering too many filenames/ids out,
+            # e.g. 1030, fmt/412
+            if containerid not in filenamedict:
                 continue
-            fmtid = puid2idmapping[puid]
-            fmt = puid
-            id_filename_dict[fmtid] = "{}-container-signature-id-{}.{}".format(
-                fmt.replace("/", "-"), fmtid, puidmapping[puid]
-            )
+            containerfilename = filenamedict[containerid]
+            if self.resume and self._resumed(container, containerfilename):
+                continue
+            if self.manifest is not None and self._unchanged(
+                container, containerfilename
+            ):
+                continue
+            yield container, containerfilename
+
+    def _inputhash(self, container):
+        """Return the hash of the inputs to a container."""
+        puid, extension = self.containerinputs[container.get("Id")]
+        options = (self.fillbyte, self.seed)
+        if self.zipcompression is not None:
+            # Only included when given so earlier manifests still match.
+            options += (self.zipcompression,)
+        return inputhash(container, puid, extension, *options)
+
+    def _unchanged(self, container, containerfilename):
+        """Check a container against the incremental manifest."""
+        containerid = container.get("Id")
+        containertype = container.get("ContainerType")
+        output = self.outputpath(containertype, containerfilename)
+        if not self.manifest.unchanged(containerid, self._inputhash(container), output):
+            return False
+        if self.resume and containerid in self.journal.completed:
+            # The run being resumed left the output incomplete.
+            return False
+        if containertype == "ZIP":
+            self.zipcount += 1
+        elif containertype == "OLE2":
+            self.ole2count += 1
+        self.unchanged += 1
+        record = self.outputhashes.records.get(output, {})
+        self.records.append(
+            {
+                "id": containerid,
+                "type": containertype,
+                "filename": containerfilename,
+                "status": "unchanged",
+                "output": output,
+                "size": record.get("size"),
+                "sha256": record.get("sha256"),
+            }
+        )
+        return True
 
-        return id_filename_dict
+    def _resumed(self, container, containerfilename):
+        """Check a container against the checkpoint journal of the run
+        being resumed.
+        """
+        containerid = container.get("Id")
+        containertype = container.get("ContainerType")
+        output = self.outputpath(containertype, containerfilename)
+        if not self.journal.finished(containerid, output):
+            return False
+        if self.manifest is not None:
+            self.manifest.record(containerid, self._inputhash(container), output)
+        if containertype == "ZIP":
+            self.zipcount += 1
+        elif containertype == "OLE2":
+            self.ole2count += 1
+        self.resumed += 1
+        entry = self.journal.completed[containerid]
+        self.outputs.append(
+            [
+                output,
+                {
+                    "sha256": entry["sha256"],
+                    "size": entry["size"],
+                    "mtime": os.stat(output).st_mtime,
+                },
+            ]
+        )
+        self.records.append(
+            {
+                "id": containerid,
+                "type": containertype,
+                "filename": containerfilename,
+                "status": "resumed",
+                "output": output,
+                "size": entry["size"],
+                "sha256": entry["sha256"],
+            }
+        )
+        return True
+
+    def outputpath(self, containertype, containerfilename):
+        """Return the path a container is written to."""
+        if self.suitefolder is None:
+            return None
+        if containertype == "ZIP":
+            return os.path.join(self.zipfolder, containerfilename)
+        if containertype == "OLE2":
+            return os.path.join(self.ole2folder, containerfilename)
+        return None
+
+    def _containersigfileparallel(self, containers):
+        """Fan the per-container work out to a pool of worker processes.
+
+        Containers are filtered and serialised on this thread, so the
+        statistics are only updated here, and sent in chunks. Statistics
+        are returned by each worker and merged in container order so that
+        the results do not depend on scheduling.
+        """
+        pool = multiprocessing.Pool(
+            self.jobs,
+            _initworker,
+            (self.containersig, self.standardsig, self.debug, self.workeroptions()),
+        )
+        pending = collections.deque()
+        try:
+            chunk = []
+            for container, containerfilename in containers:
+                # Serialised before the next is read as streamed elements
+                # are cleared once consumed.
+                chunk.append((etree.tostring(container), containerfilename))
+                if len(chunk) < WORKER_CHUNKSIZE:
+                    continue
+                pending.append(pool.apply_async(_processcontainers, (chunk,)))
+                chunk = []
+                if len(pending) >= self.jobs * WORKER_AHEAD:
+                    self._mergechunk(pending.popleft())
+            if chunk:
+                pending.append(pool.apply_async(_processcontainers, (chunk,)))
+            while pending:
+                self._mergechunk(pending.popleft())
+        finally:
+            pool.close()
+            pool.join()
+
+    def _mergechunk(self, result):
+        """Merge the statistics of a chunk of containers once written."""
+        for stats in result.get():
+            self.mergestats(stats)
+            self.writerecords()
+
+    def processcontainer(self, container, containerfilename):
+        """Write the inner files of a single container signature and
+        package them.
+        """
+        containertype = container.get("ContainerType")
+
+        # TODO: Use container description?
+        _ = container.find("Description")
+
+        self.errors = []
+        outputs = len(self.outputs)
+        identical = self.identical
+        start = timer()
+        innerfiles = self.createcontainerfiles(container, containerfilename)
+        rendered = timer()
+
+        # Print containertype
+        if containertype == "ZIP":
+            self.zipcount += 1
+        elif containertype == "OLE2":
+            self.ole2count += 1
+        else:
+            self.othercount += 1
+            self.containererror(
+                "Unknown container format discovered: %s", containertype
+            )
+        written = self.writecontainer(
+            container.get("Id"), containertype, containerfilename, innerfiles
+        )
+        if written and containertype == "ZIP":
+            self.zipwritten += 1
+        elif written and containertype == "OLE2":
+            self.ole2written += 1
+        packaged = timer()
 
-    def packagezipcontainer(self, containerfilename):
-        """Package up the contents we need in our zip."""
-        fname = os.path.join(self.skeletondebugfolder, containerfilename)
-        zip_name = os.path.join(self.zipfolder, containerfilename)
-        self.write_zip_contents(fname, zip_name)
-        self.zipwritten += 1
+        if self.profiler.enabled:
+            self.profilecontainer(
+                container, containerfilename, innerfiles, start, rendered
+            )
 
-    @staticmethod
-    def write_zip_contents(zip_root, zip_name):
-        """Write the contents of our zip container directory to a file."""
-        zip_contents = []
-        for dir_, _, files in os.walk(zip_root):
-            relative_dir = os.path.relpath(dir_, zip_root)
-            # If we end up with just a '.' we're at the root of the
-            # structure and so we don't want to write that.
-            if relative_dir != ".":
-                zip_contents.append(relative_dir)
-            for file_name in files:
-                relative_file = os.path.join(relative_dir, file_name)
-                zip_contents.append(relative_file)
-        with zipfile.ZipFile(zip_name, "w") as myzip:
-            for file_ in set(zip_contents):
-                myzip.write(filename=os.path.join(zip_root, file_), arcname=file_)
-
-    def packageole2container(self, containerfilename):
-        fname = os.path.join(self.skeletondebugfolder, containerfilename)
-        if not java:
-            return
-        ole2success = self.ole_write.writeContainer(
-            fname, self.ole2folder, containerfilename
+        status = "failed"
+        output = {}
+        if len(self.outputs) > outputs:
+            path, output = self.outputs[-1]
+            output = dict(output, output=path)
+            status = "identical" if self.identical > identical else "written"
+        self.records.append(
+            {
+                "id": container.get("Id"),
+                "type": containertype,
+                "filename": containerfilename,
+                "status": status,
+                "output": output.get("output"),
+                "size": output.get("size"),
+                "sha256": output.get("sha256"),
+                "files": [
+                    {"path": innerfilename, "size": len(data)}
+                    for innerfilename, data in innerfiles.items()
+                ],
+                "render_seconds": rendered - start,
+                "package_seconds": packaged - rendered,
+                "errors": self.errors,
+            }
         )
-        if ole2success:
-            self.ole2written += 1
-            return
-        self.notwritten.append(containerfilename)
-        return
-
-    def containersigfile(self, containertree, filenamedict):
-        for topelements in iter(containertree):
-            if topelements.tag == "ContainerSignatures":
-                # Retrieving each container file type at this point...
-                # create bytestream to write to and write to file...
-                for container in topelements:
-                    containerid = container.get("Id")
-                    containertype = container.get("ContainerType")
-
-                    # TODO: Use container description?
-                    _ = container.find("Description")
-
-                    container_file = None
-                    filetowrite = None
-
-                    # TODO: Bug filtering too many filenames/ids out,
-                    # e.g. 1030, fmt/412
-                    if containerid not in filenamedict:
-                        continue
-
-                    containerfilename = filenamedict[containerid]
-
-                    files = container.findall("Files/File")
-                    for file in files:
-                        path = file.find("Path")
-                        # E.g. ID 4060 Microsoft Project 2007 OLE2 has
-                        # empty inner filename.
-                        # E.g. ID 10000 has directory encoded in path.
-                        if path is None:
-                            # Q. if path is none, do we still need to make
-                            # a file pointer..?
-                            container_file = self.handlecontainersignaturefilepaths(
-                                None, containerfilename
-                            )
-                        else:
-                            container_file = self.handlecontainersignaturefilepaths(
-                                path.text, containerfilename
-                            )
-                        if container_file:
-                            binarysigs = file.find("BinarySignatures")
-                            if binarysigs is None:
-                                container_file.write(
-                                    "File empty. Data written by Skeleton Generator."
-                                )
-                                container_file.close()
-                            else:
-                                if container_file is not None:
-                                    filetowrite = self.handlecontainersignaturefilesigs(
-                                        binarysigs, containerfilename
-                                    )
-                                if container_file is not None:
-                                    container_file.write(filetowrite.getvalue())
-                                    container_file.close()
-
-                    # Print containertype
-                    if containertype == "ZIP":
-                        self.zipcount += 1
-                        self.packagezipcontainer(containerfilename)
-                    elif containertype == "OLE2":
-                        self.ole2count += 1
-                        self.packageole2container(containerfilename)
-                    else:
-                        self.othercount += 1
-                        logging.error(
-                            "Unknown container format discovered: %s", containertype
-                        )
-
-    def handlecontainersignaturefilepaths(self, innerfilename, containerfilename):
-        containerfilename = os.path.join(containerfilename)
-        container_file = None
-        if innerfilename is None:
-            logging.error("Cannot write file without a name: %s", containerfilename)
-        else:
-            containerfilename = os.path.join(containerfilename, innerfilename)
-            self.handlecreatedirectories(containerfilename)
-            try:
-                path_ = os.path.join(
-                    "skeleton-container-suite", "skeleton-folders", containerfilename
-                )
-                container_file = open(path_, "wb")
-            except IOError:
-                return None
-        return container_file
 
-    @staticmethod
-    def dowriteseq(containerfilename, bio, bytes_):
-        for byte in bytes_:
+    def writecontainer(self, containerid, containertype, containerfilename, innerfiles):
+        """Send the inner files of a container to each writer of its type
+        and return True if any output was written.
+        """
+        writers = [writer for writer in self.writers if writer.handles(containertype)]
+        for writer in writers:
+            writer.begin(containerid, containertype, containerfilename)
+        for innerfilename, data in innerfiles.items():
+            for writer in writers:
+                writer.write(innerfilename, data)
+        written = False
+        for writer in writers:
             try:
-                string = map(ord, byte.replace("\n", "").decode("hex"))
-                for char in string:
-                    bio.write(chr(char))
-            except TypeError as err:
-                out = "Sequence for file {} not mapped: {} with err: {}".format(
-                    containerfilename, str(byte), err
-                )
-                logging.error(out)
-        return bio
-
-    def handlecontainersignaturefilesigs(self, innerfile, containerfilename):
-        """Handle container file signatures."""
-        bio = BytesIO()
-        sigcoll = innerfile.findall("InternalSignatureCollection/InternalSignature")
-        minoff = 0
-        maxoff = 0
-        offset = 0
-        seq = ""
-        rightfrag = ""
-        subs = False
-        parts = []
-        for sigs in sigcoll:
-            offset = sigs.find("ByteSequence")
-            if offset is not None:
-                offset = offset.get("Reference")
-            subseq = sigs.findall("ByteSequence/SubSequence")
-            if subseq is None:
+                output = writer.end()
+            except WriterError as err:
+                self.notwritten.append(containerfilename)
+                self.containererror("%s", err)
                 continue
-            subs = True
-            for sequences in subseq:
-                container_part = ContainerPart()
-                pos = sequences.get("Position")
-                val = sequences.get("SubSeqMinOffset")
-                minoff = 0 if val is None else val
-                val = sequences.get("SubSeqMaxOffset")
-                maxoff = 0 if val is None else val
-                seq = ""
-                sequence = sequences.find("Sequence")
-                if sequence is not None:
-                    seq = sequence.text
-                rightfrag = sequences.find("RightFragment")
-                if rightfrag is not None:
-                    rminoff = (
-                        0
-                        if rightfrag.attrib["MinOffset"] is None
-                        else rightfrag.attrib["MinOffset"]
-                    )
-                    seq = "{}{{{}}}{}".format(seq, rminoff, rightfrag.text)
-                container_part.seq = self.convertbytesequence(seq)
-                container_part.pos = pos
-                container_part.offset = offset
-                container_part.minoff = minoff
-                container_part.maxoff = maxoff
-                parts.append(container_part)
-
-        # Pre-processing of sequences in signature file.
-        if subs is not True:
-            return bio
-        if len(parts) > 1:
-            # Need to process the sequences for multiple BOF here.
-            bofcount = 0
-            for part in parts:
-                if "BOFoffset" in part.offset:
-                    bofcount += 1
-            # this is a bit hacky but it's gonna work...
-            bio = self._process_bofs_greater_thn_one(bio, parts, containerfilename)
-            if bofcount > 2:
-                out = "Check: {}: Code might not yet handle more than two sequences...".format(
-                    containerfilename
-                )
-                logging.error(out)
-            return bio
-        bio = self._writebytestream(
-            containerfilename,
-            bio,
-            parts[0].offset,
-            parts[0].minoff,
-            parts[0].maxoff,
-            parts[0].seq,
+            if output is None:
+                continue
+            written = True
+            if not output.changed:
+                self.identical += 1
+            self.outputs.append([output.path, output.record])
+        return written
+
+    def containererror(self, message, *args):
+        """Log an error writing the current container and record it for
+        the container's manifest line.
+        """
+        logging.error(message, *args)
+        self.errors.append(message % args)
+
+    def profilecontainer(
+        self, container, containerfilename, innerfiles, start, rendered
+    ):
+        """Record the timings and byte counts for a container rendered
+        between start and rendered and packaged since.
+        """
+        containertype = container.get("ContainerType")
+        output = self.outputpath(containertype, containerfilename)
+        outputbytes = 0
+        if output is not None and os.path.exists(output):
+            outputbytes = os.path.getsize(output)
+        self.profiler.container(
+            {
+                "id": container.get("Id"),
+                "filename": containerfilename,
+                "type": containertype,
+                "render_seconds": rendered - start,
+                "package_seconds": timer() - rendered,
+                "inner_files": len(innerfiles),
+                "inner_bytes": sum(len(data) for data in innerfiles.values()),
+                "output_bytes": outputbytes,
+            }
         )
 
-        return bio
-
-    def _process_bofs_greater_thn_one(self, bio, parts, containerfilename):
-        """Pre-process BOF sequences where there are multiple BOF
-        sequences defined in PRONOM.
+    def createcontainerfiles(self, container, containerfilename):
+        """Return the inner files of a container as an ordered mapping of
+        inner filename to bytes or, for signatures, a SegmentBuffer.
         """
-        logging.info("Fixing up multiple BOF sequences for: '%s'", containerfilename)
-        logging.debug("Length of parts: %s", len(parts))
-        for part in parts:
-            logging.debug(
-                "%s %s %s %s %s",
-                part.offset,
-                part.pos,
-                part.minoff,
-                part.maxoff,
-                part.seq,
-            )
-        # Collapse sequences into one, using {n1-n2} syntax to our
-        # advantage to then create our skeleton file.
-        for idx, part in enumerate(parts):
-            if idx == 0:
+        innerfiles = collections.OrderedDict()
+        rng = self.containerrng(container.get("Id"))
+        files = container.findall("Files/File")
+        for file in files:
+            path = file.find("Path")
+            # E.g. ID 4060 Microsoft Project 2007 OLE2 has
+            # empty inner filename.
+            # E.g. ID 10000 has directory encoded in path.
+            if path is None or not path.text:
+                self.containererror(
+                    "Cannot write file without a name: %s", containerfilename
+                )
                 continue
-            parts[0].seq = "%s{%s-%s}%s" % (
-                parts[0].seq,
-                part.minoff,
-                part.maxoff,
-                part.seq,
-            )
-        p_tmp = parts[0]
-        parts = []
-        parts.append(p_tmp)
-        for part in parts:
-            bio = self._writebytestream(
-                containerfilename, bio, part.offset, part.minoff, part.maxoff, part.seq
+            binarysigs = file.find("BinarySignatures")
+            if binarysigs is None:
+                innerfiles[path.text] = EMPTY_FILE
+                continue
+            filetowrite = self.handlecontainersignaturefilesigs(
+                binarysigs, containerfilename, rng
             )
-        return bio
+            innerfiles[path.text] = filetowrite
+        return innerfiles
+
+    def handlecontainersignaturefilesigs(
+        self, innerfile, containerfilename, rng=None
+    ):
+        """Handle container file signatures, laying out the byte sequences
+        of every signature for the file. Random fills are seeded from rng.
+        """
+        bytesequences = innerfile.findall(
+            "InternalSignatureCollection/InternalSignature/ByteSequence"
+        )
+        return sequencelayout.layout(
+            bytesequences,
+            self.fillbyte,
+            containerfilename,
+            signature2bytegenerator.SegmentBuffer(rng),
+        )
 
-    def _writebytestream(self, containerfilename, bio, offset, minoff, maxoff, seq):
-        """Interpret the offsets and sequences provided to the function
-        and write the results to a byte object for writing to file.
+    def containerrng(self, containerid):
+        """Return the random number generator for a container's random
+        fills, seeded from the seed and container ID so the output does
+        not depend on which containers are generated, or in what order.
         """
-        if seq != "":
-            sig2map = signature2bytegenerator.Sig2ByteGenerator()
-            if offset == "BOFoffset":
-                bytes_ = sig2map.map_signature(minoff, seq, maxoff, 0)
-                bio = self.dowriteseq(containerfilename, bio, bytes_)
-            elif offset == "EOFoffset":
-                bytes_ = sig2map.map_signature(0, seq, minoff, 0)
-                bio.seek(0, os.SEEK_END)
-                bio = self.dowriteseq(containerfilename, bio, bytes_)
-            else:
-                if int(maxoff) > 0:
-                    boffill = (int(maxoff) - int(minoff)) / 2
-                    seq = "{{{}}}{}".format(boffill, seq)
-                bytes_ = sig2map.map_signature(minoff, seq, 0, 0)
-                bio.seek(0)
-                bio = self.dowriteseq(containerfilename, bio, bytes_)
-        return bio
-
-
-def skeletonfilegeneration(containersig, standardsig, debug):
-    """Primary runner for skeleton suite generation."""
-    skg = SkeletonContainerGenerator(containersig, standardsig, debug)
-    skg.generateskeletonfiles()
-    # Jython issues calling class destructor, so called manually,
-    # however, this should probably be fixed.
-    if java:
-        skg.__del__()
+        if self.seed is None:
+            return None
+        digest = hashlib.sha256("{}:{}".format(self.seed, containerid).encode("utf-8"))
+        return random.Random(int(digest.hexdigest(), 16))
+
+
+def printreport(nocontainersigs, stats, unchanged=None, resumed=None):
+    """Write out statistics, unchanged is only reported for incremental
+    runs and resumed for resumed runs.
+    """
+    print("No. container signatures identified: {}".format(nocontainersigs))
+    print("No. zip-based signatures identified: {}".format(stats["zipcount"]))
+    print("No. zip-based signatures written: {}".format(stats["zipwritten"]))
+    print("No. ole2-based signatures identified: {}".format(stats["ole2count"]))
+    print("No. ole2-based signatures written: {}".format(stats["ole2written"]))
+    print("No. other methods identified: {}".format(stats["othercount"]))
+    if unchanged is not None:
+        print("No. container signatures unchanged: {}".format(unchanged))
+    if resumed is not None:
+        print("No. container signatures resumed: {}".format(resumed))
+    if stats["identical"] > 0:
+        print(
+            "No. container signatures identical to existing output: {}".format(
+                stats["identical"]
+            )
+        )
+    print(
+        "No. container signatures written: {}".format(
+            stats["ole2written"] + stats["zipwritten"]
+        )
+    )
+    if len(stats["notwritten"]) > 0:
+        print("Not written:")
+        for nooutput in stats["notwritten"]:
+            print("  {}".format(nooutput))
+
+
+# Generator used by each worker process when writing with more than one job.
+_WORKER = None
+
+
+def _initworker(containersig, standardsig, debug, options):
+    """Create the generator for a worker process."""
+    global _WORKER
+    _WORKER = SkeletonContainerGenerator(containersig, standardsig, debug, options)
+
+
+def _processcontainer(task):
+    """Write a single container in a worker process and return the
+    statistics for it.
+    """
+    containerxml, containerfilename = task
+    _WORKER.resetstats()
+    _WORKER.processcontainer(etree.fromstring(containerxml), containerfilename)
+    return _WORKER.stats()
+
+
+def _processcontainers(tasks):
+    """Write a chunk of containers in a worker process and return the
+    statistics for each.
+    """
+    return [_processcontainer(task) for task in tasks]
+
+
+def skeletonfilegeneration(
+    containersig,
+    standardsig,
+    debug,
+    profile=None,
+    cprofile=None,
+    verify=False,
+    **options
+):
+    """Primary runner for skeleton suite generation.
+
+    profile is the path of a JSON report of per-phase and per-container
+    timings, cprofile the path of cProfile statistics for the run. With
+    verify set each output is checked against its signature after it is
+    written. Return False if any output does not match.
+    """
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, debug, profile=profile is not None, **options
+    )
+    if cprofile is not None and cProfile is not None:
+        profiler = cProfile.Profile()
+        profiler.runcall(skg.generateskeletonfiles)
+        profiler.dump_stats(cprofile)
+    else:
+        skg.generateskeletonfiles()
+    verifications = skg.verify() if verify else None
+    if profile is not None:
+        skg.profiler.write(profile, skg.stats())
+    # Statistics and clean-up are run explicitly rather than from a
+    # destructor which Jython, and worker processes, cannot rely on.
+    skg.report()
+    skg.cleanup()
+    if verifications is None:
+        return True
+    return printverification(verifications)
+
+
+def mergesuite(suitefolders, outputfolder=SUITE_FOLDER):
+    """Merge the suite folders written by each shard into one suite and
+    report the combined statistics.
+    """
+    if not os.path.exists(outputfolder):
+        os.mkdir(outputfolder)
+    try:
+        nocontainersigs, stats, unchanged = mergeshards(suitefolders, outputfolder)
+    except ValueError as err:
+        logging.error(err)
+        return False
+    printreport(nocontainersigs, stats, unchanged)
+    return True
+
+
+def parsefill(value):
+    """Parse a fill byte, decimal or hexadecimal, or 'random' which is
+    returned as -1.
+    """
+    if value.lower() == FILL_RANDOM_OPTION:
+        return -1
+    fill = int(value, 0)
+    if not 0 <= fill <= 255:
+        raise ValueError("fill must be between 0 and 255: {}".format(value))
+    return fill
 
 
 def main():
@@ -600,6 +1224,27 @@ def main():
         Usage:  --con [container signature file]
         Usage:  --sig [standard signature file]
         Usage:  --debug [optional] (Outputs debug folders and logging)
+        Usage:  --stream [optional] (Stream the container signature file)
+        Usage:  --jobs [optional] (Number of worker processes)
+        Usage:  --incremental [optional] (Only regenerate changed containers)
+        Usage:  --profile [optional] (Write a JSON timing report)
+        Usage:  --cprofile [optional] (Write cProfile statistics)
+        Usage:  --cache [optional] (Cache parsed signature files in a folder)
+        Usage:  --cache-size [optional] (Cache folder bound in MiB)
+        Usage:  --serve [optional] (Serve requests on host:port or unix:path)
+        Usage:  --id [optional] (Only generate a container ID, repeatable)
+        Usage:  --puid [optional] (Only generate a PUID, repeatable)
+        Usage:  --type [optional] (Only generate ZIP or OLE2, repeatable)
+        Usage:  --shard [optional] (Only generate shard i of N, e.g. 1/4)
+        Usage:  --merge [shard suite folders] (Merge shards into one suite)
+        Usage:  --fill [optional] (Fill byte 0-255 or 'random', default 0)
+        Usage:  --seed [optional] (Seed for reproducible random fill)
+        Usage:  --jsonl [optional] (Write a JSON lines manifest of containers)
+        Usage:  --verify [optional] (Check outputs match their signatures)
+        Usage:  --bundle [optional] (Write the suite to one .tar, .tgz or .zip)
+        Usage:  --zip-compression [optional] (stored, deflate, bzip2 or lzma[:level])
+        Usage:  --zip-threads [optional] (Threads to deflate large members on)
+        Usage:  --resume [optional] (Resume an interrupted run)
 
         Example:
 
@@ -612,27 +1257,217 @@ def main():
         description="Generate skeleton container files from DROID "
         "container signatures."
     )
+    parser.add_argument("--con", help="DROID Container Signature File.", default=False)
+    parser.add_argument("--sig", help="DROID Standard Signature File.", default=False)
     parser.add_argument(
-        "--con", help="DROID Container Signature File.", default=False, required=True
+        "--debug",
+        help="Debug mode. Doesn't delete skeleton-folders directory.",
+        default=False,
+        action='store_true',
     )
     parser.add_argument(
-        "--sig", help="DROID Standard Signature File.", default=False, required=True
+        "--stream",
+        help="Stream the container signature file instead of loading it into memory.",
+        default=False,
+        action="store_true",
     )
     parser.add_argument(
-        "--debug",
-        help="Debug mode. Doesn't delete skeleton-folders directory.",
+        "--jobs",
+        help="Number of processes to write containers with.",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--incremental",
+        help="Only regenerate containers whose inputs changed since the last run.",
         default=False,
-        action='store_true',
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Write per-phase and per-container timings to a JSON report.",
+        metavar="REPORT",
+        default=None,
+    )
+    parser.add_argument(
+        "--cprofile",
+        help="Write cProfile statistics for the run to a file.",
+        metavar="STATS",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache",
+        help="Folder to cache parsed signature files and compiled sequences in.",
+        metavar="FOLDER",
+        default=None,
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum size of the cache folder in MiB.",
+        type=int,
+        default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+    )
+    parser.add_argument(
+        "--serve",
+        help="Serve generation requests over HTTP on HOST:PORT or unix:PATH.",
+        metavar="ADDRESS",
+        default=None,
+    )
+    parser.add_argument(
+        "--id",
+        help="Only generate the container signature with this ID.",
+        dest="ids",
+        action="append",
+        default=None,
+    )
+    parser.add_argument(
+        "--puid",
+        help="Only generate container signatures for this PUID.",
+        dest="puids",
+        action="append",
+        default=None,
+    )
+    parser.add_argument(
+        "--type",
+        help="Only generate container signatures of this container type.",
+        dest="types",
+        action="append",
+        choices=("ZIP", "OLE2"),
+        type=str.upper,
+        default=None,
+    )
+    parser.add_argument(
+        "--shard",
+        help="Only generate shard I of N, counting from 1.",
+        metavar="I/N",
+        type=parseshard,
+        default=None,
+    )
+    parser.add_argument(
+        "--merge",
+        help="Merge the skeleton-container-suite folder of every shard into one.",
+        metavar="FOLDER",
+        nargs="+",
+        default=None,
+    )
+    parser.add_argument(
+        "--fill",
+        help="Byte, 0-255, to fill gaps and offsets with, or 'random'.",
+        type=parsefill,
+        default=0,
+    )
+    parser.add_argument(
+        "--seed",
+        help="Seed random fill so that the suite is reproducible.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--jsonl",
+        help="Write a line per container, as it finishes, to a JSON lines manifest.",
+        metavar="MANIFEST",
+        default=None,
+    )
+    parser.add_argument(
+        "--verify",
+        help="Check each output matches its container signature once written.",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--bundle",
+        help="Write every container to a single .tar, .tar.gz, .tgz or .zip archive.",
+        metavar="ARCHIVE",
+        default=None,
+    )
+    parser.add_argument(
+        "--zip-compression",
+        help="Compress ZIP members: stored, deflate, bzip2 or lzma, with an "
+        "optional level, e.g. deflate:9.",
+        metavar="METHOD[:LEVEL]",
+        type=parsecompression,
+        default=None,
+    )
+    parser.add_argument(
+        "--zip-threads",
+        help="Number of threads to deflate large ZIP members on.",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--resume",
+        help="Resume an interrupted run, skipping containers it completed.",
+        default=False,
+        action="store_true",
     )
     if len(sys.argv) == 1:
         parser.print_help()
         sys.exit(1)
     args = parser.parse_args()
+    if args.verify and args.bundle:
+        parser.error("--verify reads each container file and cannot check a bundle")
+    if args.resume and args.bundle:
+        parser.error("--resume cannot continue a bundle, it is written in one pass")
+    single = (args.bundle, args.jsonl, args.profile, args.cprofile, args.resume)
+    if args.serve and (any(single) or args.verify):
+        parser.error(
+            "--bundle, --jsonl, --profile, --cprofile, --resume and --verify "
+            "apply to a single run, not --serve"
+        )
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
-    if args.con and args.sig:
-        skeletonfilegeneration(args.con, args.sig, args.debug)
+    if args.merge:
+        sys.exit(0 if mergesuite(args.merge) else 1)
+    if args.con and args.sig and args.serve:
+        # Imported here as the daemon builds on this module.
+        from skeletondaemon import serve
+
+        serve(
+            args.con,
+            args.sig,
+            args.serve,
+            args.debug,
+            stream=args.stream,
+            jobs=args.jobs,
+            incremental=args.incremental,
+            cache=args.cache,
+            cachesize=args.cache_size * 1024 * 1024,
+            ids=args.ids,
+            puids=args.puids,
+            types=args.types,
+            shard=args.shard,
+            fill=args.fill,
+            seed=args.seed,
+            zipcompression=args.zip_compression,
+            zipthreads=args.zip_threads,
+        )
         sys.exit(0)
+    if args.con and args.sig:
+        verified = skeletonfilegeneration(
+            args.con,
+            args.sig,
+            args.debug,
+            stream=args.stream,
+            jobs=args.jobs,
+            incremental=args.incremental,
+            profile=args.profile,
+            cprofile=args.cprofile,
+            cache=args.cache,
+            cachesize=args.cache_size * 1024 * 1024,
+            ids=args.ids,
+            puids=args.puids,
+            types=args.types,
+            shard=args.shard,
+            fill=args.fill,
+            seed=args.seed,
+            jsonl=args.jsonl,
+            verify=args.verify,
+            bundle=args.bundle,
+            zipcompression=args.zip_compression,
+            zipthreads=args.zip_threads,
+            resume=args.resume,
+        )
+        sys.exit(0 if verified else 1)
     parser.print_help()
     sys.exit(0)
 
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+"""Module for serving skeleton generation requests from a long-running
+process which parses the signature files once.
+
+Requests are made over HTTP, on a TCP port or a Unix socket:
+
+    GET  /health
+    GET  /generate?id=1000&puid=fmt/412&archive=1
+    POST /generate  {"ids": ["1000"], "puids": ["fmt/412"], "archive": false}
+
+With no IDs or PUIDs the full suite is generated. The response is a JSON
+object of the paths written and statistics, or with archive set a ZIP of
+the containers written.
+
+The generator is not thread safe. Requests are served one at a time, and
+generation is also serialised by a lock held by the service so that it
+stays safe with a threading server.
+"""
+
+from __future__ import print_function
+
+import collections
+import json
+import logging
+import os
+import threading
+import zipfile
+from io import BytesIO
+
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+try:
+    import socketserver
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from urllib.parse import parse_qs, urlparse
+except ImportError:
+    # Python 2 and Jython.
+    import SocketServer as socketserver
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from urlparse import parse_qs, urlparse
+
+UNIX_PREFIX = "unix:"
+
+# Folder the paths in an archive are relative to.
+ARCHIVE_ROOT = "skeleton-container-suite"
+
+# JSON strings are decoded as unicode on Python 2.
+STRING_TYPES = (str, type(u""))
+
+
+def requesterror(request):
+    """Return why a decoded POST request body is invalid, None when it is
+    valid.
+    """
+    if not isinstance(request, dict):
+        return "request must be a JSON object"
+    for key in ("ids", "puids"):
+        values = request.get(key)
+        if values is None:
+            continue
+        if not isinstance(values, list) or not all(
+            isinstance(value, STRING_TYPES) for value in values
+        ):
+            return "{} must be a list of strings".format(key)
+    if not isinstance(request.get("archive", False), bool):
+        return "archive must be true or false"
+    return None
+
+
+class GenerationService:
+    """Hold the parsed signature files and generate containers on
+    request.
+    """
+
+    def __init__(self, containersig, standardsig, debug=False, **options):
+        """options are those of SkeletonContainerGenerator which apply to
+        every request, e.g. fill and zipcompression.
+        """
+        # Elements are held for the life of the service so the container
+        # signature file is parsed whole rather than streamed.
+        if options.pop("stream", False):
+            logging.warning("The server parses the container signature file whole")
+        # Held while a request is generated and its outputs are read.
+        self.lock = threading.RLock()
+        self.skg = SkeletonContainerGenerator(
+            containersig, standardsig, debug, **options
+        )
+        self.mapping = self.skg.mapcontainers(self.skg.formatmappings())
+        # Only the containers selected and named by the mapping.
+        self.containers = collections.OrderedDict(
+            (container.get("Id"), container)
+            for container in self.skg.containersignatures()
+            if container.get("Id") in self.mapping.filenames
+        )
+        self.puids = collections.defaultdict(list)
+        for containerid, (puid, _) in self.skg.containerinputs.items():
+            self.puids[puid].append(containerid)
+
+    def select(self, ids=None, puids=None):
+        """Return the container IDs requested by ID and PUID, every
+        container when neither is given.
+        """
+        if not ids and not puids:
+            return list(self.containers)
+        selected = set(ids or [])
+        for puid in puids or []:
+            selected.update(self.puids.get(puid, []))
+        return [
+            containerid for containerid in self.containers if containerid in selected
+        ]
+
+    def generate(self, ids=None, puids=None):
+        """Generate the requested containers and return the paths written
+        and the statistics for the request.
+        """
+        with self.lock:
+            return self._generate(ids, puids)
+
+    def _generate(self, ids, puids):
+        selected = self.select(ids, puids)
+        self.skg.resetstats()
+        self.skg.containersigfile(
+            (self.containers[containerid] for containerid in selected),
+            self.mapping.filenames,
+        )
+        self.skg.outputhashes.save(self.skg.outputs)
+        paths = []
+        for containerid in selected:
+            filename = self.mapping.filenames.get(containerid)
+            if filename is None:
+                continue
+            containertype = self.containers[containerid].get("ContainerType")
+            path = self.skg.outputpath(containertype, filename)
+            if path is not None and os.path.exists(path):
+                paths.append(path)
+        return paths, self.skg.stats()
+
+    @staticmethod
+    def archive(paths):
+        """Return a ZIP of the paths written as bytes."""
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w") as outzip:
+            for path in paths:
+                outzip.write(path, os.path.relpath(path, ARCHIVE_ROOT))
+        return archive.getvalue()
+
+
+class GenerationHandler(BaseHTTPRequestHandler):
+    """Handle requests to the generation service held by the server."""
+
+    def log_message(self, format, *args):
+        logging.debug("%s", format % args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._respond(200, {"status": "ok"})
+            return
+        if url.path != "/generate":
+            self._respond(404, {"error": "unknown path: {}".format(url.path)})
+            return
+        query = parse_qs(url.query)
+        self._generate(
+            query.get("id"),
+            query.get("puid"),
+            query.get("archive", ["0"])[0] not in ("0", "false", ""),
+        )
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/generate":
+            self._respond(404, {"error": "unknown path: {}".format(self.path)})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+        except ValueError as err:
+            self._respond(400, {"error": "invalid request: {}".format(err)})
+            return
+        error = requesterror(request)
+        if error is not None:
+            self._respond(400, {"error": "invalid request: {}".format(error)})
+            return
+        self._generate(
+            request.get("ids"), request.get("puids"), request.get("archive", False)
+        )
+
+    def _generate(self, ids, puids, archive):
+        service = self.server.service
+        try:
+            # The outputs are archived before another request can replace
+            # them.
+            with service.lock:
+                paths, stats = service.generate(ids, puids)
+                data = service.archive(paths) if archive else None
+        except Exception as err:
+            # Reported to the client rather than dropping the connection.
+            logging.exception("Generation failed")
+            self._respond(500, {"error": "generation failed: {}".format(err)})
+            return
+        if archive:
+            self._send(200, "application/zip", data)
+            return
+        self._respond(200, {"paths": paths, "stats": stats})
+
+    def _respond(self, status, body):
+        self._send(status, "application/json", json.dumps(body).encode("utf-8"))
+
+    def _send(self, status, contenttype, data):
+        self.send_response(status)
+        self.send_header("Content-Type", contenttype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+if hasattr(socketserver, "UnixStreamServer"):
+
+    class UnixHTTPServer(socketserver.UnixStreamServer):
+        """HTTP server listening on a Unix socket."""
+
+        def get_request(self):
+            request, _ = socketserver.UnixStreamServer.get_request(self)
+            # BaseHTTPRequestHandler expects a (host, port) client address.
+            return request, ("local", 0)
+
+
+else:
+    # Unix sockets are unavailable on Windows and Jython.
+    UnixHTTPServer = None
+
+
+def createserver(address, service):
+    """Create a server for address, 'host:port' or 'unix:/path/to/socket'."""
+    if address.startswith(UNIX_PREFIX):
+        if UnixHTTPServer is None:
+            raise ValueError("Unix sockets are not supported on this platform")
+        path = address[len(UNIX_PREFIX) :]
+        if os.path.exists(path):
+            os.remove(path)
+        server = UnixHTTPServer(path, GenerationHandler)
+    else:
+        host, _, port = address.rpartition(":")
+        server = HTTPServer((host or "127.0.0.1", int(port)), GenerationHandler)
+    server.service = service
+    return server
+
+
+def serve(containersig, standardsig, address, debug=False, **options):
+    """Load the signature files and serve generation requests until
+    interrupted.
+    """
+    service = GenerationService(containersig, standardsig, debug, **options)
+    server = createserver(address, service)
+    logging.info("Serving skeleton generation requests on: %s", address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.skg.cleanup()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""Module for generating skeletons as bytes from another program, e.g. a
+test harness creating them on demand.
+
+The signature files are parsed once, or are given already parsed, and
+each container is packaged in memory. Nothing is written to disk:
+
+    library = SkeletonLibrary("container-signature.xml", "DROID_SignatureFile.xml")
+    data = library.generate("1000")
+    zipselection = ContainerSelection(types=["ZIP"])
+    for name, data in library.iter_generate(zipselection.selected):
+        ...
+"""
+
+from __future__ import print_function
+
+import collections
+
+from skeletoncontainergenerator import SkeletonContainerGenerator
+from skeletonwriters import ZIP_COMPRESSION, MemoryWriter, WriterError
+
+
+class SkeletonLibrary:
+    """Hold the parsed signature files and generate containers as bytes.
+
+    containersig is the path or parsed root element of the container
+    signature file, standardsig the path of the standard signature file or
+    a DroidStandardSigFileClass. fill, seed, zipcompression and zipthreads
+    are as for SkeletonContainerGenerator.
+    """
+
+    def __init__(
+        self,
+        containersig,
+        standardsig,
+        fill=0,
+        seed=None,
+        zipcompression=None,
+        zipthreads=1,
+    ):
+        compression, level = zipcompression or (ZIP_COMPRESSION, None)
+        self.writer = MemoryWriter(
+            compression=compression, level=level, threads=zipthreads
+        )
+        self.skg = SkeletonContainerGenerator(
+            containersig,
+            standardsig,
+            False,
+            fill=fill,
+            seed=seed,
+            zipcompression=zipcompression,
+            zipthreads=zipthreads,
+            suitefolder=None,
+            writers=[self.writer],
+        )
+        self.filenames = self.skg.mapcontainers(self.skg.formatmappings()).filenames
+        self.containers = collections.OrderedDict(
+            (container.get("Id"), container)
+            for container in self.skg.containersignatures()
+            if container.get("Id") in self.filenames
+        )
+
+    def generate(self, containerid):
+        """Return the bytes of the skeleton for a container ID.
+
+        Raises KeyError when there is no skeleton for the ID and
+        WriterError when it cannot be written.
+        """
+        container = self.containers.get(containerid)
+        if container is None:
+            raise KeyError("No skeleton for container ID: {}".format(containerid))
+        self.skg.resetstats()
+        self.skg.processcontainer(container, self.filenames[containerid])
+        if not self.skg.outputs:
+            raise WriterError(
+                "Container {} not written: {}".format(
+                    containerid, "; ".join(self.skg.errors)
+                )
+            )
+        return self.writer.data
+
+    def iter_generate(self, filter=None):
+        """Yield the filename and bytes of each skeleton, in signature file
+        order, skipping containers which cannot be written.
+
+        filter is called with the container ID, PUID and container type,
+        e.g. ContainerSelection.selected, and only containers it returns
+        True for are generated.
+        """
+        for containerid, container in self.containers.items():
+            puid = self.skg.containerinputs[containerid][0]
+            if filter is not None and not filter(
+                containerid, puid, container.get("ContainerType")
+            ):
+                continue
+            try:
+                data = self.generate(containerid)
+            except WriterError:
+                # The reason has been logged by the generator.
+                continue
+            yield self.filenames[containerid], data
+
+    def close(self):
+        """Release the thread pool of the writer, if any."""
+        self.writer.close()
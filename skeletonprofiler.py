@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""Module for timing the phases of skeleton suite generation and
+reporting them in a machine-readable form.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import collections
+import contextlib
+import json
+import time
+
+try:
+    timer = time.perf_counter
+except AttributeError:
+    # Python 2 and Jython.
+    timer = time.time
+
+# Number of container IDs listed as the slowest in a report.
+SLOWEST = 20
+
+# Per-container values summed in a report.
+TOTALS = ("render_seconds", "package_seconds", "inner_bytes", "output_bytes")
+
+
+class PhaseProfiler:
+    """Accumulate timings for each phase of a run and per-container
+    timings and byte counts.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.phases = collections.OrderedDict()
+        self.containers = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the enclosed block, adding to any previous time for name."""
+        start = timer()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + timer() - start
+
+    def container(self, record):
+        """Record the timings and byte counts for a single container."""
+        self.containers.append(record)
+
+    def report(self, stats=None):
+        """Return the report as a dictionary."""
+        totals = collections.OrderedDict()
+        for key in TOTALS:
+            totals[key] = sum(record[key] for record in self.containers)
+        slowest = sorted(
+            self.containers,
+            key=lambda record: record["render_seconds"] + record["package_seconds"],
+            reverse=True,
+        )
+        report = collections.OrderedDict()
+        report["phases"] = self.phases
+        report["totals"] = totals
+        report["slowest"] = [record["id"] for record in slowest[:SLOWEST]]
+        report["containers"] = self.containers
+        if stats is not None:
+            report["stats"] = stats
+        return report
+
+    def write(self, path, stats=None):
+        """Write the report as JSON to path."""
+        with open(path, "w") as report:
+            json.dump(self.report(stats), report, indent=1)
+
+
+class NullProfiler:
+    """Profiler used when profiling is switched off, records nothing."""
+
+    enabled = False
+
+    def __init__(self):
+        self.containers = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        yield
+
+    def container(self, record):
+        pass
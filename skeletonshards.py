@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Module for splitting generation of a suite into shards, e.g. across
+build machines, and merging the shards back into one suite.
+
+Container IDs are assigned to shards by the CRC32 of the ID so every
+machine agrees on the partition without coordinating. Each shard writes
+its containers and a shard file of its statistics into its own suite
+folder, and the shards are then merged into a single suite.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import json
+import logging
+import os
+import shutil
+import zlib
+
+from incrementalmanifest import MANIFEST_NAME
+from outputhashes import HASHES_NAME
+
+SHARD_FILE = "shard-{}-of-{}.json"
+
+# Suite sub-folders copied when merging shards.
+SUITE_FOLDERS = ("zip", "ole2", "skeleton-folders")
+
+
+def parseshard(value):
+    """Parse a shard given as 'i/N', i counting from 1, to (i, N)."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError("shard must be given as i/N, e.g. 1/4: {}".format(value))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("shard index must be between 1 and N: {}".format(value))
+    return index, count
+
+
+def shardof(containerid, count):
+    """Return the shard, counting from 1, that a container ID belongs to."""
+    # Masked as Python 2 returns a signed CRC.
+    crc = zlib.crc32(containerid.encode("utf-8")) & 0xFFFFFFFF
+    return crc % count + 1
+
+
+def writeshard(
+    suitefolder, shard, nocontainersigs, stats, unchanged=None, settings=None
+):
+    """Write the statistics of a shard to its suite folder, with the
+    settings that change its output, e.g. the signature file hashes.
+    """
+    index, count = shard
+    path = os.path.join(suitefolder, SHARD_FILE.format(index, count))
+    with open(path, "w") as shardfile:
+        json.dump(
+            {
+                "shard": index,
+                "count": count,
+                "nocontainersigs": nocontainersigs,
+                "settings": settings,
+                "unchanged": unchanged,
+                "stats": stats,
+            },
+            shardfile,
+            indent=1,
+            sort_keys=True,
+        )
+    return path
+
+
+def _readshards(suitefolders):
+    """Return the shard files from each suite folder, checking that they
+    form one complete set generated with the same settings.
+    """
+    shards = []
+    for folder in suitefolders:
+        names = [
+            name
+            for name in os.listdir(folder)
+            if name.startswith("shard-") and name.endswith(".json")
+        ]
+        if len(names) != 1:
+            raise ValueError("Expected one shard file in: {}".format(folder))
+        with open(os.path.join(folder, names[0]), "r") as shardfile:
+            shards.append((folder, json.load(shardfile)))
+    counts = set(shard["count"] for _, shard in shards)
+    indexes = sorted(shard["shard"] for _, shard in shards)
+    if len(counts) != 1 or indexes != list(range(1, counts.pop() + 1)):
+        raise ValueError("Shards do not form a complete set: {}".format(indexes))
+    # A suite merged from shards of different signature files or fills
+    # would mix two releases.
+    settings = shards[0][1].get("settings")
+    for folder, shard in shards[1:]:
+        if shard.get("settings") != settings:
+            raise ValueError(
+                "Shard generated with different signature files or settings: "
+                "{}".format(folder)
+            )
+    return sorted(shards, key=lambda folder_shard: folder_shard[1]["shard"])
+
+
+def _copyfolder(source, destination):
+    """Copy the files under source into destination."""
+    for folder, _, files in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(folder, source))
+        if not os.path.exists(target):
+            os.makedirs(target)
+        for file_ in files:
+            shutil.copy2(os.path.join(folder, file_), os.path.join(target, file_))
+
+
+def mergeshards(suitefolders, outputfolder):
+    """Merge the suite folders of a complete set of shards into
+    outputfolder and return the combined (nocontainersigs, stats,
+    unchanged) for reporting, unchanged is None unless the shards were
+    generated incrementally.
+    """
+    shards = _readshards(suitefolders)
+    nocontainersigs = 0
+    unchanged = None
+    stats = {}
+    manifest = {}
+    hashes = {}
+    for folder, shard in shards:
+        logging.info("Merging shard %s/%s: %s", shard["shard"], shard["count"], folder)
+        for name in SUITE_FOLDERS:
+            source = os.path.join(folder, name)
+            if os.path.isdir(source):
+                _copyfolder(source, os.path.join(outputfolder, name))
+        manifestpath = os.path.join(folder, MANIFEST_NAME)
+        if os.path.exists(manifestpath):
+            with open(manifestpath, "r") as shardmanifest:
+                entries = json.load(shardmanifest)
+            # Entries carried forward from other shards are skipped.
+            for containerid, entry in entries.items():
+                if shardof(containerid, shard["count"]) == shard["shard"]:
+                    manifest[containerid] = entry
+        hashespath = os.path.join(folder, HASHES_NAME)
+        if os.path.exists(hashespath):
+            with open(hashespath, "r") as shardhashes:
+                hashes.update(json.load(shardhashes))
+        nocontainersigs += shard["nocontainersigs"]
+        if shard["unchanged"] is not None:
+            unchanged = (unchanged or 0) + shard["unchanged"]
+        for key, value in shard["stats"].items():
+            if isinstance(value, list):
+                stats.setdefault(key, []).extend(value)
+                continue
+            stats[key] = stats.get(key, 0) + value
+    if manifest:
+        with open(os.path.join(outputfolder, MANIFEST_NAME), "w") as merged:
+            json.dump(manifest, merged, indent=1, sort_keys=True)
+    if hashes:
+        with open(os.path.join(outputfolder, HASHES_NAME), "w") as merged:
+            json.dump(hashes, merged, indent=1, sort_keys=True)
+    return nocontainersigs, stats, unchanged
@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+
+"""Module for verifying that generated skeletons match their container
+signatures without running DROID or Siegfried over the suite.
+
+Each ByteSequence is compiled once into a bytes regular expression from
+the same intermediate representation (IR) the generator renders:
+sequences anchored to the beginning of the file are matched from its
+start, sequences anchored to the end are searched for in the tail the
+sequence can reach and variable sequences are searched for anywhere. A
+container matches when every named inner file exists and, for each file
+with binary signatures, one of its internal signatures matches all of its
+byte sequences.
+"""
+
+from __future__ import print_function
+
+import collections
+import logging
+import os
+import re
+import struct
+import xml.etree.ElementTree as etree
+import zipfile
+
+from ole2reader import CompoundFileError, read_compound_file
+from sequencelayout import BOF, EOF, offsetof, positionof
+from signature2bytegenerator import (
+    Alternation,
+    ByteSet,
+    Gap,
+    Literal,
+    Mask,
+    compile_signature,
+)
+
+try:
+    import multiprocessing
+except ImportError:
+    # Jython does not provide multiprocessing.
+    multiprocessing = None
+
+# Largest repeat count re accepts on every supported Python version,
+# larger gaps are written as a series of repeats.
+MAX_REPEAT = 65535
+
+# Containers sent to a worker process at a time when verifying in
+# parallel.
+VERIFY_CHUNKSIZE = 8
+
+# A compiled ByteSequence, maxlength is the most bytes it can span from
+# its anchor or None when unbounded.
+SequencePattern = collections.namedtuple("SequencePattern", "reference regex maxlength")
+
+# Result of verifying a container, mismatches is a list of reasons and is
+# empty when the output matches its signature.
+Verification = collections.namedtuple("Verification", "id output mismatches")
+
+# Errors reading a truncated or corrupt output.
+READ_ERRORS = (EnvironmentError, CompoundFileError, struct.error, zipfile.BadZipfile)
+
+# Most compiled ByteSequence patterns held at once.
+PATTERN_CACHE_SIZE = 4096
+
+# Compiled ByteSequence patterns keyed by their serialised XML, least
+# recently used first.
+_patterns = collections.OrderedDict()
+
+
+def _add(*lengths):
+    """Sum lengths, None when any is unbounded."""
+    if None in lengths:
+        return None
+    return sum(lengths)
+
+
+def _byte(value):
+    return "\\x{:02x}".format(value)
+
+
+def _byteclass(values, inverted=False):
+    """Return a character class for a set of byte values."""
+    ranges = []
+    for value in sorted(set(values)):
+        if ranges and ranges[-1][1] == value - 1:
+            ranges[-1][1] = value
+            continue
+        ranges.append([value, value])
+    if not ranges:
+        # An empty class matches any byte when inverted and none otherwise.
+        return "." if inverted else "(?!)"
+    return "[{}{}]".format(
+        "^" if inverted else "",
+        "".join(
+            _byte(low) if low == high else "{}-{}".format(_byte(low), _byte(high))
+            for low, high in ranges
+        ),
+    )
+
+
+def _maskmatches(token, value):
+    if token.anybits:
+        matched = value & token.value != 0
+    else:
+        matched = value & token.value == token.value
+    return matched != token.inverted
+
+
+def _gap(minimum, maximum):
+    """Return the pattern for a gap of minimum to maximum bytes, maximum
+    is None when unbounded.
+    """
+    parts = []
+    while minimum > MAX_REPEAT:
+        parts.append(".{{{}}}".format(MAX_REPEAT))
+        minimum -= MAX_REPEAT
+        if maximum is not None:
+            maximum -= MAX_REPEAT
+    if maximum is None or maximum > MAX_REPEAT:
+        # re cannot bound larger gaps on every version so they are
+        # matched as unbounded.
+        parts.append(".{{{},}}".format(minimum))
+    elif minimum or maximum:
+        parts.append(".{{{},{}}}".format(minimum, maximum))
+    return "".join(parts)
+
+
+def irpattern(ir):
+    """Return the regular expression and maximum length for the IR of a
+    sequence.
+    """
+    parts = []
+    lengths = []
+    for token in ir:
+        if isinstance(token, Literal):
+            parts.append("".join(_byte(value) for value in bytearray(token.data)))
+            lengths.append(len(token.data))
+        elif isinstance(token, Gap):
+            parts.append(_gap(token.minimum, token.maximum))
+            lengths.append(token.maximum)
+        elif isinstance(token, ByteSet):
+            values = []
+            for low, high in token.ranges:
+                values.extend(range(min(low, high), max(low, high) + 1))
+            parts.append(_byteclass(values, token.inverted))
+            lengths.append(1)
+        elif isinstance(token, Mask):
+            parts.append(
+                _byteclass(value for value in range(256) if _maskmatches(token, value))
+            )
+            lengths.append(1)
+        elif isinstance(token, Alternation):
+            options = [irpattern(option) for option in token.options]
+            parts.append("(?:{})".format("|".join(pattern for pattern, _ in options)))
+            optionlengths = [length for _, length in options]
+            lengths.append(None if None in optionlengths else max(optionlengths))
+    return "".join(parts), _add(*lengths)
+
+
+def _textpattern(text):
+    return irpattern(compile_signature(text or ""))
+
+
+def _offsets(element, minimum, maximum):
+    """Return the minimum and maximum offset attributes of an element, the
+    maximum is the minimum when absent.
+    """
+    low = offsetof(element, minimum)
+    if element.get(maximum) is None:
+        return low, low
+    return low, max(low, offsetof(element, maximum))
+
+
+def _fragmentspattern(subsequence, tag):
+    """Return a pattern for each position of the fragments of a
+    subsequence, nearest the sequence first, with the fragments sharing a
+    position as alternatives.
+    """
+    positions = collections.OrderedDict()
+    for fragment in sorted(subsequence.findall(tag), key=positionof):
+        positions.setdefault(positionof(fragment), []).append(fragment)
+    patterns = []
+    for fragments in positions.values():
+        options = []
+        lengths = []
+        for fragment in fragments:
+            pattern, length = _textpattern(fragment.text)
+            minimum, maximum = _offsets(fragment, "MinOffset", "MaxOffset")
+            gap = _gap(minimum, maximum)
+            if tag == "LeftFragment":
+                options.append(pattern + gap)
+            else:
+                options.append(gap + pattern)
+            lengths.append(_add(length, maximum))
+        patterns.append(
+            (
+                "(?:{})".format("|".join(options)),
+                None if None in lengths else max(lengths),
+            )
+        )
+    return patterns
+
+
+def subsequencepattern(subsequence):
+    """Return the pattern and maximum length of a SubSequence with its
+    fragments.
+    """
+    parts = []
+    lengths = []
+    for pattern, length in reversed(_fragmentspattern(subsequence, "LeftFragment")):
+        parts.append(pattern)
+        lengths.append(length)
+    sequence = subsequence.find("Sequence")
+    if sequence is not None:
+        pattern, length = _textpattern(sequence.text)
+        parts.append(pattern)
+        lengths.append(length)
+    for pattern, length in _fragmentspattern(subsequence, "RightFragment"):
+        parts.append(pattern)
+        lengths.append(length)
+    return "".join(parts), _add(*lengths)
+
+
+def bytesequencepattern(bytesequence):
+    """Return the SequencePattern for a ByteSequence, None when it has no
+    subsequences. Patterns are held in a bounded least recently used cache.
+    """
+    key = etree.tostring(bytesequence)
+    if key in _patterns:
+        compiled = _patterns.pop(key)
+        _patterns[key] = compiled
+        return compiled
+    reference = bytesequence.get("Reference")
+    subsequences = sorted(bytesequence.findall("SubSequence"), key=positionof)
+    if not subsequences:
+        return None
+    parts = []
+    lengths = []
+    for idx, subsequence in enumerate(subsequences):
+        pattern, length = subsequencepattern(subsequence)
+        minimum, maximum = _offsets(subsequence, "SubSeqMinOffset", "SubSeqMaxOffset")
+        if reference == EOF:
+            # Position 1 is nearest the end of the file, its offset the
+            # distance from it.
+            parts.insert(0, pattern + _gap(minimum, maximum))
+            lengths.append(_add(length, maximum))
+        elif idx > 0 or reference == BOF:
+            parts.append(_gap(minimum, maximum) + pattern)
+            lengths.append(_add(length, maximum))
+        else:
+            # The first subsequence of a variable sequence can be anywhere.
+            parts.append(pattern)
+            lengths.append(None)
+    pattern = "".join(parts)
+    if reference == BOF:
+        pattern = "\\A" + pattern
+    elif reference == EOF:
+        pattern = pattern + "\\Z"
+    compiled = SequencePattern(
+        reference, re.compile(pattern.encode("ascii"), re.DOTALL), _add(*lengths)
+    )
+    if len(_patterns) >= PATTERN_CACHE_SIZE:
+        _patterns.popitem(last=False)
+    _patterns[key] = compiled
+    return compiled
+
+
+def sequencematches(pattern, data):
+    """Return True if a SequencePattern matches data."""
+    if pattern.reference == BOF:
+        return pattern.regex.match(data) is not None
+    if pattern.reference == EOF and pattern.maxlength is not None:
+        # Only the tail the sequence can reach is searched.
+        data = data[-pattern.maxlength :] if pattern.maxlength else data[:0]
+    return pattern.regex.search(data) is not None
+
+
+def signaturematches(internalsignature, data):
+    """Return True if every ByteSequence of an InternalSignature matches
+    data.
+    """
+    for bytesequence in internalsignature.findall("ByteSequence"):
+        pattern = bytesequencepattern(bytesequence)
+        if pattern is not None and not sequencematches(pattern, data):
+            return False
+    return True
+
+
+def readinnerfiles(containertype, output):
+    """Return a function reading the inner files of an output by path,
+    returning None for paths which are not in it.
+    """
+    if containertype == "OLE2":
+        return read_compound_file(output).get
+    with zipfile.ZipFile(output) as container:
+        names = set(container.namelist())
+        files = dict(
+            (name, container.read(name)) for name in names if not name.endswith("/")
+        )
+    return files.get
+
+
+def verifycontainer(container, output):
+    """Return the reasons, if any, an output does not match its
+    ContainerSignature.
+    """
+    if output is None or not os.path.exists(output):
+        return ["output not written: {}".format(output)]
+    try:
+        read = readinnerfiles(container.get("ContainerType"), output)
+    except READ_ERRORS as err:
+        return ["cannot read output: {}".format(err)]
+    mismatches = []
+    for file_ in container.findall("Files/File"):
+        path = file_.find("Path")
+        if path is None or not path.text:
+            continue
+        data = read(path.text)
+        if data is None:
+            mismatches.append("missing inner file: {}".format(path.text))
+            continue
+        signatures = file_.findall(
+            "BinarySignatures/InternalSignatureCollection/InternalSignature"
+        )
+        if signatures and not any(
+            signaturematches(signature, data) for signature in signatures
+        ):
+            mismatches.append("no internal signature matched: {}".format(path.text))
+    return mismatches
+
+
+def _verify(container, output):
+    return Verification(
+        container.get("Id"), output, verifycontainer(container, output)
+    )
+
+
+def _verifytask(task):
+    """Verify a single container in a worker process."""
+    containerxml, output = task
+    return _verify(etree.fromstring(containerxml), output)
+
+
+def verifycontainers(containers, jobs=1):
+    """Verify (ContainerSignature, output path) pairs and return a
+    Verification for each, in order.
+    """
+    if jobs > 1 and multiprocessing is None:
+        logging.warning("multiprocessing unavailable, verifying with one job")
+    if jobs <= 1 or multiprocessing is None:
+        return [_verify(container, output) for container, output in containers]
+    tasks = ((etree.tostring(container), output) for container, output in containers)
+    pool = multiprocessing.Pool(jobs)
+    try:
+        return list(pool.imap(_verifytask, tasks, VERIFY_CHUNKSIZE))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def printverification(verifications):
+    """Write out the verification results and return True when every
+    container matched.
+    """
+    mismatched = [result for result in verifications if result.mismatches]
+    print("No. containers verified: {}".format(len(verifications)))
+    print(
+        "No. containers matching signatures: {}".format(
+            len(verifications) - len(mismatched)
+        )
+    )
+    if mismatched:
+        print("Mismatched:")
+        for result in mismatched:
+            for mismatch in result.mismatches:
+                print("  {} {}: {}".format(result.id, result.output, mismatch))
+    return not mismatched
@@ -0,0 +1,612 @@
+# -*- coding: utf-8 -*-
+
+"""Module for the backends that containers are written with.
+
+A writer receives each container as a series of events: begin() with the
+container ID, type and output filename, write() with each inner path and
+its data, bytes or a SegmentBuffer streamed in chunks, and end() once the
+container is complete. Writers are provided for the skeleton-folders
+directory tree, per-container ZIP and OLE2 files, a single tar or ZIP
+bundle of the whole suite written sequentially and containers packaged in
+memory.
+
+ZIP members can be compressed. Large members are deflated in blocks, each
+primed with the bytes before it, on a thread pool when more than one
+thread is given. zlib releases the GIL so the blocks compress in parallel,
+and the result does not depend on the number of threads.
+"""
+
+from __future__ import print_function
+
+import calendar
+import collections
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from io import BytesIO
+
+from outputhashes import SpooledOutput, temppath, writtenoutput
+from PyWriteOLE2Containers import write_compound_file
+from signature2bytegenerator import SegmentBuffer
+
+try:
+    from concurrent import futures
+except ImportError:
+    # Python 2 and Jython.
+    futures = None
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    # Python 2 and Jython.
+    lzma = None
+
+# ZipFile.open() can stream members into an archive from Python 3.6.
+ZIP_STREAMING = sys.version_info >= (3, 6)
+
+# Fixed ZIP member metadata so that the same inner files always give the
+# same archive bytes.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_CREATE_SYSTEM = 3
+ZIP_FILE_ATTR = 0o100644 << 16
+ZIP_FOLDER_ATTR = (0o40755 << 16) | 0x10
+ZIP_COMPRESSION = zipfile.ZIP_STORED
+
+# A ZIP compression method, the name of its zipfile constant, the range
+# of levels it accepts, None when it takes none, and the module it needs.
+ZipMethod = collections.namedtuple("ZipMethod", "constant levels module")
+
+# Compression methods by option name.
+ZIP_METHODS = collections.OrderedDict(
+    [
+        ("stored", ZipMethod("ZIP_STORED", None, zipfile)),
+        ("deflate", ZipMethod("ZIP_DEFLATED", (0, 9), zlib)),
+        ("bzip2", ZipMethod("ZIP_BZIP2", (1, 9), bz2)),
+        ("lzma", ZipMethod("ZIP_LZMA", None, lzma)),
+    ]
+)
+
+# writestr() accepts a compression level from Python 3.7, and a ZipInfo
+# opened for writing holds one publicly from Python 3.13.
+ZIP_LEVELS = sys.version_info >= (3, 7)
+ZIP_INFO_LEVEL = hasattr(zipfile.ZipInfo, "compress_level")
+
+# Inner files at least this large are deflated in blocks of
+# DEFLATE_BLOCK_SIZE, at most DEFLATE_AHEAD blocks ahead of those written.
+BLOCK_DEFLATE_THRESHOLD = 4 * 1024 * 1024
+DEFLATE_BLOCK_SIZE = 1024 * 1024
+DEFLATE_AHEAD = 16
+# Bytes of the previous block each block is primed with.
+DEFLATE_DICTIONARY_SIZE = 32 * 1024
+
+# Fixed tar member metadata, for the same reason.
+TAR_MTIME = calendar.timegm(ZIP_DATE_TIME + (0, 0, 0))
+TAR_MODE = 0o644
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# An output written for a container, record is its sha256 and size and
+# changed is False when an identical output already existed.
+Output = collections.namedtuple("Output", "path record changed")
+
+
+class WriterError(Exception):
+    """Raised when a writer cannot write a container."""
+
+
+def parsecompression(value):
+    """Parse a ZIP compression given as 'method' or 'method:level', e.g.
+    'deflate:9', to (compress_type, level), level None for the default.
+    """
+    method, _, level = value.lower().partition(":")
+    if method not in ZIP_METHODS:
+        raise ValueError(
+            "compression must be one of {}: {}".format(", ".join(ZIP_METHODS), value)
+        )
+    zipmethod = ZIP_METHODS[method]
+    compression = getattr(zipfile, zipmethod.constant, None)
+    if compression is None or zipmethod.module is None:
+        raise ValueError("{} compression is unavailable".format(method))
+    if not level:
+        return compression, None
+    if zipmethod.levels is None:
+        raise ValueError("{} compression does not take a level".format(method))
+    low, high = zipmethod.levels
+    level = int(level)
+    if not low <= level <= high:
+        raise ValueError("{} level must be between {} and {}".format(method, low, high))
+    if not ZIP_LEVELS:
+        logging.warning("Compression levels need Python 3.7, using the default")
+    return compression, level
+
+
+def zipinfo(name, external_attr, compression=ZIP_COMPRESSION, level=None):
+    """Return a ZipInfo with fixed metadata for a member."""
+    info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+    info.compress_type = compression
+    info.create_system = ZIP_CREATE_SYSTEM
+    info.external_attr = external_attr
+    if level is not None and ZIP_INFO_LEVEL:
+        info.compress_level = level
+    return info
+
+
+def levelargs(level):
+    """Return the keyword arguments giving writestr() a compression level."""
+    if level is None or not ZIP_LEVELS:
+        return {}
+    return {"compresslevel": level}
+
+
+def _hascompressor():
+    """Return True if a ZipFile member opened for writing holds the
+    compressor that BlockDeflater stands in for. It is not public so it is
+    looked for rather than assumed, once.
+    """
+    global _COMPRESSOR
+    if _COMPRESSOR is None:
+        archive = zipfile.ZipFile(BytesIO(), "w")
+        info = zipinfo("probe", ZIP_FILE_ATTR, zipfile.ZIP_DEFLATED)
+        with archive.open(info, "w") as dest:
+            compressor = getattr(dest, "_compressor", None)
+            _COMPRESSOR = all(
+                hasattr(compressor, method) for method in ("compress", "flush")
+            )
+        archive.close()
+    return _COMPRESSOR
+
+
+_COMPRESSOR = None
+
+
+def _deflateblock(block, dictionary, level):
+    """Return a block of a larger raw deflate stream, primed with the
+    bytes before it and ended on a byte boundary with a sync flush so the
+    blocks can be joined.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(
+            level,
+            zlib.DEFLATED,
+            -zlib.MAX_WBITS,
+            zlib.DEF_MEM_LEVEL,
+            zlib.Z_DEFAULT_STRATEGY,
+            dictionary,
+        )
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class _Deflated:
+    """Stands in for the compressor of a ZipFile member, returning the
+    deflated bytes of each block as it is written.
+    """
+
+    def __init__(self):
+        self.pending = b""
+
+    def compress(self, data):
+        pending, self.pending = self.pending, b""
+        return pending
+
+    @staticmethod
+    def flush():
+        # An empty final block ends the stream.
+        return zlib.compressobj(0, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+
+
+class BlockDeflater:
+    """File-like object which deflates what is written to it in blocks,
+    on executor when given, and writes them in order to dest, a ZipFile
+    member opened for writing. Only used when _hascompressor() is True.
+    """
+
+    def __init__(self, dest, level=None, executor=None):
+        self.dest = dest
+        self.level = zlib.Z_DEFAULT_COMPRESSION if level is None else level
+        self.executor = executor
+        self.compressor = _Deflated()
+        # The member's CRC and sizes are still counted by ZipFile.
+        dest._compressor = self.compressor
+        self.buffer = bytearray()
+        self.previous = b""
+        self.pending = collections.deque()
+
+    def write(self, data):
+        self.buffer.extend(data)
+        while len(self.buffer) >= DEFLATE_BLOCK_SIZE:
+            block = bytes(self.buffer[:DEFLATE_BLOCK_SIZE])
+            del self.buffer[:DEFLATE_BLOCK_SIZE]
+            self._submit(block)
+
+    def _submit(self, block):
+        dictionary = self.previous[-DEFLATE_DICTIONARY_SIZE:]
+        self.previous = block
+        if self.executor is None:
+            deflated = _deflateblock(block, dictionary, self.level)
+        else:
+            deflated = self.executor.submit(
+                _deflateblock, block, dictionary, self.level
+            )
+        self.pending.append((block, deflated))
+        while len(self.pending) > DEFLATE_AHEAD:
+            self._writeblock()
+
+    def _writeblock(self):
+        block, deflated = self.pending.popleft()
+        if self.executor is not None:
+            deflated = deflated.result()
+        self.compressor.pending = deflated
+        self.dest.write(block)
+
+    def close(self):
+        """Write the blocks still pending, the member is closed by its
+        ZipFile.
+        """
+        if self.buffer:
+            self._submit(bytes(self.buffer))
+            self.buffer = bytearray()
+        while self.pending:
+            self._writeblock()
+
+
+def getinnerfile(data):
+    """Return inner file data, bytes or a SegmentBuffer, as bytes."""
+    if isinstance(data, SegmentBuffer):
+        return data.getvalue()
+    return data
+
+
+def writeinnerfile(stream, data):
+    """Write inner file data to stream, SegmentBuffer fills are expanded
+    in chunks as they are written.
+    """
+    if isinstance(data, SegmentBuffer):
+        data.writeto(stream)
+        return
+    stream.write(data)
+
+
+def _commitspooled(output, outputhashes=None):
+    """Move a SpooledOutput into place, through the content hashes when
+    given so that an identical output is not written at all.
+    """
+    if outputhashes is None:
+        output.commit()
+        return Output(output.path, None, True)
+    written, record = outputhashes.commitoutput(output)
+    return Output(output.path, record, written)
+
+
+class ContainerWriter:
+    """Base writer. containertypes are the container types written, every
+    type when None.
+    """
+
+    containertypes = None
+
+    def handles(self, containertype):
+        """Return True if containers of a type are written."""
+        return self.containertypes is None or containertype in self.containertypes
+
+    def begin(self, containerid, containertype, filename):
+        """Start writing a container."""
+        raise NotImplementedError
+
+    def write(self, path, data):
+        """Write an inner file of the current container."""
+        raise NotImplementedError
+
+    def end(self):
+        """Finish the current container and return its Output, or None
+        when nothing is output for it.
+        """
+        return None
+
+    def close(self):
+        """Finish writing once every container is written."""
+
+
+class DirectoryWriter(ContainerWriter):
+    """Write the inner files of each container to a folder named for it."""
+
+    def __init__(self, folder, containertypes=None):
+        self.folder = folder
+        self.containertypes = containertypes
+        self.containerfolder = None
+
+    def begin(self, containerid, containertype, filename):
+        self.containerfolder = os.path.join(self.folder, filename)
+
+    def write(self, path, data):
+        target = os.path.join(self.containerfolder, *path.split("/"))
+        folder = os.path.dirname(target)
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        try:
+            with open(target, "wb") as innerfile:
+                writeinnerfile(innerfile, data)
+        except IOError as err:
+            logging.error("Cannot write inner file %s: %s", target, err)
+
+
+class ZipWriter(ContainerWriter):
+    """Write each ZIP container to a file in folder.
+
+    Members are written in signature order with fixed timestamps,
+    attributes and compression so the archive is deterministic.
+    """
+
+    containertypes = ("ZIP",)
+
+    def __init__(
+        self,
+        folder,
+        outputhashes=None,
+        compression=ZIP_COMPRESSION,
+        level=None,
+        threads=1,
+    ):
+        self.folder = folder
+        self.outputhashes = outputhashes
+        self.compression = compression
+        self.level = level
+        self.threads = threads
+        self.executor = None
+        self.output = None
+        self.zip = None
+        self.folders = set()
+
+    def begin(self, containerid, containertype, filename):
+        self.output = SpooledOutput(os.path.join(self.folder, filename))
+        self.zip = zipfile.ZipFile(self.output, "w")
+        self.folders = set()
+
+    def write(self, path, data):
+        # Write an entry for each folder as well as the file.
+        parts = path.split("/")[:-1]
+        for idx in range(len(parts)):
+            folder = "{}/".format("/".join(parts[: idx + 1]))
+            if folder not in self.folders:
+                self.folders.add(folder)
+                self.zip.writestr(zipinfo(folder, ZIP_FOLDER_ATTR), b"")
+        info = zipinfo(path, ZIP_FILE_ATTR, self.compression, self.level)
+        blockdeflate = (
+            ZIP_STREAMING
+            and self.compression == zipfile.ZIP_DEFLATED
+            and len(data) >= BLOCK_DEFLATE_THRESHOLD
+            and _hascompressor()
+        )
+        # Before Python 3.13 only writestr() takes the level of a member.
+        if not blockdeflate and (
+            not ZIP_STREAMING or (self.level is not None and not ZIP_INFO_LEVEL)
+        ):
+            self.zip.writestr(info, getinnerfile(data), **levelargs(self.level))
+            return
+        # The size is known up front so ZIP64 is only used when needed.
+        info.file_size = len(data)
+        with self.zip.open(info, "w") as dest:
+            if blockdeflate:
+                deflater = BlockDeflater(dest, self.level, self._executor())
+                writeinnerfile(deflater, data)
+                deflater.close()
+                return
+            writeinnerfile(dest, data)
+
+    def _executor(self):
+        """Return the thread pool blocks are deflated on, None when
+        deflating on one thread.
+        """
+        if self.executor is None and self.threads > 1 and futures is not None:
+            self.executor = futures.ThreadPoolExecutor(self.threads)
+        return self.executor
+
+    def package(self):
+        """Finish the current container and return its SpooledOutput,
+        which is not yet in place.
+        """
+        self.zip.close()
+        self.zip = None
+        output, self.output = self.output, None
+        return output
+
+    def end(self):
+        return _commitspooled(self.package(), self.outputhashes)
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class OLE2Writer(ContainerWriter):
+    """Write each OLE2 container to a file in folder with the native
+    compound file writer. Under Jython the POI writer, olewriter, reads the
+    inner files from the stagingfolder written by a DirectoryWriter
+    instead.
+    """
+
+    containertypes = ("OLE2",)
+
+    def __init__(self, folder, olewriter, stagingfolder=None, outputhashes=None):
+        self.folder = folder
+        self.olewriter = olewriter
+        self.stagingfolder = stagingfolder
+        self.outputhashes = outputhashes
+        self.filename = None
+        self.innerfiles = collections.OrderedDict()
+
+    def begin(self, containerid, containertype, filename):
+        self.filename = filename
+        self.innerfiles = collections.OrderedDict()
+
+    def write(self, path, data):
+        # Compound files are laid out once every stream is known.
+        self.innerfiles[path] = data
+
+    def package(self):
+        """Finish the current container and return its SpooledOutput,
+        which is not yet in place.
+        """
+        innerfiles, self.innerfiles = self.innerfiles, collections.OrderedDict()
+        path = os.path.join(self.folder, self.filename)
+        if self.stagingfolder is None:
+            written = bool(innerfiles)
+        else:
+            written = self.olewriter.writeContainer(
+                os.path.join(self.stagingfolder, self.filename),
+                self.folder,
+                temppath(self.filename),
+            )
+        if not written:
+            raise WriterError("OLE2 container not written: {}".format(self.filename))
+        if self.stagingfolder is not None:
+            return writtenoutput(path)
+        output = SpooledOutput(path)
+        write_compound_file(output, innerfiles)
+        return output
+
+    def end(self):
+        return _commitspooled(self.package(), self.outputhashes)
+
+
+class BundleWriter(ContainerWriter):
+    """Write every container to a single archive at path, a ZIP when it
+    ends '.zip' and otherwise a tar, compressed when it ends '.gz' or
+    '.tgz'. Members are named as in the suite folder, e.g. 'zip/name',
+    and the archive is written sequentially so it can be streamed.
+    """
+
+    containertypes = ("ZIP", "OLE2")
+
+    def __init__(self, path, olewriter, stagingfolder=None, **zipoptions):
+        self.path = path
+        # Each container is packaged in memory before it is appended to
+        # the archive, spilling to a temporary folder when it is large.
+        self.tempfolder = tempfile.mkdtemp(prefix="skeleton-bundle-")
+        self.writers = {
+            "ZIP": ZipWriter(self.tempfolder, **zipoptions),
+            "OLE2": OLE2Writer(self.tempfolder, olewriter, stagingfolder),
+        }
+        self.writer = None
+        self.member = None
+        self.compressed = None
+        self.file = None
+        if path.endswith(".zip"):
+            self.archive = zipfile.ZipFile(path, "w", allowZip64=True)
+            return
+        stream = None
+        if path.endswith((".gz", ".tgz")):
+            # Without a name or timestamp in the gzip header so the same
+            # suite always gives the same bytes.
+            self.file = open(path, "wb")
+            self.compressed = gzip.GzipFile("", "wb", fileobj=self.file, mtime=0)
+            stream = self.compressed
+        self.archive = tarfile.open(path, "w|", stream, format=tarfile.GNU_FORMAT)
+
+    def begin(self, containerid, containertype, filename):
+        self.writer = self.writers[containertype]
+        self.member = "{}/{}".format(containertype.lower(), filename)
+        self.writer.begin(containerid, containertype, filename)
+
+    def write(self, path, data):
+        self.writer.write(path, data)
+
+    def end(self):
+        output = self.writer.package()
+        try:
+            output.seek(0, os.SEEK_END)
+            size = output.tell()
+            record = {"sha256": output.sha256(), "size": size}
+            output.seek(0)
+            self._add(output, size)
+        finally:
+            output.discard()
+        return Output("{}!/{}".format(self.path, self.member), record, True)
+
+    def _add(self, packaged, size):
+        """Append a packaged container to the archive."""
+        if isinstance(self.archive, zipfile.ZipFile):
+            info = zipinfo(self.member, ZIP_FILE_ATTR)
+            if not ZIP_STREAMING:
+                self.archive.writestr(info, packaged.read())
+                return
+            info.file_size = size
+            with self.archive.open(info, "w") as dest:
+                shutil.copyfileobj(packaged, dest, COPY_CHUNK_SIZE)
+            return
+        info = tarfile.TarInfo(self.member)
+        info.size = size
+        info.mtime = TAR_MTIME
+        info.mode = TAR_MODE
+        self.archive.addfile(info, packaged)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.archive.close()
+        if self.compressed is not None:
+            self.compressed.close()
+            self.file.close()
+        shutil.rmtree(self.tempfolder, ignore_errors=True)
+
+
+class MemoryWriter(ZipWriter):
+    """Package each container in memory, nothing is written to disk. The
+    bytes of the last container written are held in data. OLE2 containers
+    are always written by the native compound file writer.
+    """
+
+    containertypes = ("ZIP", "OLE2")
+
+    def __init__(self, **zipoptions):
+        ZipWriter.__init__(self, None, **zipoptions)
+        self.containertype = None
+        self.filename = None
+        self.buffer = None
+        self.innerfiles = collections.OrderedDict()
+        self.data = None
+
+    def begin(self, containerid, containertype, filename):
+        self.containertype = containertype
+        self.filename = filename
+        self.buffer = BytesIO()
+        self.data = None
+        if containertype == "ZIP":
+            self.zip = zipfile.ZipFile(self.buffer, "w")
+            self.folders = set()
+            return
+        self.innerfiles = collections.OrderedDict()
+
+    def write(self, path, data):
+        if self.containertype == "ZIP":
+            ZipWriter.write(self, path, data)
+            return
+        self.innerfiles[path] = data
+
+    def end(self):
+        if self.containertype == "ZIP":
+            self.zip.close()
+            self.zip = None
+        elif not self.innerfiles:
+            raise WriterError("OLE2 container not written: {}".format(self.filename))
+        else:
+            write_compound_file(self.buffer, self.innerfiles)
+            self.innerfiles = collections.OrderedDict()
+        self.data = self.buffer.getvalue()
+        self.buffer = None
+        sha256 = hashlib.sha256(self.data).hexdigest()
+        return Output(self.filename, {"sha256": sha256, "size": len(self.data)}, True)
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for resuming an interrupted run from its checkpoint journal."""
+
+from __future__ import print_function
+
+import hashlib
+import os
+import xml.etree.ElementTree as etree
+
+from checkpointjournal import JOURNAL_NAME, CheckpointJournal
+from DroidStandardSigFileClass import DroidStandardSigFileClass
+from outputhashes import temppath
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+
+def _generate(containersig, standardsig, suite, **options):
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=suite, **options
+    )
+    skg.generateskeletonfiles()
+    return skg
+
+
+def _read(path):
+    with open(path, "rb") as output:
+        return output.read()
+
+
+def _write(path, data):
+    with open(path, "wb") as output:
+        output.write(data)
+
+
+def test_finished(tmp_path):
+    output = str(tmp_path / "output.zip")
+    _write(output, b"data")
+    journal = CheckpointJournal(str(tmp_path / JOURNAL_NAME), {"fill": 0})
+    journal.record("1", output, hashlib.sha256(b"data").hexdigest(), 4)
+    journal.close()
+    journal = CheckpointJournal(str(tmp_path / JOURNAL_NAME), {"fill": 0}, True)
+    assert journal.finished("1", output)
+    assert not journal.finished("1", str(tmp_path / "other.zip"))
+    assert not journal.finished("2", output)
+    _write(output, b"dat")
+    assert not journal.finished("1", output)
+    journal.close()
+
+
+def test_settings_changed(tmp_path):
+    path = str(tmp_path / JOURNAL_NAME)
+    journal = CheckpointJournal(path, {"fill": 0})
+    journal.record("1", "output.zip", "0" * 64, 4)
+    journal.close()
+    assert CheckpointJournal(path, {"fill": 0}, True).completed
+    assert not CheckpointJournal(path, {"fill": 1}, True).completed
+
+
+def test_resume_interrupted_run(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    skg = _generate(containersig, standardsig, suite)
+    outputs = dict((path, _read(path)) for path, _ in skg.outputs)
+    # Interrupted part way through a journal line and an output.
+    journalpath = os.path.join(suite, JOURNAL_NAME)
+    _write(journalpath, _read(journalpath)[:-40])
+    partial = skg.outputpath("ZIP", skg.filenames["1020"])
+    _write(partial, outputs[partial][:100])
+    _write(temppath(partial), b"partial")
+
+    skg = _generate(containersig, standardsig, suite, resume=True)
+    assert skg.resumed == 2
+    assert not os.path.exists(temppath(partial))
+    assert dict((path, _read(path)) for path, _ in skg.outputs) == outputs
+    # Every container is journalled again.
+    journal = CheckpointJournal(journalpath, skg._outputsettings(), True)
+    assert sorted(journal.completed) == ["1000", "1020", "1030", "1050"]
+    journal.close()
+    assert _generate(containersig, standardsig, suite, resume=True).resumed == 4
+    # A different fill changes every output so nothing is resumed.
+    assert _generate(containersig, standardsig, suite, resume=True, fill=1).resumed == 0
+
+
+def test_journal_parsed_inputs(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    skg = _generate(
+        etree.parse(containersig).getroot(),
+        DroidStandardSigFileClass(standardsig),
+        suite,
+    )
+    assert (skg.zipwritten, skg.ole2written) == (3, 1)
+    skg = _generate(
+        etree.parse(containersig).getroot(),
+        DroidStandardSigFileClass(standardsig),
+        suite,
+        resume=True,
+    )
+    assert skg.resumed == 4
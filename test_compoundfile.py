@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the compound file writer and reader."""
+
+from __future__ import print_function
+
+import struct
+from io import BytesIO
+
+import pytest
+
+from ole2reader import HEADER, CompoundFileError, CompoundFileReader
+from PyWriteOLE2Containers import (
+    CFB_SIGNATURE,
+    HEADER_DIFAT_ENTRIES,
+    MINI_STREAM_CUTOFF,
+    SECTOR_SIZE,
+    write_compound_file,
+)
+from signature2bytegenerator import SegmentBuffer
+
+
+def _pattern(size):
+    """Return size bytes which differ from sector to sector."""
+    return bytes(bytearray(idx * 7 % 251 for idx in range(size)))
+
+
+def _compoundfile(innerfiles):
+    out = BytesIO()
+    write_compound_file(out, innerfiles)
+    return out.getvalue()
+
+
+def _roundtrip(innerfiles):
+    return CompoundFileReader(_compoundfile(innerfiles)).streams()
+
+
+def test_mini_stream_roundtrip():
+    innerfiles = {"CompObj": b"\x01\x00\xfe\xff", "WordDocument": _pattern(700)}
+    data = _compoundfile(innerfiles)
+    assert data[:8] == CFB_SIGNATURE
+    assert len(data) % SECTOR_SIZE == 0
+    assert CompoundFileReader(data).streams() == innerfiles
+
+
+def test_mini_stream_cutoff():
+    innerfiles = {
+        "Small": _pattern(MINI_STREAM_CUTOFF - 1),
+        "Large": _pattern(MINI_STREAM_CUTOFF),
+        "Empty": b"",
+    }
+    reader = CompoundFileReader(_compoundfile(innerfiles))
+    assert reader.cutoff == MINI_STREAM_CUTOFF
+    assert reader.streams() == innerfiles
+
+
+def test_fat_chains_of_several_streams():
+    innerfiles = dict(
+        ("Stream{}".format(idx), _pattern(SECTOR_SIZE * idx + idx))
+        for idx in range(8, 16)
+    )
+    assert _roundtrip(innerfiles) == innerfiles
+
+
+def test_nested_storages():
+    innerfiles = {
+        "WordDocument": b"word",
+        "ObjectPool/_1234/Ole": b"ole",
+        "ObjectPool/_1234/CompObj": _pattern(5000),
+        "ObjectPool/_5678/Ole": b"other",
+    }
+    assert _roundtrip(innerfiles) == innerfiles
+
+
+def test_difat_above_seven_megabytes():
+    # Each FAT sector maps 128 sectors so the 109 header DIFAT entries
+    # cover under 7 MB of sectors.
+    size = 8 * 1024 * 1024
+    data = _compoundfile({"Big": _pattern(size)})
+    header = struct.unpack_from(HEADER, data, 0)
+    assert header[9] > HEADER_DIFAT_ENTRIES
+    assert header[16] > 0
+    assert CompoundFileReader(data).streams()["Big"] == _pattern(size)
+
+
+def test_segmentbuffer_streams_match_bytes():
+    buffer = SegmentBuffer()
+    buffer.write(b"head")
+    buffer.fill(MINI_STREAM_CUTOFF * 2, 0xFF)
+    buffer.write(b"tail")
+    assert _compoundfile({"Data": buffer}) == _compoundfile(
+        {"Data": buffer.getvalue()}
+    )
+
+
+def test_reader_rejects_other_files():
+    with pytest.raises(CompoundFileError):
+        CompoundFileReader(b"PK\x03\x04" + b"\x00" * 600)
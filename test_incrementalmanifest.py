@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for only regenerating containers whose inputs have changed."""
+
+from __future__ import print_function
+
+import io
+import os
+import threading
+import xml.etree.ElementTree as etree
+
+from conftest import CONTAINER_SIGNATURES
+from incrementalmanifest import canonicalxml
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+
+def _generate(containersig, standardsig, suite, **options):
+    skg = SkeletonContainerGenerator(
+        containersig,
+        standardsig,
+        False,
+        incremental=True,
+        suitefolder=suite,
+        **options
+    )
+    skg.generateskeletonfiles()
+    return skg
+
+
+def _rewrite(containersig, old, new):
+    with io.open(containersig, "w", encoding="utf-8") as sigfile:
+        sigfile.write(CONTAINER_SIGNATURES.replace(old, new))
+
+
+def test_canonicalxml():
+    first = etree.fromstring('<a y="2" x="1">\n  <b> text </b>\n</a>')
+    second = etree.fromstring('<a x="1" y="2"><b>text</b></a>')
+    assert canonicalxml(first) == '<a x="1" y="2"><b>text</b></a>'
+    assert canonicalxml(second) == canonicalxml(first)
+
+
+def test_unchanged_skipped(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    first = _generate(containersig, standardsig, suite)
+    assert (first.zipwritten, first.ole2written, first.unchanged) == (3, 1, 0)
+    second = _generate(containersig, standardsig, suite)
+    assert (second.zipwritten, second.ole2written, second.unchanged) == (0, 0, 4)
+    assert (second.zipcount, second.ole2count) == (3, 1)
+
+
+def test_changed_container_regenerated(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    _generate(containersig, standardsig, suite)
+    _rewrite(containersig, "'Word.Document.'", "'Word.Document!'")
+    skg = _generate(containersig, standardsig, suite)
+    assert (skg.zipwritten, skg.ole2written, skg.unchanged) == (0, 1, 3)
+    # Options which change the output regenerate every container.
+    skg = _generate(containersig, standardsig, suite, fill=0xFF)
+    assert (skg.zipwritten, skg.ole2written, skg.unchanged) == (3, 1, 0)
+
+
+def test_removed_container_pruned(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    skg = _generate(containersig, standardsig, suite)
+    output = skg.outputpath("ZIP", skg.filenames["1050"])
+    assert os.path.exists(output)
+    _rewrite(containersig, '<FileFormatMapping signatureId="1050" Puid="fmt/412"/>', "")
+    skg = _generate(containersig, standardsig, suite)
+    assert "1050" not in skg.filenames
+    assert not os.path.exists(output)
+
+
+def test_filtered_on_main_thread(monkeypatch, tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    _generate(containersig, standardsig, suite)
+    threads = []
+    unchanged = SkeletonContainerGenerator._unchanged
+
+    def recorded(self, container, containerfilename):
+        threads.append(threading.current_thread())
+        return unchanged(self, container, containerfilename)
+
+    monkeypatch.setattr(SkeletonContainerGenerator, "_unchanged", recorded)
+    _rewrite(containersig, "'Word.Document.'", "'Word.Document!'")
+    skg = _generate(containersig, standardsig, suite, jobs=2)
+    # The statistics are only updated on the thread which merges them.
+    assert threads == [threading.current_thread()] * 4
+    assert (skg.ole2written, skg.unchanged, skg.zipcount) == (1, 3, 3)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the JSON lines manifest of a run."""
+
+from __future__ import print_function
+
+import hashlib
+import io
+import json
+import xml.etree.ElementTree as etree
+
+from jsonlmanifest import JSONL_VERSION, JsonlManifest, provenance
+from signaturecache import filehash
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+
+def _lines(path):
+    with io.open(path, encoding="utf-8") as manifest:
+        return [json.loads(line) for line in manifest]
+
+
+def test_lines_flushed(tmp_path):
+    path = str(tmp_path / "manifest.jsonl")
+    manifest = JsonlManifest(path)
+    manifest.write({"id": "1", "size": 2})
+    # Readable while the run is still writing.
+    assert _lines(path) == [{"id": "1", "size": 2}]
+    manifest.close()
+
+
+def test_provenance(containersig, standardsig):
+    record = provenance(containersig, standardsig, fill=0)["provenance"]
+    assert record["manifest_version"] == JSONL_VERSION
+    assert record["container_signature_file"] == containersig
+    assert record["container_signature_sha256"] == filehash(containersig)
+    assert record["standard_signature_sha256"] == filehash(standardsig)
+    assert record["fill"] == 0
+
+
+def test_provenance_parsed_input(containersig, standardsig):
+    root = etree.parse(containersig).getroot()
+    record = provenance(root, standardsig)["provenance"]
+    assert record["container_signature_file"] is None
+    assert len(record["container_signature_sha256"]) == 64
+
+
+def test_run_manifest(tmp_path, containersig, standardsig):
+    path = str(tmp_path / "manifest.jsonl")
+    SkeletonContainerGenerator(
+        containersig,
+        standardsig,
+        False,
+        jsonl=path,
+        seed=2,
+        suitefolder=str(tmp_path / "suite"),
+    ).generateskeletonfiles()
+    lines = _lines(path)
+    assert lines[0]["provenance"]["seed"] == 2
+    records = dict((record["id"], record) for record in lines[1:])
+    assert sorted(records) == ["1000", "1020", "1030", "1050"]
+    record = records["1020"]
+    assert record["status"] == "written"
+    assert record["puids"] == ["fmt/412"]
+    assert [innerfile["path"] for innerfile in record["files"]] == [
+        "[Content_Types].xml",
+        "word/document.xml",
+    ]
+    with open(record["output"], "rb") as output:
+        data = output.read()
+    assert record["size"] == len(data)
+    assert record["sha256"] == hashlib.sha256(data).hexdigest()
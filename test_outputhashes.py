@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for only writing outputs whose content has changed."""
+
+from __future__ import print_function
+
+import hashlib
+import os
+
+from outputhashes import HASHES_NAME, OutputHashes, SpooledOutput, temppath
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+
+def _output(path, data, maxsize=1024):
+    output = SpooledOutput(path, maxsize)
+    output.write(data)
+    return output
+
+
+def _read(path):
+    with open(path, "rb") as output:
+        return output.read()
+
+
+def test_spooled_output(tmp_path):
+    path = str(tmp_path / "small.zip")
+    small = _output(path, b"a" * 1024)
+    assert not small.spilled
+    assert not os.path.exists(temppath(path))
+    large = _output(str(tmp_path / "large.zip"), b"a" * 1025)
+    assert large.spilled
+    assert small.sha256() == hashlib.sha256(b"a" * 1024).hexdigest()
+    assert large.sha256() == hashlib.sha256(b"a" * 1025).hexdigest()
+    small.commit()
+    assert _read(path) == b"a" * 1024
+    large.discard()
+    assert not os.path.exists(temppath(str(tmp_path / "large.zip")))
+
+
+def test_identical_output_not_written(monkeypatch, tmp_path):
+    path = str(tmp_path / "output.zip")
+    hashes = OutputHashes(str(tmp_path / HASHES_NAME))
+    written, record = hashes.commitoutput(_output(path, b"data"))
+    assert written
+    assert record["sha256"] == hashlib.sha256(b"data").hexdigest()
+    hashes.save([(path, record)])
+
+    def save(output):
+        raise AssertionError("Identical output written")
+
+    monkeypatch.setattr(SpooledOutput, "save", save)
+    hashes = OutputHashes(str(tmp_path / HASHES_NAME))
+    assert hashes.commitoutput(_output(path, b"data")) == (False, record)
+    monkeypatch.undo()
+    written, _ = hashes.commitoutput(_output(path, b"changed"))
+    assert written
+    assert _read(path) == b"changed"
+
+
+def test_identical_spilled_output_removed(tmp_path):
+    path = str(tmp_path / "output.zip")
+    hashes = OutputHashes(str(tmp_path / HASHES_NAME))
+    hashes.commitoutput(_output(path, b"a" * 2048))
+    written, _ = hashes.commitoutput(_output(path, b"a" * 2048))
+    assert not written
+    assert not os.path.exists(temppath(path))
+
+
+def test_regenerated_suite_untouched(monkeypatch, tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    first = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=suite
+    )
+    first.generateskeletonfiles()
+    mtimes = dict((path, os.stat(path).st_mtime) for path, _ in first.outputs)
+
+    def save(output):
+        raise AssertionError("Identical output written")
+
+    # Outputs held in memory are hashed without being written.
+    monkeypatch.setattr(SpooledOutput, "save", save)
+    second = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=suite
+    )
+    second.generateskeletonfiles()
+    assert second.identical == 4
+    assert (second.zipwritten, second.ole2written) == (3, 1)
+    assert dict((path, os.stat(path).st_mtime) for path, _ in second.outputs) == mtimes
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the layout of byte sequences in a skeleton file."""
+
+from __future__ import print_function
+
+import xml.etree.ElementTree as etree
+
+from sequencelayout import layout, offsetof, positionof
+
+
+def _bytesequence(xml):
+    return etree.fromstring(xml)
+
+
+def _layout(*xmls):
+    return layout([_bytesequence(xml) for xml in xmls], 0).getvalue()
+
+
+def test_bof_offset():
+    data = _layout(
+        '<ByteSequence Reference="BOFoffset">'
+        '<SubSequence Position="1" SubSeqMinOffset="4">'
+        "<Sequence>AA BB</Sequence></SubSequence></ByteSequence>"
+    )
+    assert data == b"\x00\x00\x00\x00\xaa\xbb"
+
+
+def test_bof_subsequences_by_position():
+    data = _layout(
+        '<ByteSequence Reference="BOFoffset">'
+        '<SubSequence Position="2" SubSeqMinOffset="3">'
+        "<Sequence>CC</Sequence></SubSequence>"
+        '<SubSequence Position="1" SubSeqMinOffset="1">'
+        "<Sequence>AA BB</Sequence></SubSequence></ByteSequence>"
+    )
+    assert data == b"\x00\xaa\xbb\x00\x00\x00\xcc"
+
+
+def test_eof_offset():
+    data = _layout(
+        '<ByteSequence Reference="BOFoffset">'
+        '<SubSequence Position="1"><Sequence>AA</Sequence></SubSequence>'
+        "</ByteSequence>",
+        '<ByteSequence Reference="EOFoffset">'
+        '<SubSequence Position="1" SubSeqMinOffset="2">'
+        "<Sequence>EE FF</Sequence></SubSequence></ByteSequence>",
+    )
+    assert data == b"\xaa\xee\xff\x00\x00"
+
+
+def test_eof_subsequences_by_position():
+    # Position 1 is nearest the end of the file.
+    data = _layout(
+        '<ByteSequence Reference="EOFoffset">'
+        '<SubSequence Position="1" SubSeqMinOffset="1">'
+        "<Sequence>FF</Sequence></SubSequence>"
+        '<SubSequence Position="2" SubSeqMinOffset="2">'
+        "<Sequence>EE</Sequence></SubSequence></ByteSequence>"
+    )
+    assert data == b"\xee\x00\x00\xff\x00"
+
+
+def test_fragments():
+    data = _layout(
+        '<ByteSequence Reference="BOFoffset">'
+        '<SubSequence Position="1"><Sequence>BB</Sequence>'
+        '<LeftFragment Position="1" MinOffset="1" MaxOffset="3">AA</LeftFragment>'
+        '<RightFragment Position="1" MinOffset="2" MaxOffset="2">CC</RightFragment>'
+        '<RightFragment Position="2" MinOffset="0" MaxOffset="0">DD</RightFragment>'
+        "</SubSequence></ByteSequence>"
+    )
+    assert data == b"\xaa\x00\xbb\x00\x00\xcc\xdd"
+
+
+def test_variable_sequence_follows_bof():
+    data = _layout(
+        '<ByteSequence><SubSequence Position="1" SubSeqMinOffset="1">'
+        "<Sequence>BB</Sequence></SubSequence></ByteSequence>",
+        '<ByteSequence Reference="BOFoffset">'
+        '<SubSequence Position="1"><Sequence>AA</Sequence></SubSequence>'
+        "</ByteSequence>",
+    )
+    assert data == b"\xaa\x00\xbb"
+
+
+def test_offsetof_and_positionof():
+    element = etree.fromstring('<SubSequence Position="2" SubSeqMinOffset=" "/>')
+    assert offsetof(element, "SubSeqMinOffset") == 0
+    assert offsetof(element, "SubSeqMaxOffset") == 0
+    assert positionof(element) == 2
+    assert positionof(etree.fromstring("<LeftFragment/>")) == 1
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for compiling and rendering signatures and filling gaps."""
+
+from __future__ import print_function
+
+import collections
+import io
+import random
+
+import pytest
+
+import signature2bytegenerator
+from signature2bytegenerator import (
+    FILL_RANDOM,
+    RANDOM_BLOCK_SIZE,
+    Fill,
+    Alternation,
+    ByteSet,
+    Gap,
+    Literal,
+    Mask,
+    SegmentBuffer,
+    cached_signatures,
+    compile_signature,
+    format_signature,
+    load_cache,
+    Sig2ByteGenerator,
+    render,
+)
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    """Compile into an empty cache of three sequences."""
+    monkeypatch.setattr(signature2bytegenerator, "CACHE_SIZE", 3)
+    monkeypatch.setattr(signature2bytegenerator, "_compiled", collections.OrderedDict())
+    return signature2bytegenerator._compiled
+
+
+@pytest.mark.parametrize(
+    "signature, ir",
+    [
+        ("0A 0b", (Literal(b"\x0a\x0b"),)),
+        ("'Word' 00", (Literal(b"Word\x00"),)),
+        ("AA {4} BB", (Literal(b"\xaa"), Gap(4, 4, 4), Literal(b"\xbb"))),
+        ("AA {2-6}", (Literal(b"\xaa"), Gap(2, 6, 4))),
+        ("[01:03]", (ByteSet(((1, 3),), False),)),
+        ("[!'a']", (ByteSet(((0x61, 0x61),), True),)),
+        ("[&08]", (Mask(8, False, False),)),
+        (
+            "(AA|BB CC)",
+            (Alternation(((Literal(b"\xaa"),), (Literal(b"\xbb\xcc"),))),),
+        ),
+        (
+            "(AA|(BB|CC)) DD",
+            (
+                Alternation(
+                    (
+                        (Literal(b"\xaa"),),
+                        (Alternation(((Literal(b"\xbb"),), (Literal(b"\xcc"),))),),
+                    )
+                ),
+                Literal(b"\xdd"),
+            ),
+        ),
+        ("('a)'|BB)", (Alternation(((Literal(b"a)"),), (Literal(b"\xbb"),))),)),
+    ],
+)
+def test_tokenize(signature, ir):
+    assert compile_signature(signature) == ir
+
+
+def test_format_nested_alternation():
+    assert format_signature(compile_signature("((AA|BB)|CC) 'D'")) == (
+        "((aa|bb)|cc)44"
+    )
+
+
+def test_render_nested_alternation_writes_first_options():
+    ir = compile_signature("(AA|(BB|CC)) {2} DD")
+    assert render(ir, 0).getvalue() == b"\xaa\x00\x00\xdd"
+
+
+@pytest.mark.parametrize("signature", ["(AA|BB", "AA {2", "[01", "A", "AA ]"])
+def test_invalid_signatures_compile_to_nothing(signature):
+    assert compile_signature(signature) == ()
+
+
+def test_compiled_once(monkeypatch, compiled):
+    compiles = []
+    compile_ = signature2bytegenerator._compile
+
+    def counted(signature):
+        compiles.append(signature)
+        return compile_(signature)
+
+    monkeypatch.setattr(signature2bytegenerator, "_compile", counted)
+    assert compile_signature("AA BB") is compile_signature("AA BB")
+    assert compiles == ["AA BB"]
+
+
+def test_cache_bounded(compiled):
+    for value in ["01", "02", "03", "01", "04"]:
+        compile_signature(value)
+    # The least recently used is evicted.
+    assert list(compiled) == ["03", "01", "04"]
+
+
+def test_load_cache(compiled):
+    compile_signature("01")
+    load_cache([("02", (Literal(b"\x02"),)), ("03", (Literal(b"\x03"),))])
+    assert cached_signatures() == [
+        ("01", (Literal(b"\x01"),)),
+        ("02", (Literal(b"\x02"),)),
+        ("03", (Literal(b"\x03"),)),
+    ]
+    load_cache([("04", ())])
+    assert [signature for signature, _ in cached_signatures()] == ["02", "03", "04"]
+
+
+@pytest.mark.parametrize(
+    "signature, data",
+    [
+        ("'PK' ?? 0A", b"PK\xff\x0a"),
+        ("AA [01:03] [!'a'] [!01:FE]", b"\xaa\x02\x60\x00"),
+        ("[&08] [!&08]", b"\x08\x00"),
+        ("('ab'|CC) DD", b"ab\xdd"),
+        ("AA {2-6} BB", b"\xaa\xff\xff\xff\xff\xbb"),
+    ],
+)
+def test_map_signature(signature, data):
+    mapped = Sig2ByteGenerator().map_signature("null", signature, "null", 0xFF)
+    assert mapped == bytearray(data)
+
+
+def test_map_signature_offsets():
+    mapped = Sig2ByteGenerator().map_signature("2", "AA", "3", 0)
+    assert mapped == bytearray(b"\x00\x00\xaa\x00\x00\x00")
+
+
+def test_large_fill_held_lazily():
+    out = SegmentBuffer()
+    out.write(b"AA")
+    out.fill(10 ** 9, 0)
+    out.write(b"BB")
+    assert len(out) == 10 ** 9 + 4
+    assert out.segments == [b"AA", Fill(10 ** 9, 0, None, 0), b"BB"]
+
+
+def test_writes_behave_as_bytesio():
+    out, expected = SegmentBuffer(), io.BytesIO()
+    for stream in (out, expected):
+        stream.write(b"0123456789")
+        stream.seek(3)
+        stream.write(b"abc")
+        stream.seek(-2, io.SEEK_END)
+        stream.write(b"xyz")
+        stream.seek(20)
+        stream.write(b"!")
+    out.seek(0)
+    out.fill(2, 0x2E)
+    expected.seek(0)
+    expected.write(b"..")
+    assert out.getvalue() == expected.getvalue()
+    assert out.tell() == expected.tell()
+
+
+class _Chunks(list):
+    """A stream which records each write."""
+
+    write = list.append
+
+
+def test_writeto_in_chunks():
+    inner = SegmentBuffer()
+    inner.fill(10, 0x41)
+    out = SegmentBuffer()
+    out.write(b"<")
+    out.write(inner)
+    out.write(b">")
+    chunks = _Chunks()
+    out.writeto(chunks, 4)
+    assert chunks == [b"<", b"AAAA", b"AAAA", b"AA", b">"]
+
+
+def test_random_fill_known_bytes():
+    # The same on every Python version.
+    fill = signature2bytegenerator._random_fill(7, 0, 9)
+    assert fill == b"\xac\x0a\xe4\xce\x0d\x04\x8a\xb6\x71"
+
+
+def test_random_fill_any_part():
+    whole = signature2bytegenerator._random_fill(3, 0, 2 * RANDOM_BLOCK_SIZE + 5)
+    for start, length in [(0, 1), (1, 6), (100, 33), (RANDOM_BLOCK_SIZE - 3, 10)]:
+        part = signature2bytegenerator._random_fill(3, start, length)
+        assert part == whole[start : start + length]
+
+
+def test_random_fill_reproducible():
+    ir = compile_signature("AA {16} BB {4-8} CC")
+    first = render(ir, FILL_RANDOM, SegmentBuffer(random.Random(5))).getvalue()
+    second = render(ir, FILL_RANDOM, SegmentBuffer(random.Random(5))).getvalue()
+    assert first == second
+    assert len(first) == 25
+
+
+def test_small_random_fills_generate_little(monkeypatch):
+    generated = []
+    random_bytes = signature2bytegenerator._random_bytes
+
+    def counted(rng, number):
+        generated.append(number)
+        return random_bytes(rng, number)
+
+    monkeypatch.setattr(signature2bytegenerator, "_random_bytes", counted)
+    ir = compile_signature(" ".join(["AA ??"] * 200))
+    data = render(ir, FILL_RANDOM, SegmentBuffer(random.Random(1))).getvalue()
+    assert len(data) == 400
+    # One byte per gap, not a whole block.
+    assert sum(generated) == 200
+
+
+def test_fill_byte():
+    ir = compile_signature("AA {3} BB")
+    assert render(ir, 0xFF).getvalue() == b"\xaa\xff\xff\xff\xbb"
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for caching parsed signature files between runs."""
+
+from __future__ import print_function
+
+import os
+
+import pytest
+
+from signaturecache import SignatureCache, filehash, signaturehash
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+needs_ownership = pytest.mark.skipif(
+    not hasattr(os, "getuid"), reason="needs file ownership"
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SignatureCache(str(tmp_path / "cache"))
+
+
+def test_roundtrip(cache, standardsig):
+    assert cache.get("formats", standardsig) is None
+    cache.put("formats", standardsig, {"fmt/40": ("doc",)})
+    assert cache.get("formats", standardsig) == {"fmt/40": ("doc",)}
+    assert cache.key(standardsig) == filehash(standardsig) == signaturehash(standardsig)
+
+
+def test_changed_file_misses(tmp_path, standardsig):
+    cache = SignatureCache(str(tmp_path / "cache"))
+    cache.put("formats", standardsig, {})
+    with open(standardsig, "a") as sigfile:
+        sigfile.write("\n")
+    # A new run hashes the file again.
+    assert SignatureCache(str(tmp_path / "cache")).get("formats", standardsig) is None
+
+
+def test_evicts_least_recently_used(tmp_path, containersig, standardsig):
+    cache = SignatureCache(str(tmp_path / "cache"), maxsize=1500)
+    cache.put("first", standardsig, b"1" * 1000)
+    os.utime(cache._entrypath("first", standardsig), (1, 1))
+    cache.put("second", containersig, b"2" * 1000)
+    assert cache.get("first", standardsig) is None
+    assert cache.get("second", containersig) == b"2" * 1000
+
+
+@needs_ownership
+def test_new_folder_private(cache):
+    assert os.stat(cache.folder).st_mode & 0o777 == 0o700
+
+
+@needs_ownership
+def test_folder_writable_by_others_not_used(tmp_path, standardsig):
+    folder = tmp_path / "shared"
+    folder.mkdir()
+    SignatureCache(str(folder)).put("formats", standardsig, {})
+    os.chmod(str(folder), 0o777)
+    cache = SignatureCache(str(folder))
+    assert not cache.enabled
+    assert cache.get("formats", standardsig) is None
+
+
+@needs_ownership
+def test_entry_writable_by_others_ignored(cache, standardsig):
+    cache.put("formats", standardsig, {})
+    os.chmod(cache._entrypath("formats", standardsig), 0o666)
+    assert cache.get("formats", standardsig) is None
+
+
+def _generate(folder, containersig, standardsig, cache):
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, stream=True, cache=cache, suitefolder=folder
+    )
+    skg.generateskeletonfiles()
+    return skg
+
+
+def test_stream_caches_whole_containers(tmp_path, containersig, standardsig):
+    cache = str(tmp_path / "cache")
+    first = _generate(str(tmp_path / "first"), containersig, standardsig, cache)
+    mappings, containers = first.cache.get("containers", containersig)
+    assert len(mappings) == 5
+    # Streamed elements are cleared once written and must not be cached.
+    assert all(len(container) for container in containers)
+    second = _generate(str(tmp_path / "second"), containersig, standardsig, cache)
+    assert [record["sha256"] for _, record in second.outputs] == [
+        record["sha256"] for _, record in first.outputs
+    ]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the benchmark harness and its synthetic signature files."""
+
+from __future__ import print_function
+
+import collections
+
+from skeletonbenchmark import RESULTS_VERSION, compare, run, synthesize
+from skeletoncontainergenerator import SkeletonContainerGenerator
+
+PARAMETERS = collections.OrderedDict(
+    [
+        ("containers", 8),
+        ("files", 3),
+        ("sequence_length", 8),
+        ("gap", 16),
+        ("shared_puids", 0.25),
+        ("seed", 1),
+    ]
+)
+
+
+def _synthesize(folder):
+    folder.mkdir()
+    return synthesize(str(folder), **PARAMETERS)
+
+
+def _read(path):
+    with open(path, "rb") as sigfile:
+        return sigfile.read()
+
+
+def test_synthesize_reproducible(tmp_path):
+    first = _synthesize(tmp_path / "first")
+    second = _synthesize(tmp_path / "second")
+    for firstpath, secondpath in zip(first, second):
+        assert _read(firstpath) == _read(secondpath)
+
+
+def test_synthetic_suite_generated(tmp_path):
+    containersig, standardsig = _synthesize(tmp_path / "signatures")
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=str(tmp_path / "suite")
+    )
+    skg.generateskeletonfiles()
+    assert skg.nocontainersigs == 8
+    assert (skg.zipwritten, skg.ole2written) == (6, 2)
+    assert skg.invalidpuids == []
+
+
+def test_run():
+    results = run(PARAMETERS, 1)
+    assert results["version"] == RESULTS_VERSION
+    assert list(results["benchmarks"]) == [
+        "generateskeletonfiles",
+        "map_signature",
+        "retrieve_ext_list",
+    ]
+    for result in results["benchmarks"].values():
+        assert 0 <= result["min"] <= result["mean"]
+
+
+def _results(**times):
+    return {
+        "version": RESULTS_VERSION,
+        "parameters": PARAMETERS,
+        "benchmarks": dict(
+            (name, {"min": time, "mean": time}) for name, time in times.items()
+        ),
+    }
+
+
+def test_compare():
+    baseline = _results(generate=1.0, map_signature=1.0, lookup=0.0)
+    results = _results(generate=1.2, map_signature=1.3, lookup=1.0)
+    assert compare(results, baseline) == ["map_signature"]
+    assert compare(results, baseline, threshold=1.1) == ["generate", "map_signature"]
+    baseline["version"] = RESULTS_VERSION + 1
+    assert compare(results, baseline) == []
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for mapping and generating the skeleton container suite."""
+
+from __future__ import print_function
+
+import os
+import zipfile
+
+import pytest
+
+from skeletoncontainergenerator import (
+    DEFAULT_OPTIONS,
+    ContainerSelection,
+    SkeletonContainerGenerator,
+)
+
+
+@pytest.fixture
+def suite(tmp_path):
+    return str(tmp_path / "suite")
+
+
+@pytest.fixture
+def generator(containersig, standardsig, suite):
+    def generator(**options):
+        return SkeletonContainerGenerator(
+            containersig, standardsig, False, suitefolder=suite, **options
+        )
+
+    return generator
+
+
+def test_mapcontainers(generator):
+    skg = generator()
+    mapping = skg.mapcontainers(skg.formatmappings())
+    assert mapping.filenames == {
+        "1000": "fmt-40-container-signature-id-1000.doc",
+        "1020": "fmt-412-container-signature-id-1020.docx",
+        "1030": "x-fmt-3-container-signature-id-1030.odt",
+        "1050": "fmt-412-container-signature-id-1050.docx",
+    }
+    assert mapping.duplicateids == []
+    assert mapping.duplicatepuids == {"fmt/412": ["1020", "1050"]}
+    assert mapping.invalidpuids == ["fmt/0000"]
+    assert skg.nocontainersigs == 5
+    assert skg.containerinputs["1030"] == ("x-fmt/3", "odt")
+
+
+def test_mapcontainers_again(generator):
+    skg = generator()
+    first = skg.mapcontainers(skg.formatmappings())
+    second = skg.mapcontainers(skg.formatmappings())
+    assert second == first
+    assert skg.nocontainersigs == 5
+    assert skg.invalidpuids == ["fmt/0000"]
+    assert skg.containerpuids["1020"] == ["fmt/412"]
+
+
+def test_mapcontainers_new_selection(generator):
+    skg = generator()
+    skg.mapcontainers(skg.formatmappings())
+    skg.selection = ContainerSelection(ids=["1000"])
+    mapping = skg.mapcontainers(skg.formatmappings())
+    assert list(mapping.filenames) == ["1000"]
+    assert skg.nocontainersigs == 1
+    assert skg.invalidpuids == []
+    assert list(skg.containerinputs) == ["1000"]
+
+
+def test_options(containersig, standardsig, suite):
+    options = DEFAULT_OPTIONS._replace(fill=0xFF, suitefolder=suite)
+    skg = SkeletonContainerGenerator(containersig, standardsig, False, options)
+    assert skg.fill == 0xFF
+    assert skg.suitefolder == suite
+    # Keywords override the options given.
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, options, fill=0, seed=1
+    )
+    assert skg.options == options._replace(fill=0, seed=1)
+
+
+def test_workeroptions(generator, tmp_path):
+    skg = generator(fill=0xAA, cache=str(tmp_path / "cache"), profile=True)
+    options = skg.workeroptions()
+    assert (options.fill, options.suitefolder) == (0xAA, skg.suitefolder)
+    assert options.cache == skg.cache.folder
+    assert options.profile
+    # Workers each write their own containers.
+    assert (options.jobs, options.incremental, options.bundle) == (1, False, None)
+
+
+@pytest.mark.parametrize(
+    "selection, selected",
+    [
+        ({}, ["1", "2", "3"]),
+        ({"ids": ["1"], "puids": ["fmt/2"]}, ["1", "2"]),
+        ({"puids": ["fmt/2"], "types": ["zip"]}, []),
+        ({"types": ["ole2"]}, ["2"]),
+    ],
+)
+def test_selected(selection, selected):
+    mappings = [("1", "fmt/1", "ZIP"), ("2", "fmt/2", "OLE2"), ("3", "fmt/3", "ZIP")]
+    containerselection = ContainerSelection(**selection)
+    assert [
+        mapping[0] for mapping in mappings if containerselection.selected(*mapping)
+    ] == selected
+
+
+def _contents(folder):
+    contents = {}
+    for subfolder in ("zip", "ole2"):
+        for name in os.listdir(os.path.join(folder, subfolder)):
+            with open(os.path.join(folder, subfolder, name), "rb") as output:
+                contents[name] = output.read()
+    return contents
+
+
+def _generate(containersig, standardsig, folder, **options):
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=folder, **options
+    )
+    skg.generateskeletonfiles()
+    return skg
+
+
+def test_jobs_match_one_process(tmp_path, containersig, standardsig):
+    one, two = str(tmp_path / "one"), str(tmp_path / "two")
+    single = _generate(containersig, standardsig, one, fill=-1, seed=3)
+    parallel = _generate(containersig, standardsig, two, fill=-1, seed=3, jobs=2)
+    assert len(_contents(one)) == 4
+    assert _contents(two) == _contents(one)
+    # Merged in container order.
+    assert [record["sha256"] for _, record in parallel.outputs] == [
+        record["sha256"] for _, record in single.outputs
+    ]
+    stats = parallel.stats()
+    for key in ("zipcount", "ole2count", "zipwritten", "ole2written"):
+        assert stats[key] == single.stats()[key]
+
+
+def test_zip_packaged_in_memory(tmp_path, containersig, standardsig):
+    suite = str(tmp_path / "suite")
+    _generate(containersig, standardsig, suite)
+    assert not os.path.exists(os.path.join(suite, "skeleton-folders"))
+    output = os.path.join(suite, "zip", "fmt-412-container-signature-id-1020.docx")
+    with zipfile.ZipFile(output) as container:
+        assert container.namelist() == [
+            "[Content_Types].xml",
+            "word/",
+            "word/document.xml",
+        ]
+        document = container.read("word/document.xml")
+    # The staging tree is only written when debugging.
+    debug = str(tmp_path / "debug")
+    SkeletonContainerGenerator(
+        containersig, standardsig, True, suitefolder=debug
+    ).generateskeletonfiles()
+    staged = os.path.join(
+        debug, "skeleton-folders", "fmt-412-container-signature-id-1020.docx"
+    )
+    with open(os.path.join(staged, "word", "document.xml"), "rb") as innerfile:
+        assert innerfile.read() == document
+
+
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize(
+    "selection, outputs",
+    [
+        (
+            {"ids": ["1030"], "puids": ["fmt/40"]},
+            [
+                "fmt-40-container-signature-id-1000.doc",
+                "x-fmt-3-container-signature-id-1030.odt",
+            ],
+        ),
+        (
+            {"puids": ["fmt/412"], "types": ["zip"]},
+            [
+                "fmt-412-container-signature-id-1020.docx",
+                "fmt-412-container-signature-id-1050.docx",
+            ],
+        ),
+    ],
+)
+def test_generate_selection(
+    tmp_path, containersig, standardsig, stream, selection, outputs
+):
+    suite = str(tmp_path / "suite")
+    whole = str(tmp_path / "whole")
+    _generate(containersig, standardsig, suite, stream=stream, **selection)
+    _generate(containersig, standardsig, whole)
+    contents, wholecontents = _contents(suite), _contents(whole)
+    assert sorted(contents) == outputs
+    # The same as when every container is generated.
+    assert all(contents[name] == wholecontents[name] for name in outputs)
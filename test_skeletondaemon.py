@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for serving generation requests."""
+
+from __future__ import print_function
+
+import io
+import json
+import os
+import sys
+import threading
+import zipfile
+
+import pytest
+
+import skeletoncontainergenerator
+import skeletondaemon
+from skeletondaemon import GenerationService, createserver, requesterror
+
+try:
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+except ImportError:
+    # Python 2.
+    from urllib2 import HTTPError, urlopen
+
+
+@pytest.fixture
+def service(tmp_path, containersig, standardsig):
+    cwd = os.getcwd()
+    os.chdir(str(tmp_path))
+    try:
+        yield GenerationService(containersig, standardsig)
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def url(service):
+    server = createserver("127.0.0.1:0", service)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield "http://127.0.0.1:{}".format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def _request(url, body=None):
+    try:
+        response = urlopen(url, body)
+    except HTTPError as err:
+        response = err
+    try:
+        return response.getcode(), response.read()
+    finally:
+        response.close()
+
+
+@pytest.mark.parametrize(
+    "request_, error",
+    [
+        ({}, None),
+        ({"ids": ["1000"], "puids": ["fmt/412"], "archive": True}, None),
+        ([], "request must be a JSON object"),
+        ({"ids": "1000"}, "ids must be a list of strings"),
+        ({"puids": [412]}, "puids must be a list of strings"),
+        ({"archive": "yes"}, "archive must be true or false"),
+    ],
+)
+def test_requesterror(request_, error):
+    assert requesterror(request_) == error
+
+
+def test_select(service):
+    assert service.select() == ["1000", "1020", "1030", "1050"]
+    assert service.select(["1030"], ["fmt/412"]) == ["1020", "1030", "1050"]
+
+
+def test_health(url):
+    assert _request(url + "/health") == (200, b'{"status": "ok"}')
+
+
+def test_generate(url):
+    status, body = _request(url + "/generate?puid=fmt/40")
+    assert status == 200
+    assert json.loads(body.decode("utf-8"))["paths"] == [
+        "skeleton-container-suite/ole2/fmt-40-container-signature-id-1000.doc"
+    ]
+
+
+def test_generate_archive(url):
+    status, body = _request(url + "/generate", b'{"ids": ["1030"], "archive": true}')
+    assert status == 200
+    assert zipfile.ZipFile(io.BytesIO(body)).namelist() == [
+        "zip/x-fmt-3-container-signature-id-1030.odt"
+    ]
+
+
+@pytest.mark.parametrize("body", [b"{", b'{"ids": "1000"}', b"[]"])
+def test_invalid_request(url, body):
+    status, response = _request(url + "/generate", body)
+    assert status == 400
+    assert json.loads(response.decode("utf-8"))["error"].startswith("invalid request")
+
+
+def test_generation_error(monkeypatch, service, url):
+    def fail(ids=None, puids=None):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(service, "generate", fail)
+    status, response = _request(url + "/generate")
+    assert status == 500
+    assert json.loads(response.decode("utf-8")) == {
+        "error": "generation failed: disk full"
+    }
+
+
+def test_service_options(tmp_path, containersig, standardsig):
+    cwd = os.getcwd()
+    os.chdir(str(tmp_path))
+    try:
+        service = GenerationService(
+            containersig,
+            standardsig,
+            zipcompression=(zipfile.ZIP_DEFLATED, 9),
+            types=["ZIP"],
+        )
+        paths, _ = service.generate()
+        with zipfile.ZipFile(paths[0]) as container:
+            infos = [info for info in container.infolist() if info.file_size]
+    finally:
+        os.chdir(cwd)
+    assert list(service.containers) == ["1020", "1030", "1050"]
+    assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in infos)
+
+
+def _main(monkeypatch, args):
+    argv = "skeletoncontainergenerator.py --con con.xml --sig sig.xml --serve :0"
+    monkeypatch.setattr(sys, "argv", argv.split() + args.split())
+    with pytest.raises(SystemExit) as exit_:
+        skeletoncontainergenerator.main()
+    return exit_.value.code
+
+
+def test_serve_options(monkeypatch):
+    served = {}
+
+    def serve(containersig, standardsig, address, debug, **options):
+        served.update(options)
+
+    monkeypatch.setattr(skeletondaemon, "serve", serve)
+    args = "--fill 0xFF --zip-compression deflate:9 --zip-threads 2 --type ZIP"
+    assert _main(monkeypatch, args) == 0
+    assert served["fill"] == 0xFF
+    assert served["zipcompression"] == (zipfile.ZIP_DEFLATED, 9)
+    assert served["zipthreads"] == 2
+    assert served["types"] == ["ZIP"]
+
+
+@pytest.mark.parametrize("args", ["--bundle suite.zip", "--resume", "--verify"])
+def test_serve_rejects_single_run_options(monkeypatch, args):
+    assert _main(monkeypatch, args) == 2
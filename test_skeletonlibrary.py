@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for generating skeletons in memory."""
+
+from __future__ import print_function
+
+import io
+import os
+import xml.etree.ElementTree as etree
+import zipfile
+
+import pytest
+
+from DroidStandardSigFileClass import DroidStandardSigFileClass
+from ole2reader import CompoundFileReader
+from skeletoncontainergenerator import ContainerSelection, SkeletonContainerGenerator
+from skeletonlibrary import SkeletonLibrary
+from skeletonwriters import MemoryWriter
+
+
+@pytest.fixture
+def library(containersig, standardsig):
+    library = SkeletonLibrary(containersig, standardsig)
+    yield library
+    library.close()
+
+
+def test_generate_zip(library):
+    container = zipfile.ZipFile(io.BytesIO(library.generate("1020")))
+    assert container.namelist() == ["[Content_Types].xml", "word/", "word/document.xml"]
+    assert container.read("[Content_Types].xml").startswith(b"<?xml")
+
+
+def test_generate_ole2(library):
+    streams = CompoundFileReader(library.generate("1000")).streams()
+    assert sorted(streams) == ["CompObj", "WordDocument"]
+
+
+def test_generate_unknown_id(library):
+    with pytest.raises(KeyError):
+        library.generate("1060")
+
+
+def test_iter_generate_filter(library):
+    selection = ContainerSelection(types=["OLE2"])
+    names = [name for name, _ in library.iter_generate(selection.selected)]
+    assert names == ["fmt-40-container-signature-id-1000.doc"]
+
+
+def test_nothing_written_to_disk(tmp_path, containersig, standardsig):
+    cwd = os.getcwd()
+    os.chdir(str(tmp_path))
+    try:
+        library = SkeletonLibrary(containersig, standardsig)
+        assert len(list(library.iter_generate())) == 4
+    finally:
+        os.chdir(cwd)
+    assert sorted(os.listdir(str(tmp_path))) == [
+        "DROID_SignatureFile.xml",
+        "container-signature.xml",
+    ]
+
+
+def test_parsed_inputs_match_paths(library, containersig, standardsig):
+    parsed = SkeletonLibrary(
+        etree.parse(containersig).getroot(), DroidStandardSigFileClass(standardsig)
+    )
+    assert dict(parsed.iter_generate()) == dict(library.iter_generate())
+
+
+def test_parsed_inputs_cached(tmp_path, containersig, standardsig):
+    def generator():
+        return SkeletonContainerGenerator(
+            etree.parse(containersig).getroot(),
+            DroidStandardSigFileClass(standardsig),
+            False,
+            cache=str(tmp_path / "cache"),
+            suitefolder=None,
+            writers=[MemoryWriter()],
+        )
+
+    skg = generator()
+    filenames = skg.mapcontainers(skg.formatmappings()).filenames
+    # A fresh parse serialises the same, so it is served from the cache.
+    skg = generator()
+    assert skg.cache.get("containers", skg.containersig) is not None
+    assert skg.mapcontainers(skg.formatmappings()).filenames == filenames
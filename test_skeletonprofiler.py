@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for timing the phases of a run."""
+
+from __future__ import print_function
+
+import json
+
+import skeletonprofiler
+from skeletoncontainergenerator import skeletonfilegeneration
+from skeletonprofiler import NullProfiler, PhaseProfiler
+
+
+def _record(containerid, render, package):
+    return {
+        "id": containerid,
+        "render_seconds": render,
+        "package_seconds": package,
+        "inner_bytes": 10,
+        "output_bytes": 100,
+    }
+
+
+def test_phases_accumulate(monkeypatch):
+    ticks = iter([0.0, 1.0, 5.0, 7.5])
+    monkeypatch.setattr(skeletonprofiler, "timer", lambda: next(ticks))
+    profiler = PhaseProfiler()
+    for _ in range(2):
+        with profiler.phase("mapcontainers"):
+            pass
+    assert profiler.phases == {"mapcontainers": 3.5}
+
+
+def test_report(monkeypatch):
+    monkeypatch.setattr(skeletonprofiler, "SLOWEST", 2)
+    profiler = PhaseProfiler()
+    for record in [_record("1", 1, 1), _record("2", 0, 5), _record("3", 3, 0)]:
+        profiler.container(record)
+    report = profiler.report({"zipcount": 3})
+    assert report["totals"] == {
+        "render_seconds": 4,
+        "package_seconds": 6,
+        "inner_bytes": 30,
+        "output_bytes": 300,
+    }
+    assert report["slowest"] == ["2", "3"]
+    assert report["stats"] == {"zipcount": 3}
+
+
+def test_null_profiler():
+    profiler = NullProfiler()
+    with profiler.phase("mapcontainers"):
+        profiler.container(_record("1", 1, 1))
+    assert not profiler.enabled
+    assert profiler.containers == []
+
+
+def test_profile_report(tmp_path, containersig, standardsig):
+    path = str(tmp_path / "profile.json")
+    skeletonfilegeneration(
+        containersig,
+        standardsig,
+        False,
+        profile=path,
+        suitefolder=str(tmp_path / "suite"),
+    )
+    with open(path) as profile:
+        report = json.load(profile)
+    assert sorted(report["phases"]) == [
+        "containersigfile",
+        "mapcontainers",
+        "parse_container_signature_file",
+        "parse_standard_signature_file",
+    ]
+    assert sorted(record["id"] for record in report["containers"]) == [
+        "1000",
+        "1020",
+        "1030",
+        "1050",
+    ]
+    assert report["totals"]["output_bytes"] == sum(
+        record["output_bytes"] for record in report["containers"]
+    )
+    assert report["stats"]["zipwritten"] == 3
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for generating a suite in shards and merging them."""
+
+from __future__ import print_function
+
+import os
+
+import pytest
+
+from skeletoncontainergenerator import SkeletonContainerGenerator
+from skeletonshards import mergeshards, parseshard, shardof
+
+
+def _generateshards(tmp_path, containersig, standardsig, count, **options):
+    folders = []
+    for index in range(1, count + 1):
+        folder = str(tmp_path / "shard{}".format(index))
+        SkeletonContainerGenerator(
+            containersig,
+            standardsig,
+            False,
+            shard=(index, count),
+            suitefolder=folder,
+            **options
+        ).generateskeletonfiles()
+        folders.append(folder)
+    return folders
+
+
+def _outputs(folder):
+    return sorted(
+        name
+        for subfolder in ("zip", "ole2")
+        for name in os.listdir(os.path.join(folder, subfolder))
+    )
+
+
+@pytest.mark.parametrize("value, shard", [("1/4", (1, 4)), ("3/3", (3, 3))])
+def test_parseshard(value, shard):
+    assert parseshard(value) == shard
+
+
+@pytest.mark.parametrize("value", ["0/4", "5/4", "1", "a/b"])
+def test_parseshard_invalid(value):
+    with pytest.raises(ValueError):
+        parseshard(value)
+
+
+def test_shardof_is_stable():
+    # Every machine, and Python version, must agree on the partition.
+    ids = ("1000", "1020", "1030", "1050", "1060")
+    assert [shardof(containerid, 3) for containerid in ids] == [1, 2, 1, 1, 3]
+
+
+def test_merge_matches_single_run(tmp_path, containersig, standardsig):
+    single = str(tmp_path / "single")
+    SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=single
+    ).generateskeletonfiles()
+    folders = _generateshards(tmp_path, containersig, standardsig, 3)
+    merged = str(tmp_path / "merged")
+    os.mkdir(merged)
+    nocontainersigs, stats, _ = mergeshards(folders, merged)
+    assert nocontainersigs == 5
+    assert stats["zipwritten"] + stats["ole2written"] == 4
+    assert _outputs(merged) == _outputs(single)
+
+
+def test_merge_incomplete_set(tmp_path, containersig, standardsig):
+    folders = _generateshards(tmp_path, containersig, standardsig, 2)
+    with pytest.raises(ValueError):
+        mergeshards(folders[:1], str(tmp_path / "merged"))
+
+
+def test_merge_refuses_different_settings(tmp_path, containersig, standardsig):
+    folders = _generateshards(tmp_path, containersig, standardsig, 2)
+    other = tmp_path / "other"
+    other.mkdir()
+    folders[1:] = _generateshards(other, containersig, standardsig, 2, fill=0xFF)[1:]
+    with pytest.raises(ValueError):
+        mergeshards(folders, str(tmp_path / "merged"))
+
+
+def test_merge_refuses_different_signatures(tmp_path, containersig, standardsig):
+    folders = _generateshards(tmp_path, containersig, standardsig, 2)
+    with open(standardsig, "a") as sigfile:
+        sigfile.write("\n")
+    other = tmp_path / "other"
+    other.mkdir()
+    folders[1:] = _generateshards(other, containersig, standardsig, 2)[1:]
+    with pytest.raises(ValueError):
+        mergeshards(folders, str(tmp_path / "merged"))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for verifying skeletons against their container signatures."""
+
+from __future__ import print_function
+
+import collections
+import xml.etree.ElementTree as etree
+import zipfile
+
+import skeletonverifier
+from skeletoncontainergenerator import SkeletonContainerGenerator
+from skeletonverifier import bytesequencepattern, sequencematches
+
+
+def _bytesequence(sequence, reference="BOFoffset", minimum=0, maximum=None):
+    subsequence = '<SubSequence Position="1" SubSeqMinOffset="{}"{}>'.format(
+        minimum, "" if maximum is None else ' SubSeqMaxOffset="{}"'.format(maximum)
+    )
+    return etree.fromstring(
+        '<ByteSequence Reference="{}">{}<Sequence>{}</Sequence>'
+        "</SubSequence></ByteSequence>".format(reference, subsequence, sequence)
+    )
+
+
+def test_bof_sequence():
+    pattern = bytesequencepattern(_bytesequence("AA ?? [01:03]", minimum=1, maximum=2))
+    assert sequencematches(pattern, b"\x00\xaa\xff\x02")
+    assert sequencematches(pattern, b"\x00\x00\xaa\xff\x02")
+    assert not sequencematches(pattern, b"\x00\x00\x00\xaa\xff\x02")
+    assert not sequencematches(pattern, b"\x00\xaa\xff\x04")
+
+
+def test_eof_sequence():
+    pattern = bytesequencepattern(_bytesequence("'EOF'", "EOFoffset", 1))
+    assert sequencematches(pattern, b"data EOF\x00")
+    assert not sequencematches(pattern, b"data EOF")
+
+
+def test_patterns_bounded(monkeypatch):
+    monkeypatch.setattr(skeletonverifier, "PATTERN_CACHE_SIZE", 3)
+    monkeypatch.setattr(skeletonverifier, "_patterns", collections.OrderedDict())
+    for value in range(5):
+        bytesequencepattern(_bytesequence("{:02X}".format(value)))
+    assert len(skeletonverifier._patterns) == 3
+    # The most recently used are kept.
+    kept = bytesequencepattern(_bytesequence("02"))
+    bytesequencepattern(_bytesequence("05"))
+    assert bytesequencepattern(_bytesequence("02")) is kept
+
+
+def test_verify_suite(tmp_path, containersig, standardsig):
+    skg = SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=str(tmp_path / "suite")
+    )
+    skg.generateskeletonfiles()
+    verifications = skg.verify()
+    assert [verification.id for verification in verifications] == [
+        "1000",
+        "1020",
+        "1030",
+        "1050",
+    ]
+    assert all(not verification.mismatches for verification in verifications)
+
+    # Replace an inner file so it no longer matches.
+    output = skg.outputpath("ZIP", skg.filenames["1030"])
+    with zipfile.ZipFile(output, "w") as container:
+        container.writestr("mimetype", b"text/plain")
+    mismatches = dict(
+        (verification.id, verification.mismatches) for verification in skg.verify()
+    )
+    assert mismatches["1030"] == [
+        "no internal signature matched: mimetype",
+        "missing inner file: content.xml",
+    ]
+    assert mismatches["1020"] == []
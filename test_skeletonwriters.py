@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the container writers."""
+
+from __future__ import print_function
+
+import hashlib
+import io
+import random
+import tarfile
+import zipfile
+
+import pytest
+
+import skeletonwriters
+from outputhashes import SpooledOutput
+from skeletonwriters import (
+    BLOCK_DEFLATE_THRESHOLD,
+    ZIP_FILE_ATTR,
+    ZIP_FOLDER_ATTR,
+    BundleWriter,
+    MemoryWriter,
+    levelargs,
+    parsecompression,
+    zipinfo,
+)
+
+
+def _text(size, seed=1):
+    rng = random.Random(seed)
+    words = [b"alpha", b"beta", b"gamma", b"delta", b"epsilon", b"zeta"]
+    out = bytearray()
+    while len(out) < size:
+        out.extend(rng.choice(words) + b" ")
+    return bytes(out[:size])
+
+
+def _package(data, compression=zipfile.ZIP_DEFLATED, level=None, threads=1):
+    writer = MemoryWriter(compression=compression, level=level, threads=threads)
+    writer.begin("1", "ZIP", "test.zip")
+    writer.write("folder/data.txt", data)
+    writer.end()
+    writer.close()
+    return writer.data
+
+
+def _member(archive):
+    container = zipfile.ZipFile(io.BytesIO(archive))
+    info = container.getinfo("folder/data.txt")
+    return info, container.read(info)
+
+
+@pytest.mark.parametrize(
+    "value, compression",
+    [
+        ("stored", (zipfile.ZIP_STORED, None)),
+        ("deflate", (zipfile.ZIP_DEFLATED, None)),
+        ("DEFLATE:9", (zipfile.ZIP_DEFLATED, 9)),
+    ],
+)
+def test_parsecompression(value, compression):
+    assert parsecompression(value) == compression
+
+
+@pytest.mark.parametrize("value", ["zstd", "deflate:10", "stored:1"])
+def test_parsecompression_invalid(value):
+    with pytest.raises(ValueError):
+        parsecompression(value)
+
+
+def test_deterministic_members():
+    data = _text(1000)
+    archive = _package(data)
+    assert _package(data) == archive
+    info, member = _member(archive)
+    assert member == data
+    assert info.date_time == (1980, 1, 1, 0, 0, 0)
+    assert info.compress_type == zipfile.ZIP_DEFLATED
+
+
+@pytest.mark.skipif(not skeletonwriters.ZIP_LEVELS, reason="needs Python 3.7")
+def test_compression_level_applied():
+    data = _text(200000)
+    fast, member = _member(_package(data, level=1))
+    assert member == data
+    best, member = _member(_package(data, level=9))
+    assert member == data
+    assert best.compress_size < fast.compress_size
+    # The same as zipfile compresses a member at that level.
+    reference = zipfile.ZipFile(io.BytesIO(), "w")
+    reference.writestr(
+        zipinfo("data.txt", ZIP_FILE_ATTR, zipfile.ZIP_DEFLATED),
+        data,
+        **levelargs(9)
+    )
+    assert reference.getinfo("data.txt").compress_size == best.compress_size
+
+
+@pytest.mark.skipif(not skeletonwriters.ZIP_STREAMING, reason="needs Python 3.6")
+def test_block_deflate_independent_of_threads():
+    data = _text(BLOCK_DEFLATE_THRESHOLD + 12345)
+    archive = _package(data, level=6)
+    assert _package(data, level=6, threads=3) == archive
+    assert _member(archive)[1] == data
+
+
+def test_block_deflate_without_compressor(monkeypatch):
+    # Without the private compressor to stand in for, large members are
+    # compressed by zipfile itself.
+    monkeypatch.setattr(skeletonwriters, "_COMPRESSOR", False)
+    data = _text(BLOCK_DEFLATE_THRESHOLD + 12345)
+    archive = _package(data, threads=3)
+    assert _member(archive)[1] == data
+    reference = io.BytesIO()
+    with zipfile.ZipFile(reference, "w") as container:
+        container.writestr(zipinfo("folder/", ZIP_FOLDER_ATTR), b"")
+        container.writestr(
+            zipinfo("folder/data.txt", ZIP_FILE_ATTR, zipfile.ZIP_DEFLATED), data
+        )
+    assert archive == reference.getvalue()
+
+
+def test_memory_writer_ole2():
+    writer = MemoryWriter()
+    writer.begin("1", "OLE2", "test.doc")
+    writer.write("WordDocument", b"word")
+    output = writer.end()
+    assert writer.data[:4] == b"\xd0\xcf\x11\xe0"
+    assert output.record["size"] == len(writer.data)
+
+
+def _writebundle(path, containers):
+    bundle = BundleWriter(path, None)
+    outputs = []
+    for containertype, filename, innerfiles in containers:
+        bundle.begin("1", containertype, filename)
+        for innerpath, data in innerfiles:
+            bundle.write(innerpath, data)
+        outputs.append(bundle.end())
+    bundle.close()
+    return outputs
+
+
+@pytest.mark.parametrize("name", ["suite.zip", "suite.tgz", "suite.tar"])
+def test_bundle_packaged_in_memory(monkeypatch, tmp_path, name):
+    def written(output):
+        raise AssertionError("Bundled container written to disk")
+
+    # Containers are appended to the bundle without being saved first.
+    monkeypatch.setattr(SpooledOutput, "save", written)
+    containers = [
+        ("ZIP", "a.docx", [("word/document.xml", b"<xml/>")]),
+        ("OLE2", "b.doc", [("WordDocument", b"word")]),
+    ]
+    path = str(tmp_path / name)
+    outputs = _writebundle(path, containers)
+    if name.endswith(".zip"):
+        bundle = zipfile.ZipFile(path)
+        members = dict((name, bundle.read(name)) for name in bundle.namelist())
+    else:
+        bundle = tarfile.open(path)
+        members = dict((info.name, bundle.extractfile(info).read()) for info in bundle)
+    bundle.close()
+    assert sorted(members) == ["ole2/b.doc", "zip/a.docx"]
+    for output, member in zip(outputs, ["zip/a.docx", "ole2/b.doc"]):
+        assert output.path == "{}!/{}".format(path, member)
+        assert output.record["size"] == len(members[member])
+        assert output.record["sha256"] == hashlib.sha256(members[member]).hexdigest()
+    assert zipfile.ZipFile(io.BytesIO(members["zip/a.docx"])).namelist() == [
+        "word/",
+        "word/document.xml",
+    ]
+
+
+def test_bundle_deterministic(tmp_path):
+    containers = [("ZIP", "a.docx", [("a.txt", b"a")])]
+    _writebundle(str(tmp_path / "first.tgz"), containers)
+    _writebundle(str(tmp_path / "second.tgz"), containers)
+    with open(str(tmp_path / "first.tgz"), "rb") as first:
+        with open(str(tmp_path / "second.tgz"), "rb") as second:
+            assert first.read() == second.read()
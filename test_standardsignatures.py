@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for the PUID index of the DROID standard signature file."""
+
+from __future__ import print_function
+
+import pytest
+
+from DroidStandardSigFileClass import NOTFOUND, DroidStandardSigFileClass
+
+
+def test_retrieve_format(standardsig):
+    record = DroidStandardSigFileClass(standardsig).retrieve_format("fmt/412")
+    assert record.name == "OOXML"
+    assert record.extensions == ("docx", "docm")
+    assert record.mimetypes == ("application/vnd.openxmlformats", "application/zip")
+
+
+def test_retrieve_ext_list(standardsig):
+    handler = DroidStandardSigFileClass(standardsig)
+    assert handler.retrieve_ext_list(["fmt/40", "fmt/412", "fmt/0000"]) == {
+        "fmt/40": "doc",
+        "fmt/412": "docx",
+        "fmt/0000": NOTFOUND,
+    }
+
+
+def test_cached_formats_skip_parsing(tmp_path, standardsig):
+    formats = DroidStandardSigFileClass(standardsig).formats
+    handler = DroidStandardSigFileClass(str(tmp_path / "missing.xml"), formats)
+    assert handler.retrieve_single_ext_text("x-fmt/3") == "odt"
+
+
+def test_missing_file_raises(tmp_path):
+    with pytest.raises(IOError):
+        DroidStandardSigFileClass(str(tmp_path / "missing.xml"))
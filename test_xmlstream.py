@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Tests for streaming elements out of signature files."""
+
+from __future__ import print_function
+
+import io
+import os
+
+import pytest
+
+import skeletoncontainergenerator
+from skeletoncontainergenerator import SkeletonContainerGenerator
+from xmlstream import iterparse_elements
+
+XML = b"""<Root>
+  <Items>
+    <Item Id="1"><Item Id="1.1"/><Value>one</Value></Item>
+    <Other/>
+    <Item Id="2"><Value>two</Value></Item>
+  </Items>
+</Root>"""
+
+
+def test_yields_complete_elements():
+    values = [
+        (item.get("Id"), item.find("Value").text)
+        for item in iterparse_elements(io.BytesIO(XML), "Item")
+    ]
+    # Nested matching elements are part of the outer element.
+    assert values == [("1", "one"), ("2", "two")]
+
+
+def test_consumed_elements_released():
+    items = []
+    for item in iterparse_elements(io.BytesIO(XML), "Item"):
+        items.append(item)
+    # Cleared once the caller has moved on to the next element.
+    assert len(items[0]) == 0
+    assert items[0].get("Id") is None
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(IOError):
+        list(iterparse_elements(str(tmp_path / "missing.xml"), "Item"))
+
+
+def _suite(folder, containersig, standardsig, **options):
+    SkeletonContainerGenerator(
+        containersig, standardsig, False, suitefolder=folder, **options
+    ).generateskeletonfiles()
+    outputs = {}
+    for subfolder in ("zip", "ole2"):
+        for name in os.listdir(os.path.join(folder, subfolder)):
+            with open(os.path.join(folder, subfolder, name), "rb") as output:
+                outputs[name] = output.read()
+    return outputs
+
+
+def test_stream_reads_file_twice(monkeypatch, tmp_path, containersig, standardsig):
+    passes = []
+
+    def counted(xml_file, tag):
+        passes.append(tag)
+        return iterparse_elements(xml_file, tag)
+
+    monkeypatch.setattr(skeletoncontainergenerator, "iterparse_elements", counted)
+    streamed = _suite(str(tmp_path / "stream"), containersig, standardsig, stream=True)
+    assert passes == ["FileFormatMapping", "ContainerSignature"]
+    assert streamed == _suite(str(tmp_path / "whole"), containersig, standardsig)
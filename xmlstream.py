@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+"""Module for streaming elements out of large signature files without
+holding the complete document in memory.
+"""
+
+from __future__ import print_function, unicode_literals
+
+import logging
+import xml.etree.ElementTree as etree
+
+
+def iterparse_elements(xml_file, tag):
+    """Yield each element matching tag as soon as it is complete.
+
+    Elements are cleared and detached from their parent once the caller
+    has consumed them. Elements outside of a matching element are
+    discarded as they complete so that memory stays flat however large
+    the file is.
+    """
+    parents = []
+    depth = 0
+    try:
+        for event, elem in etree.iterparse(xml_file, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                if elem.tag == tag:
+                    depth += 1
+                continue
+            parents.pop()
+            if elem.tag == tag:
+                depth -= 1
+                if depth == 0:
+                    yield elem
+            if depth > 0:
+                # Part of an element the caller has yet to receive.
+                continue
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
+    except IOError as err:
+        logging.error("IO error: %s in File: %s", err, xml_file)
+        raise err